@@ -1,14 +1,11 @@
-import requests
 import re
 
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from auth.token_manager import get_valid_access_token
 from collector.activities import fetch_activities
-
-BASE_URL = "https://www.strava.com/api/v3"
+from collector.transport import get_json
 
 def is_interval_workout(activity):
     description = activity.get("description", "")
@@ -31,14 +28,7 @@ def is_interval_workout(activity):
     return False
 
 def fetch_activity_detail(activity_id):
-    token = get_valid_access_token()
-    headers = {"Authorization": f"Bearer {token}"}
-    response = requests.get(
-        f"{BASE_URL}/activities/{activity_id}",
-        headers=headers
-    )
-    response.raise_for_status()
-    return response.json()
+    return get_json(f"/activities/{activity_id}")
 
 def main():
     print("Searching for activities")
@@ -7,7 +7,16 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from analysis.formatters import format_pace_bin
 
-def process_weekly_data(raw_data, hide_zero=False, limit=None):
+# weeks of history the chronic load needs before the first plotted week
+ACWR_CHRONIC_WINDOW = 4
+
+def _first_week(df, start):
+    # start is the lower bound that was pushed into the query, zero weeks
+    # between it and the first week with data are still plotted
+    first = df["week_start"].min()
+    return min(pd.Timestamp(start), first) if start else first
+
+def process_weekly_data(raw_data, hide_zero=False, limit=None, start=None):
     df = pd.DataFrame(
         raw_data,
         columns=["week_start", "total_km", "total_time_sec"]
@@ -20,7 +29,7 @@ def process_weekly_data(raw_data, hide_zero=False, limit=None):
     
     # filling 0 weeks
     all_weeks = pd.date_range(
-        start=df["week_start"].min(),
+        start=_first_week(df, start),
         end=df["week_start"].max(),
         freq="W-MON"
     )
@@ -192,8 +201,6 @@ def process_weekly_training_load(raw_data, zones):
         columns=["week_start", "pace_min_km", "distance_km"]
     )
     
-    df = df.drop_duplicates()
-    
     if df.empty:
         return df
     
@@ -231,17 +238,18 @@ def process_weekly_training_load(raw_data, zones):
     
     return df
 
-def process_acwr(df_load, acute_window=1, chronic_window=4, hide_zero=False, limit=None):
+def process_acwr(df_load, acute_window=1, chronic_window=ACWR_CHRONIC_WINDOW, hide_zero=False, limit=None, start=None, warmup_start=None):
     if df_load.empty:
         return df_load
     
-    df = df_load.copy()
+    # the label is rebuilt after the reindex, a 0 can't fill a string column
+    df = df_load.drop(columns="label", errors="ignore")
     df["week_start"] = pd.to_datetime(df["week_start"])
     #df = df.sort_values("week_start")
     
     # adding weeks without training to have more accurate results
     all_weeks = pd.date_range(
-        start=df["week_start"].min(),
+        start=_first_week(df, warmup_start),
         end=df["week_start"].max(),
         freq="W-MON"
     )
@@ -270,6 +278,10 @@ def process_acwr(df_load, acute_window=1, chronic_window=4, hide_zero=False, lim
     df["label"] = df["week_start"].dt.strftime("%d/%m/%y")
     #print(df["acwr"])
     
+    # the warm-up weeks were only fetched for the rolling windows
+    if start:
+        df = df[df["week_start"] >= pd.Timestamp(start)].copy()
+    
     
     if hide_zero:
         df = df[df["training_load"] > 0].copy()
@@ -284,8 +296,6 @@ def process_daily_training_load(raw_splits, zones):
         raw_splits,
         columns=["date", "pace_min_km", "distance_km"])
     
-    df = df.drop_duplicates()
-    
     if df.empty:
         return df
     
@@ -352,3 +362,51 @@ def process_monotony_strain(daily_load):
     out["label"] = out["week_start"].dt.strftime("%d/%m/%y")
     
     return out
+
+# readers for the materialized weekly_summary rows (database/aggregates.py),
+# same output as the split based processors above
+def process_z2_percentage_summary(raw_summary):
+    df = raw_summary.loc[raw_summary["split_count"] > 0, ["week_start", "split_km", "z2_open_km"]]
+    df = df.rename(columns={"split_km": "total_km", "z2_open_km": "z2_km"}).reset_index(drop=True)
+    
+    if df.empty:
+        return df
+    
+    df["week_start"] = pd.to_datetime(df["week_start"])
+    df["z2_percentage"] = 100 * df["z2_km"] / df["total_km"]
+    df["label"] = df["week_start"].dt.strftime("%d/%m/%y")
+    return df
+
+def process_z2_volume_summary(raw_summary):
+    df = raw_summary.loc[raw_summary["split_count"] > 0, ["week_start", "split_km", "z2_km"]]
+    df = df.rename(columns={"split_km": "total_km"}).reset_index(drop=True)
+    
+    if df.empty:
+        return df
+    
+    df["week_start"] = pd.to_datetime(df["week_start"])
+    df["label"] = df["week_start"].dt.strftime("%d/%m/%y")
+    return df
+
+def process_training_load_summary(raw_summary, zones):
+    zone_columns = {f"{name.lower()}_load": name for name, *_ in zones}
+    df = raw_summary.loc[raw_summary["split_count"] > 0, ["week_start", "training_load", *zone_columns]]
+    df = df.rename(columns=zone_columns).reset_index(drop=True)
+    
+    if df.empty:
+        return df
+    
+    df["week_start"] = pd.to_datetime(df["week_start"])
+    df = df.sort_values("week_start")
+    
+    df["label"] = df["week_start"].dt.strftime("%d/%m/%y")
+    return df
+
+def process_daily_load_summary(raw_daily):
+    df = pd.DataFrame(raw_daily, columns=["date", "training_load"])
+    
+    if df.empty:
+        return df
+    
+    df["date"] = pd.to_datetime(df["date"]).dt.date
+    return df
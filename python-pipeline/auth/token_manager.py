@@ -1,7 +1,9 @@
 import os
 import time
+import tempfile
+import threading
 import requests
-from dotenv import load_dotenv, set_key
+from dotenv import load_dotenv
 
 load_dotenv()
 
@@ -12,28 +14,92 @@ TOKEN_URL = "https://www.strava.com/oauth/token"
 current_dir = os.path.dirname(os.path.abspath(__file__))
 ENV_FILE = os.path.join(current_dir, "..", ".env")
 
+# refresh this many seconds before the token really expires
+REFRESH_SKEW_SEC = int(os.getenv("STRAVA_TOKEN_REFRESH_SKEW", "300"))
+
+# process level cache, the .env file is only read once and written on refresh
+_token_cache = {
+    "loaded": False,
+    "access_token": None,
+    "refresh_token": None,
+    "expires_at": 0,
+}
+_token_lock = threading.Lock()
+
+def _write_env_values(values):
+    lines = []
+    if os.path.exists(ENV_FILE):
+        with open(ENV_FILE) as f:
+            lines = f.read().splitlines()
+    
+    pending = dict(values)
+    new_lines = []
+    for line in lines:
+        key = line.split("=", 1)[0].strip()
+        if key.startswith("export "):
+            key = key[len("export "):].strip()
+        
+        if key in pending:
+            new_lines.append(f"{key}='{pending.pop(key)}'")
+        else:
+            new_lines.append(line)
+    
+    new_lines.extend(f"{key}='{value}'" for key, value in pending.items())
+    
+    # write a temporary file and swap it in, so the .env is never half written
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(ENV_FILE), prefix=".env.")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write("\n".join(new_lines) + "\n")
+        os.replace(tmp_path, ENV_FILE)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+def _load_token_cache():
+    if _token_cache["loaded"]:
+        return
+    
+    load_dotenv(ENV_FILE, override=True)
+    expires_at = os.getenv("STRAVA_EXPIRES_AT")
+    
+    _token_cache.update({
+        "loaded": True,
+        "access_token": os.getenv("STRAVA_ACCESS_TOKEN"),
+        "refresh_token": os.getenv("STRAVA_REFRESH_TOKEN"),
+        "expires_at": int(expires_at) if expires_at else 0,
+    })
+
 def save_tokens(token_data):
-    set_key(ENV_FILE, "STRAVA_ACCESS_TOKEN", token_data["access_token"])
-    set_key(ENV_FILE, "STRAVA_REFRESH_TOKEN", token_data["refresh_token"])
-    set_key(ENV_FILE, "STRAVA_EXPIRES_AT", str(token_data["expires_at"]))
+    values = {
+        "STRAVA_ACCESS_TOKEN": token_data["access_token"],
+        "STRAVA_REFRESH_TOKEN": token_data["refresh_token"],
+        "STRAVA_EXPIRES_AT": str(token_data["expires_at"]),
+    }
+    _write_env_values(values)
+    os.environ.update(values)
     
-    load_dotenv(override=True)
+    _token_cache.update({
+        "loaded": True,
+        "access_token": token_data["access_token"],
+        "refresh_token": token_data["refresh_token"],
+        "expires_at": int(token_data["expires_at"]),
+    })
     
 def is_token_expired():
-    load_dotenv(override=True)
-    expires_at = os.getenv("STRAVA_EXPIRES_AT")
-    if not expires_at:
+    _load_token_cache()
+    if not _token_cache["access_token"] or not _token_cache["expires_at"]:
         return True
-    return time.time() > int(expires_at)
+    return time.time() > _token_cache["expires_at"] - REFRESH_SKEW_SEC
 
 def refresh_access_token():
-    refresh_token = os.getenv("STRAVA_REFRESH_TOKEN")
+    _load_token_cache()
     
     payload = {
         "client_id": CLIENT_ID,
         "client_secret": CLIENT_SECRET,
         "grant_type": "refresh_token",
-        "refresh_token": refresh_token,
+        "refresh_token": _token_cache["refresh_token"],
     }
     
     response = requests.post(TOKEN_URL, data = payload)
@@ -44,8 +110,13 @@ def refresh_access_token():
     return token_data["access_token"]
 
 def get_valid_access_token():
-    if is_token_expired():
-        print("Expired token - renewing...")
-        return refresh_access_token()
-    return os.getenv("STRAVA_ACCESS_TOKEN")
-    
\ No newline at end of file
+    if _token_cache["loaded"] and not is_token_expired():
+        return _token_cache["access_token"]
+    
+    # only one worker refreshes, the others wait and reuse the new token
+    with _token_lock:
+        if is_token_expired():
+            print("Expired token - renewing...")
+            return refresh_access_token()
+        return _token_cache["access_token"]
+
@@ -0,0 +1,92 @@
+import argparse
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# write throughput of the sync's ActivityWriter on synthetic activities, with
+# a commit per activity (as the sync wrote before the batching) and with the
+# group commit batches. the activities are mapped before the clock starts, so
+# only the database writes are timed. everything goes to a temporary database,
+# strava.db is never touched
+#
+#   python benchmarks/bench_activity_writer.py --activities 1000 --batch-sizes 1 25 100
+
+MOCK_STREAM_SECONDS = 1800
+FIRST_START_DATE = datetime(2020, 1, 6, 7)
+
+def mock_activity(activity_id, day):
+    # every tenth activity is an interval session with streams
+    interval = activity_id % 10 == 0
+    start_date = FIRST_START_DATE + timedelta(days=day)
+    return {
+        "id": activity_id,
+        "name": f"Run {activity_id}",
+        "type": "Run",
+        "description": "6x400 tiros" if interval else "easy",
+        "start_date": f"{start_date:%Y-%m-%dT%H:%M:%S}Z",
+        "start_date_local": f"{start_date - timedelta(hours=3):%Y-%m-%dT%H:%M:%S}Z",
+        "distance": 10000.0,
+        "moving_time": 3300,
+        "splits_metric": [
+            {"split": i, "distance": 1000.0, "moving_time": 330 + i % 3 * 15}
+            for i in range(1, 11)
+        ],
+    }
+
+def mock_streams():
+    seconds = range(MOCK_STREAM_SECONDS)
+    return {
+        "time": {"data": list(seconds)},
+        "distance": {"data": [round(s * 3.0, 1) for s in seconds]},
+        "velocity_smooth": {"data": [3.0] * MOCK_STREAM_SECONDS},
+        "heartrate": {"data": [150] * MOCK_STREAM_SECONDS},
+        "altitude": {"data": [100.0] * MOCK_STREAM_SECONDS},
+    }
+
+def mapped_activities(build_activity_objects, count, first_id):
+    streams = mock_streams()
+    activities = []
+    for i in range(count):
+        full_data = mock_activity(first_id + i, i)
+        activity_row, related_objs, bulk_rows, _ = build_activity_objects(full_data, streams if (first_id + i) % 10 == 0 else None)
+        activities.append((activity_row, related_objs, bulk_rows))
+    return activities
+
+def time_writes(ActivityWriter, activities, batch_size):
+    writer = ActivityWriter(batch_size=batch_size)
+    writer.start()
+    start = time.perf_counter()
+    for activity_row, related_objs, bulk_rows in activities:
+        writer.put(activity_row, related_objs, bulk_rows)
+    writer.close()
+    return time.perf_counter() - start, writer
+
+def main():
+    parser = argparse.ArgumentParser(description="ActivityWriter throughput on synthetic activities")
+    parser.add_argument("--activities", type=int, default=1000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 25, 100], help="1 commits every activity")
+    args = parser.parse_args()
+    
+    # database/config.py reads the path when it is imported
+    os.environ["STRAVA_DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="strava_bench_db."), "bench.db")
+    
+    from processors.build_activity import build_activity_objects
+    from processors.db_writer import ActivityWriter
+    
+    print(f"{args.activities} activities ({args.activities // 10} with streams), {os.environ['STRAVA_DATABASE_PATH']}")
+    baseline = None
+    for run, batch_size in enumerate(args.batch_sizes):
+        # new ids on every run, stored ones would be skipped
+        activities = mapped_activities(build_activity_objects, args.activities, (run + 1) * 1_000_000)
+        
+        elapsed, writer = time_writes(ActivityWriter, activities, batch_size)
+        rate = writer.saved_count / elapsed
+        baseline = baseline or rate
+        print(f"batch={batch_size:<4} {elapsed:7.2f}s  {writer.saved_count} saved  {writer.errors_count} errors  {rate:7.1f} atv/s  x{rate / baseline:.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import argparse
+import json
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# times the sync downloads (detail + streams per activity) with 1 worker vs
+# the thread pool, against a local mock of the strava api with a fixed latency
+# per request. nothing is written to the database and the raw cache goes to a
+# temporary directory, so a real token or strava.db are never touched
+#
+#   python benchmarks/bench_sync_fetch.py --activities 60 --latency 0.1 --workers 1 4 8
+
+MOCK_STREAM_SECONDS = 3600
+
+class MockStravaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency_sec = 0.1
+    lock = threading.Lock()
+    usage = 0
+    
+    def log_message(self, *args):
+        pass
+    
+    def do_GET(self):
+        time.sleep(self.latency_sec)
+        with self.lock:
+            MockStravaHandler.usage += 1
+            usage = MockStravaHandler.usage
+        
+        parts = urlparse(self.path).path.strip("/").split("/")
+        if parts[-1] == "streams":
+            body = mock_streams()
+        else:
+            body = mock_activity(int(parts[-1]))
+        
+        raw = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        # high limits, the benchmark measures latency hiding, not the governor
+        self.send_header("X-RateLimit-Limit", "100000,1000000")
+        self.send_header("X-RateLimit-Usage", f"{usage},{usage}")
+        self.end_headers()
+        self.wfile.write(raw)
+
+def mock_activity(activity_id):
+    # every other activity is an interval session, so it also needs streams
+    description = "6x400 tiros" if activity_id % 2 else "easy"
+    return {
+        "id": activity_id,
+        "name": f"Run {activity_id}",
+        "type": "Run",
+        "description": description,
+        "start_date": "2025-01-10T07:00:00Z",
+        "start_date_local": "2025-01-10T04:00:00Z",
+        "distance": 10000.0,
+        "moving_time": MOCK_STREAM_SECONDS,
+    }
+
+def mock_streams():
+    seconds = range(MOCK_STREAM_SECONDS)
+    return {
+        "time": {"data": list(seconds)},
+        "distance": {"data": [round(s * 2.8, 1) for s in seconds]},
+        "velocity_smooth": {"data": [2.8] * MOCK_STREAM_SECONDS},
+        "heartrate": {"data": [150] * MOCK_STREAM_SECONDS},
+        "altitude": {"data": [100.0] * MOCK_STREAM_SECONDS},
+    }
+
+def start_mock_server(latency_sec):
+    MockStravaHandler.latency_sec = latency_sec
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockStravaHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def time_fetch(iter_fetched, summaries, workers):
+    start = time.perf_counter()
+    api_calls = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for _, future in iter_fetched(executor, summaries, max_in_flight=workers * 2):
+            api_calls += future.result()[2]
+    return time.perf_counter() - start, api_calls
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync download benchmark against a mock Strava API")
+    parser.add_argument("--activities", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds per mock request")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+    
+    server = start_mock_server(args.latency)
+    
+    # the collector reads these when it is imported
+    os.environ["STRAVA_API_BASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ["STRAVA_ACCESS_TOKEN"] = "benchmark"
+    os.environ["STRAVA_EXPIRES_AT"] = str(int(time.time()) + 24 * 60 * 60)
+    os.environ["STRAVA_RAW_CACHE_DIR"] = tempfile.mkdtemp(prefix="strava_bench_cache.")
+    
+    from processors.sync_new_activities import iter_fetched
+    
+    print(f"{args.activities} activities, {args.latency * 1000:.0f} ms per request")
+    baseline = None
+    for run, workers in enumerate(args.workers):
+        # new ids on every run, the raw cache would answer the repeated ones
+        first_id = (run + 1) * 1_000_000
+        summaries = [{"id": first_id + i} for i in range(args.activities)]
+        
+        elapsed, api_calls = time_fetch(iter_fetched, summaries, workers)
+        baseline = baseline or elapsed
+        print(f"workers={workers:<3} {elapsed:7.2f}s  {api_calls} requests  {args.activities / elapsed:6.1f} atv/s  x{baseline / elapsed:.1f}")
+    
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,73 @@
-from database.config import SessionLocal, get_db_info
-from database.models import Activity, ActivitySplit, ActivitySecond
-from sqlalchemy import func
+import json
+from collections import Counter
 
-def check_ingestion_summary():
-    session = SessionLocal()
-    print("-" * 50)
-    print(get_db_info())
-    print("-" * 50)
+from database.config import get_db_info
+from database.queries import iter_ingestion_status
+from processors.type_classifiers.util_type_classifiers import STREAM_WORKOUT_TYPES
 
-    # 1. Busca todas as atividades no banco
-    activities = session.query(Activity).order_by(Activity.start_date.desc()).all()
+def ingestion_flags(row):
+    flags = []
+    if row.workout_type in STREAM_WORKOUT_TYPES:
+        # the laps are detected from the streams, once they exist the
+        # retention command may drop the streams on purpose
+        if not row.samples and not row.laps:
+            flags.append("missing_streams")
+        if not row.laps:
+            # with streams and splits the detectors found no efforts and the
+            # sync fell back to the splits, as it should
+            flags.append("split_fallback" if row.samples and row.splits else "missing_laps")
+    return flags
 
-    if not activities:
-        print("O banco está vazio.")
-        return
+def check_ingestion_summary(as_json=False):
+    # as_json prints one json object per line (ndjson), the last one is the summary
+    if not as_json:
+        print("-" * 50)
+        print(get_db_info())
+        print("-" * 50)
+        print(f"{'ID':<15} | {'Nome':<20} | {'Tipo':<12} | {'Splits':<7} | {'Laps':<7} | {'Streams':<7} | Flags")
+        print("-" * 100)
 
-    print(f"{'ID':<15} | {'Nome':<20} | {'Tipo':<10} | {'Splits':<7} | {'Streams':<7}")
-    print("-" * 70)
+    total = 0
+    flagged = Counter()
 
-    for act in activities:
-        # Conta quantos splits e quantos segundos existem para esta atividade
-        num_splits = session.query(func.count(ActivitySplit.id)).filter_by(activity_id=act.id).scalar()
-        num_streams = session.query(func.count(ActivitySecond.id)).filter_by(activity_id=act.id).scalar()
+    # uma única query, as linhas chegam em blocos
+    for row in iter_ingestion_status():
+        flags = ingestion_flags(row)
+        total += 1
+        flagged.update(flags)
+        
+        if as_json:
+            print(json.dumps({
+                "type": "activity",
+                "id": row.id,
+                "name": row.name,
+                "workout_type": row.workout_type,
+                "start_date": row.start_date.isoformat() if row.start_date else None,
+                "splits": row.splits,
+                "laps": row.laps,
+                "samples": row.samples,
+                "flags": flags,
+            }, ensure_ascii=False))
+            continue
         
         # Formata os nomes longos para não quebrar a tabela
-        name = (act.name[:17] + '..') if len(act.name) > 17 else act.name
+        name = (row.name[:17] + '..') if len(row.name) > 17 else row.name
         
-        print(f"{act.id:<15} | {name:<20} | {act.workout_type or 'run':<10} | {num_splits:<7} | {num_streams:<7}")
+        print(f"{row.id:<15} | {name:<20} | {row.workout_type or 'run':<12} | {row.splits:<7} | {row.laps:<7} | {row.samples:<7} | {', '.join(flags)}")
 
-    session.close()
+    if as_json:
+        print(json.dumps({
+            "type": "summary",
+            "activities": total,
+            "missing_streams": flagged["missing_streams"],
+            "missing_laps": flagged["missing_laps"],
+            "split_fallback": flagged["split_fallback"],
+        }))
+    elif not total:
+        print("O banco está vazio.")
+    else:
+        print("-" * 100)
+        print(f"{total} activities, {flagged['missing_streams']} missing streams, {flagged['missing_laps']} missing laps, {flagged['split_fallback']} split fallbacks")
 
 if __name__ == "__main__":
-    check_ingestion_summary()
\ No newline at end of file
+    check_ingestion_summary()
@@ -1,15 +1,10 @@
-import requests
-import time
-
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from collector.utils import BASE_URL , get_headers
+from collector.transport import get_json
 
 def fetch_activities(per_page = 30, page = 1, after=None):
-    headers = get_headers()
-    
     params = {
         "per_page": per_page,
         "page": page
@@ -18,17 +13,9 @@ def fetch_activities(per_page = 30, page = 1, after=None):
     if after:
         params["after"] = after
     
-    response = requests.get(
-        f"{BASE_URL}/athlete/activities",
-        headers=headers,
-        params=params
-    )
-    
-    response.raise_for_status()
-    return response.json()
+    return get_json("/athlete/activities", params=params)
 
-def get_all_activities(per_page = 200, after=None):
-    all_activities = []
+def iter_activity_pages(per_page = 200, after=None):
     page = 1
     
     while True:
@@ -38,22 +25,21 @@ def get_all_activities(per_page = 200, after=None):
             after=after
         )
         
-        if not activities:
+        if activities:
+            yield activities
+        
+        # a short page is the last one, no need to ask for an empty page
+        if len(activities) < per_page:
             break
         
-        all_activities.extend(activities)
         page += 1
     
-    return all_activities
+def iter_activities(per_page = 200, after=None):
+    for page in iter_activity_pages(per_page=per_page, after=after):
+        yield from page
 
-def get_activity_by_id(activity_id: int, sleep_sec: float = 0.3):
-    headers = get_headers()
-    
-    response = requests.get(
-        f"{BASE_URL}/activities/{activity_id}",
-        headers=headers
-    )
-    
-    response.raise_for_status()
-    time.sleep(sleep_sec)
-    return response.json()
\ No newline at end of file
+def get_all_activities(per_page = 200, after=None):
+    return list(iter_activities(per_page=per_page, after=after))
+
+def get_activity_by_id(activity_id: int):
+    return get_json(f"/activities/{activity_id}")
\ No newline at end of file
@@ -0,0 +1,154 @@
+import threading
+import time
+
+# strava resets the short window at 0, 15, 30 and 45 past the hour and the
+# daily window at midnight UTC
+SHORT_WINDOW_SEC = 15 * 60
+DAILY_WINDOW_SEC = 24 * 60 * 60
+
+# default read limits, used until the first response tells the real ones
+DEFAULT_SHORT_LIMIT = 100
+DEFAULT_DAILY_LIMIT = 1000
+
+RATE_LIMIT_HEADERS = [
+    ("X-RateLimit-Limit", "X-RateLimit-Usage"),
+    ("X-ReadRateLimit-Limit", "X-ReadRateLimit-Usage"),
+]
+
+def parse_limit_header(value):
+    try:
+        short, daily = (int(v) for v in value.split(","))
+        return short, daily
+    except (AttributeError, ValueError):
+        return None
+
+class RateLimitGovernor:
+    def __init__(self, short_limit=DEFAULT_SHORT_LIMIT, daily_limit=DEFAULT_DAILY_LIMIT, reserve=2, max_429_retries=3, clock=time.time):
+        self.short_limit = short_limit
+        self.daily_limit = daily_limit
+        self.short_usage = 0
+        self.daily_usage = 0
+        self.reserve = reserve
+        self.max_429_retries = max_429_retries
+        # injectable for the tests
+        self.clock = clock
+
+        self.in_flight = 0
+        self.waiting_until = None
+        self._synced = False
+        self._cond = threading.Condition()
+        self._short_window, self._daily_window = self._windows(self.clock())
+
+    @staticmethod
+    def _windows(now):
+        return int(now // SHORT_WINDOW_SEC), int(now // DAILY_WINDOW_SEC)
+
+    def _roll_windows(self, now):
+        short_window, daily_window = self._windows(now)
+        if short_window != self._short_window:
+            self._short_window = short_window
+            self.short_usage = 0
+        if daily_window != self._daily_window:
+            self._daily_window = daily_window
+            self.daily_usage = 0
+
+    def _next_reset(self, now):
+        if self.daily_usage + self.in_flight >= self.daily_limit - self.reserve:
+            return (self._daily_window + 1) * DAILY_WINDOW_SEC
+        return (self._short_window + 1) * SHORT_WINDOW_SEC
+
+    def _has_budget(self):
+        # a single probe request goes out before the real usage is known
+        if not self._synced and self.in_flight:
+            return False
+
+        short_left = self.short_limit - self.short_usage - self.in_flight
+        daily_left = self.daily_limit - self.daily_usage - self.in_flight
+        return min(short_left, daily_left) > self.reserve
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                now = self.clock()
+                self._roll_windows(now)
+
+                if self._has_budget():
+                    self.in_flight += 1
+                    self.waiting_until = None
+                    return
+
+                if not self._synced and self.in_flight:
+                    self._cond.wait(timeout=1)
+                    continue
+
+                # out of budget: sleep only until the window resets
+                self.waiting_until = self._next_reset(now)
+                self._cond.wait(timeout=max(self.waiting_until - now, 0.1))
+
+    def release(self, response=None):
+        with self._cond:
+            self.in_flight -= 1
+            self._roll_windows(self.clock())
+
+            if response is None:
+                self.short_usage += 1
+                self.daily_usage += 1
+            else:
+                self._update_from_headers(response.headers)
+                if response.status_code == 429:
+                    self.short_usage = max(self.short_usage, self.short_limit)
+
+            self._cond.notify_all()
+
+    def _update_from_headers(self, headers):
+        limits = []
+        for limit_key, usage_key in RATE_LIMIT_HEADERS:
+            limit = parse_limit_header(headers.get(limit_key))
+            usage = parse_limit_header(headers.get(usage_key))
+            if limit and usage:
+                limits.append((limit, usage))
+
+        if not limits:
+            self.short_usage += 1
+            self.daily_usage += 1
+            return
+
+        # the tightest of the overall and read budgets wins
+        (short_limit, daily_limit), (short_usage, daily_usage) = min(
+            limits,
+            key=lambda lu: min(lu[0][0] - lu[1][0], lu[0][1] - lu[1][1])
+        )
+        self.short_limit = short_limit
+        self.daily_limit = daily_limit
+
+        # responses may arrive out of order, keep the highest usage seen
+        self.short_usage = max(self.short_usage, short_usage)
+        self.daily_usage = max(self.daily_usage, daily_usage)
+        self._synced = True
+
+    def call(self, request_fn, *args, **kwargs):
+        for _ in range(self.max_429_retries + 1):
+            self.acquire()
+            response = None
+            try:
+                response = request_fn(*args, **kwargs)
+            finally:
+                self.release(response)
+
+            if response.status_code != 429:
+                break
+
+        return response
+
+    def describe(self):
+        with self._cond:
+            status = (
+                f"15m {self.short_usage}/{self.short_limit} "
+                f"day {self.daily_usage}/{self.daily_limit}"
+            )
+            if self.waiting_until:
+                reset = time.strftime("%H:%M:%S", time.localtime(self.waiting_until))
+                status += f" (waiting until {reset})"
+            return status
+
+governor = RateLimitGovernor()
@@ -0,0 +1,95 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+
+# zstd is optional, gzip from the stdlib is the fallback
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+RAW_CACHE_DIR = os.getenv("STRAVA_RAW_CACHE_DIR", os.path.join(current_dir, "..", "raw_cache"))
+
+OBJECTS_DIR = os.path.join(RAW_CACHE_DIR, "objects")
+REFS_DIR = os.path.join(RAW_CACHE_DIR, "refs")
+
+def _atomic_write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+def _object_path(digest, ext):
+    return os.path.join(OBJECTS_DIR, digest[:2], f"{digest}.json.{ext}")
+
+def _compress(raw):
+    if zstandard:
+        return zstandard.ZstdCompressor(level=10).compress(raw), "zst"
+    return gzip.compress(raw, compresslevel=6), "gz"
+
+def put_object(payload):
+    # content addressed: identical responses are stored once
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+    digest = hashlib.sha256(raw).hexdigest()
+    
+    for ext in ("zst", "gz"):
+        if os.path.exists(_object_path(digest, ext)):
+            return digest
+    
+    data, ext = _compress(raw)
+    _atomic_write(_object_path(digest, ext), data)
+    return digest
+
+def get_object(digest):
+    zst_path = _object_path(digest, "zst")
+    if os.path.exists(zst_path):
+        if not zstandard:
+            raise RuntimeError("zstandard is required to read this raw cache entry")
+        with open(zst_path, "rb") as f:
+            return json.loads(zstandard.ZstdDecompressor().decompress(f.read()))
+    
+    gz_path = _object_path(digest, "gz")
+    if os.path.exists(gz_path):
+        with open(gz_path, "rb") as f:
+            return json.loads(gzip.decompress(f.read()))
+    
+    return None
+
+def save_raw_activity(activity_id, detail, streams=None):
+    ref = {
+        "detail": put_object(detail),
+        "streams": put_object(streams) if streams is not None else None
+    }
+    _atomic_write(os.path.join(REFS_DIR, f"{activity_id}.json"), json.dumps(ref).encode())
+
+def load_raw_activity(activity_id, with_streams=True):
+    ref_path = os.path.join(REFS_DIR, f"{activity_id}.json")
+    if not os.path.exists(ref_path):
+        return None
+    
+    with open(ref_path) as f:
+        ref = json.load(f)
+    
+    detail = get_object(ref["detail"])
+    if detail is None:
+        return None
+    
+    # the streams are the large object, skipped when only the detail is needed
+    streams = get_object(ref["streams"]) if with_streams and ref.get("streams") else None
+    return detail, streams
+
+def iter_cached_activity_ids():
+    if not os.path.isdir(REFS_DIR):
+        return
+    
+    for name in sorted(os.listdir(REFS_DIR)):
+        if name.endswith(".json"):
+            yield int(name[:-len(".json")])
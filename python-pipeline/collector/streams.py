@@ -1,25 +1,13 @@
-import requests
-
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from collector.utils import BASE_URL, get_headers
+from collector.transport import get_json
 
 def fetch_activity_streams(activity_id):
-    headers =  get_headers()
-    
     params = {
         "keys": "time,distance,velocity_smooth,heartrate,altitude",
         "key_by_type": "true"
     }
     
-    response = requests.get(
-        f"{BASE_URL}/activities/{activity_id}/streams",
-        headers=headers,
-        params=params
-    )
-    
-    response.raise_for_status()
-    return response.json()
-    
\ No newline at end of file
+    return get_json(f"/activities/{activity_id}/streams", params=params)
\ No newline at end of file
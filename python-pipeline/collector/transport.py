@@ -0,0 +1,59 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from collector.utils import BASE_URL, get_headers
+from collector.rate_limit import governor
+
+# (connect, read) seconds
+DEFAULT_TIMEOUT = (5, 30)
+POOL_SIZE = int(os.getenv("STRAVA_HTTP_POOL_SIZE", "16"))
+MAX_RETRIES = 5
+
+def build_session(pool_size=POOL_SIZE, max_retries=MAX_RETRIES):
+    # 429 is left to the rate limit governor, only transient errors are retried here.
+    # urllib3 would also retry a 429 that carries Retry-After, sleeping for it
+    # behind the governor's back, so the header is ignored
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=0.5,
+        backoff_jitter=0.5,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=False,
+        raise_on_status=False
+    )
+    
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=retry
+    )
+    
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "Accept": "application/json",
+        "Accept-Encoding": "gzip, deflate"
+    })
+    return session
+
+session = build_session()
+
+def get_json(path, params=None, timeout=DEFAULT_TIMEOUT):
+    # the headers are built once the governor lets the request go, a token
+    # that expires while it waits for the next window is refreshed first
+    response = governor.call(lambda: session.get(
+        f"{BASE_URL}{path}",
+        headers=get_headers(),
+        params=params,
+        timeout=timeout
+    ))
+    
+    response.raise_for_status()
+    return response.json()
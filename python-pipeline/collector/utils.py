@@ -4,7 +4,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from auth.token_manager import get_valid_access_token
 
-BASE_URL = "https://www.strava.com/api/v3"
+# overridable so the sync can run against a local mock (benchmarks/)
+BASE_URL = os.getenv("STRAVA_API_BASE_URL", "https://www.strava.com/api/v3")
 
 def get_headers():
     access_token = get_valid_access_token()
@@ -0,0 +1,150 @@
+from collections import Counter
+from sqlalchemy import func, insert
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database.config import SessionLocal
+from database.models import Activity, ActivitySplit, WeeklySummary, DailyLoad
+
+from analysis.formatters import Z2_MIN, Z2_MAX, ZONES
+from analysis.processors import (
+    process_z2_percentage,
+    process_z2_volume,
+    process_weekly_training_load,
+    process_daily_training_load
+)
+
+# same buckets as the analysis queries (local calendar, stored at ingest)
+WEEK_START = Activity.week_start
+DAY = Activity.local_date
+
+def activity_buckets(session, activity_ids):
+    rows = session.query(WEEK_START, DAY).filter(Activity.id.in_(list(activity_ids))).all()
+    return {row[0] for row in rows if row[0]}, {row[1] for row in rows if row[1]}
+
+def _in_buckets(query, column, buckets):
+    return query if buckets is None else query.filter(column.in_(sorted(buckets)))
+
+def _activity_totals(session, week_starts=None):
+    query = (
+        session.query(
+            WEEK_START,
+            func.count(Activity.id),
+            func.sum(Activity.distance_km),
+            func.sum(Activity.moving_time_sec)
+        )
+        .filter(Activity.type == "Run")
+    )
+    return _in_buckets(query, WEEK_START, week_starts).group_by(WEEK_START).all()
+
+def _weekly_splits(session, week_starts=None):
+    query = (
+        session.query(WEEK_START, ActivitySplit.pace_min_km, ActivitySplit.distance_km)
+        .join(Activity, Activity.id == ActivitySplit.activity_id)
+    )
+    return _in_buckets(query, WEEK_START, week_starts).all()
+
+def _daily_splits(session, days=None):
+    query = (
+        session.query(DAY.label("date"), ActivitySplit.pace_min_km, ActivitySplit.distance_km)
+        .join(Activity, Activity.id == ActivitySplit.activity_id)
+        .filter(Activity.type == "Run")
+    )
+    return _in_buckets(query, DAY, days).all()
+
+def _empty_week(week_start):
+    record = {
+        "week_start": week_start,
+        "activity_count": 0,
+        "total_km": 0.0,
+        "total_time_sec": 0.0,
+        "split_count": 0,
+        "split_km": 0.0,
+        "z2_km": 0.0,
+        "z2_open_km": 0.0,
+        "training_load": 0.0,
+    }
+    record.update({f"{name.lower()}_load": 0.0 for name, *_ in ZONES})
+    return record
+
+def build_weekly_records(activity_rows, split_rows):
+    # the chart processors themselves compute the split metrics, so the
+    # stored numbers follow the same rules as a full recompute
+    records = {}
+    for week_start, count, total_km, total_time_sec in activity_rows:
+        record = records.setdefault(week_start, _empty_week(week_start))
+        record.update({"activity_count": count, "total_km": total_km or 0.0, "total_time_sec": total_time_sec or 0.0})
+    
+    if not split_rows:
+        return list(records.values())
+    
+    def week_record(ts):
+        week_start = ts.strftime("%Y-%m-%d")
+        return records.setdefault(week_start, _empty_week(week_start))
+    
+    for week_start, count in Counter(row[0] for row in split_rows).items():
+        records.setdefault(week_start, _empty_week(week_start))["split_count"] = count
+    
+    for row in process_z2_percentage(split_rows, Z2_MIN, Z2_MAX).itertuples():
+        week_record(row.week_start).update({"split_km": row.total_km, "z2_open_km": row.z2_km})
+    
+    for row in process_z2_volume(split_rows, Z2_MIN, Z2_MAX).itertuples():
+        week_record(row.week_start)["z2_km"] = row.z2_km
+    
+    for row in process_weekly_training_load(split_rows, ZONES).to_dict("records"):
+        record = week_record(row["week_start"])
+        record["training_load"] = row["training_load"]
+        for name, *_ in ZONES:
+            record[f"{name.lower()}_load"] = row[name]
+    
+    return list(records.values())
+
+def build_daily_records(split_rows):
+    daily_load = process_daily_training_load(split_rows, ZONES)
+    return [
+        {"date": row["date"].strftime("%Y-%m-%d"), "training_load": row["training_load"]}
+        for row in daily_load.to_dict("records")
+    ]
+
+def refresh_aggregates(session, week_starts, days):
+    # every touched bucket is recomputed from its raw rows, so refreshing the
+    # same bucket twice (or after a reprocess) gives the same result. all the
+    # buckets of a batch go through the processors in one pass, they group
+    # by week and day themselves
+    if week_starts:
+        session.query(WeeklySummary).filter(WeeklySummary.week_start.in_(sorted(week_starts))).delete(synchronize_session=False)
+        records = build_weekly_records(_activity_totals(session, week_starts), _weekly_splits(session, week_starts))
+        if records:
+            session.execute(insert(WeeklySummary.__table__), records)
+    
+    if days:
+        session.query(DailyLoad).filter(DailyLoad.date.in_(sorted(days))).delete(synchronize_session=False)
+        records = build_daily_records(_daily_splits(session, days))
+        if records:
+            session.execute(insert(DailyLoad.__table__), records)
+
+def rebuild_aggregates_in(session):
+    session.query(WeeklySummary).delete(synchronize_session=False)
+    session.query(DailyLoad).delete(synchronize_session=False)
+    
+    weekly = build_weekly_records(_activity_totals(session), _weekly_splits(session))
+    daily = build_daily_records(_daily_splits(session))
+    if weekly:
+        session.execute(insert(WeeklySummary.__table__), weekly)
+    if daily:
+        session.execute(insert(DailyLoad.__table__), daily)
+    return len(weekly), len(daily)
+
+def rebuild_aggregates():
+    session = SessionLocal()
+    try:
+        weeks_count, days_count = rebuild_aggregates_in(session)
+        session.commit()
+        print(f"Aggregates rebuilt: {weeks_count} weeks, {days_count} days")
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database.config import read_engine
+
+DEFAULT_CHUNK_SIZE = int(os.getenv("STRAVA_FETCH_CHUNK_SIZE", "20000"))
+
+# dtypes used by the analysis queries. nullable integers are read as float
+# (NULL -> nan) and YYYY-MM-DD strings straight into datetime64 (NULL -> NaT)
+FLOAT = "float64"
+DAY = "datetime64[D]"
+
+def _compile(statement):
+    compiled = statement.compile(dialect=read_engine.dialect, compile_kwargs={"render_postcompile": True})
+    params = [compiled.params[name] for name in (compiled.positiontup or [])]
+    return str(compiled), params
+
+def fetch_arrays(statement, dtypes, chunk_size=DEFAULT_CHUNK_SIZE):
+    # runs a select on the read only engine and returns {column: ndarray},
+    # dtypes lists the columns in select order.
+    # the raw cursor is read in fetchmany chunks and every chunk is turned into
+    # one typed array per column, so peak memory is a single chunk of tuples
+    # plus the arrays, with no orm or Row object per result row
+    sql, params = _compile(statement)
+    names = list(dtypes)
+    chunks = {name: [] for name in names}
+    
+    connection = read_engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for name, values in zip(names, zip(*rows)):
+                chunks[name].append(np.array(values, dtype=dtypes[name]))
+        cursor.close()
+    finally:
+        connection.close()
+    
+    return {
+        name: np.concatenate(parts) if parts else np.empty(0, dtype=dtypes[name])
+        for name, parts in chunks.items()
+    }
+
+def fetch_frame(statement, dtypes, chunk_size=DEFAULT_CHUNK_SIZE):
+    return pd.DataFrame(fetch_arrays(statement, dtypes, chunk_size), columns=list(dtypes))
@@ -1,16 +1,76 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import declarative_base, sessionmaker
 import os
+import sqlite3
 
 IS_TEST_MODE = os.environ.get("STRAVA_TEST_MODE") == "1"
 DB_NAME = "strava_test.db" if IS_TEST_MODE else "strava.db"
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATABASE_PATH = os.path.join(BASE_DIR, "..", DB_NAME)
+# STRAVA_DATABASE_PATH points at another file (the tests use a temporary one)
+DATABASE_PATH = os.environ.get("STRAVA_DATABASE_PATH") or os.path.join(BASE_DIR, "..", DB_NAME)
 DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
 
+# "performance" applies the pragmas below on every connection, "default"
+# leaves sqlite's own settings (rollback journal, full fsync per commit)
+SQLITE_PROFILE = os.environ.get("STRAVA_SQLITE_PROFILE", "performance")
+SQLITE_CACHE_MB = int(os.environ.get("STRAVA_SQLITE_CACHE_MB", "64"))
+SQLITE_MMAP_MB = int(os.environ.get("STRAVA_SQLITE_MMAP_MB", "256"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("STRAVA_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+def _apply_pragmas(dbapi_connection, read_only=False):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    
+    if SQLITE_PROFILE == "performance":
+        if not read_only:
+            # incremental auto_vacuum only takes effect on a new database,
+            # older ones are converted by the first retention run
+            cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            # WAL lets readers (plots) run while a sync is writing, NORMAL
+            # only fsyncs at checkpoints instead of on every commit
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        # negative cache_size is in KiB
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_MB * 1024}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    
+    if read_only:
+        cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
 engine = create_engine(DATABASE_URL, echo=False)
+
+# let sqlalchemy emit BEGIN itself instead of pysqlite, otherwise SAVEPOINTs
+# (used by the batched writer) don't nest inside the transaction
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+    _apply_pragmas(dbapi_connection)
+
+@event.listens_for(engine, "begin")
+def _emit_begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
+def _connect_read_only():
+    # mode=ro can't create the file, on a fresh checkout the read/write engine
+    # creates and migrates it before the first read
+    if not os.path.exists(DATABASE_PATH):
+        from database.migrations import upgrade
+        upgrade(verbose=False)
+    return sqlite3.connect(f"file:{DATABASE_PATH}?mode=ro", uri=True, check_same_thread=False)
+
+# read only engine for the analysis queries, in WAL mode it never waits for
+# (or blocks) the sync writer
+read_engine = create_engine(DATABASE_URL, creator=_connect_read_only, echo=False)
+
+@event.listens_for(read_engine, "connect")
+def _on_read_connect(dbapi_connection, connection_record):
+    _apply_pragmas(dbapi_connection, read_only=True)
+
 SessionLocal = sessionmaker(bind=engine)
+ReadSessionLocal = sessionmaker(bind=read_engine)
 Base = declarative_base()
 
 def get_db_info():
@@ -0,0 +1,215 @@
+import numpy as np
+import pandas as pd
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# optional analysis backend, only needed by plot --backend duckdb
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+from database.columnar import FLOAT, DAY
+from processors.export_parquet import PARQUET_DIR, EXPORT_TABLES
+
+from analysis.formatters import Z2_MIN, Z2_MAX, ZONES
+
+# same fetchers (names, arguments and returned frames) as database/queries.py,
+# computed by duckdb over the parquet dataset written by export-parquet.
+# the weekly summary and daily load are aggregated here in sql, with the
+# same rules as database/aggregates.py, instead of read from sqlite
+
+_connection = None
+
+def _connect():
+    global _connection
+    if duckdb is None:
+        raise RuntimeError("duckdb is required for the duckdb analysis backend")
+    
+    if _connection is None:
+        if not os.path.isdir(os.path.join(PARQUET_DIR, "activities")):
+            raise RuntimeError(f"No parquet dataset in {PARQUET_DIR}, run export-parquet first")
+        
+        connection = duckdb.connect()
+        for name in EXPORT_TABLES:
+            if not os.path.isdir(os.path.join(PARQUET_DIR, name)):
+                continue
+            path = os.path.join(PARQUET_DIR, name, "**", "*.parquet").replace("'", "''")
+            connection.execute(
+                f"CREATE VIEW {name} AS SELECT * FROM read_parquet('{path}', hive_partitioning = true)"
+            )
+        _connection = connection
+    return _connection
+
+def _frame(sql, params, dtypes):
+    result = _connect().execute(sql, params).df()
+    return pd.DataFrame(
+        {name: np.asarray(result[name], dtype=dtype) for name, dtype in dtypes.items()},
+        columns=list(dtypes)
+    )
+
+def _in_range(column, since=None, until=None):
+    # sql condition and parameters, like _in_range in database/queries.py
+    conditions = ["TRUE"]
+    params = []
+    if since:
+        conditions.append(f"{column} >= ?")
+        params.append(since)
+    if until:
+        conditions.append(f"{column} <= ?")
+        params.append(until)
+    return " AND ".join(conditions), params
+
+def fetch_run_week_range(until=None):
+    condition, params = _in_range("week_start", until=until)
+    return _connect().execute(
+        f"SELECT min(week_start), max(week_start) FROM activities WHERE type = 'Run' AND {condition}",
+        params
+    ).fetchone()
+
+def fetch_recent_run_weeks(count, until=None):
+    condition, params = _in_range("week_start", until=until)
+    rows = _connect().execute(
+        f"SELECT DISTINCT week_start FROM activities WHERE type = 'Run' AND {condition} "
+        "ORDER BY week_start DESC LIMIT ?",
+        params + [count]
+    ).fetchall()
+    return [row[0] for row in rows]
+
+def fetch_load_week_range(until=None):
+    condition, params = _in_range("a.week_start", until=until)
+    return _connect().execute(
+        "SELECT min(a.week_start), max(a.week_start) FROM splits s "
+        f"JOIN activities a ON a.id = s.activity_id WHERE {condition}",
+        params
+    ).fetchone()
+
+def fetch_recent_load_weeks(count, until=None):
+    condition, params = _in_range("a.week_start", until=until)
+    zone_loads = [f"{name.lower()}_load" for name, *_ in ZONES]
+    rows = _connect().execute(
+        f"""
+        WITH split_rows AS (
+            SELECT a.week_start, s.pace_min_km, s.distance_km FROM splits s
+            JOIN activities a ON a.id = s.activity_id WHERE {condition}
+        ),
+        split_weeks AS (
+            SELECT week_start, {", ".join(_zone_load_columns())} FROM split_rows GROUP BY week_start
+        )
+        SELECT week_start FROM split_weeks WHERE {" + ".join(zone_loads)} > 0
+        ORDER BY week_start DESC LIMIT ?
+        """,
+        params + [count]
+    ).fetchall()
+    return [row[0] for row in rows]
+
+def fetch_individual_activity_data(since=None, until=None):
+    condition, params = _in_range("week_start", since, until)
+    return _frame(
+        "SELECT distance_km, moving_time_sec FROM activities "
+        f"WHERE type = 'Run' AND distance_km > 0 AND moving_time_sec > 0 AND {condition}",
+        params,
+        {"distance_km": FLOAT, "moving_time_sec": FLOAT}
+    )
+
+def fetch_weekly_data(since=None, until=None):
+    condition, params = _in_range("week_start", since, until)
+    return _frame(
+        "SELECT week_start, sum(distance_km) AS total_km, sum(moving_time_sec) AS total_time_sec "
+        f"FROM activities WHERE type = 'Run' AND {condition} GROUP BY week_start ORDER BY week_start",
+        params,
+        {"week_start": DAY, "total_km": FLOAT, "total_time_sec": FLOAT}
+    )
+
+def fetch_split_pace(since=None, until=None):
+    condition, params = _in_range("a.week_start", since, until)
+    return _frame(
+        "SELECT s.pace_min_km, s.distance_km FROM splits s "
+        f"JOIN activities a ON a.id = s.activity_id WHERE {condition}",
+        params,
+        {"pace_min_km": FLOAT, "distance_km": FLOAT}
+    )
+
+def fetch_weekly_splits(since=None, until=None):
+    condition, params = _in_range("a.week_start", since, until)
+    return _frame(
+        "SELECT a.week_start, s.pace_min_km, s.distance_km FROM splits s "
+        f"JOIN activities a ON a.id = s.activity_id WHERE {condition}",
+        params,
+        {"week_start": DAY, "pace_min_km": FLOAT, "distance_km": FLOAT}
+    )
+
+def fetch_daily_splits(since=None, until=None):
+    condition, params = _in_range("a.local_date", since, until)
+    return _frame(
+        "SELECT a.local_date AS date, s.pace_min_km, s.distance_km FROM splits s "
+        f"JOIN activities a ON a.id = s.activity_id WHERE a.type = 'Run' AND {condition}",
+        params,
+        {"date": DAY, "pace_min_km": FLOAT, "distance_km": FLOAT}
+    )
+
+def _zone_load_columns():
+    # process_weekly_training_load: every zone sums its own splits (bounds
+    # inclusive), the training load is the sum of the zones
+    return [
+        f"sum(CASE WHEN pace_min_km >= {z_min} AND pace_min_km <= {z_max} THEN distance_km ELSE 0 END) * {weight} "
+        f"AS {name.lower()}_load"
+        for name, z_min, z_max, weight in ZONES
+    ]
+
+def fetch_weekly_summary(since=None, until=None):
+    activity_condition, activity_params = _in_range("week_start", since, until)
+    split_condition, split_params = _in_range("a.week_start", since, until)
+    zone_loads = [f"{name.lower()}_load" for name, *_ in ZONES]
+    columns = [
+        "activity_count", "total_km", "total_time_sec",
+        "split_count", "split_km", "z2_km", "z2_open_km", *zone_loads
+    ]
+    
+    sql = f"""
+        WITH totals AS (
+            SELECT week_start, count(*) AS activity_count,
+                sum(distance_km) AS total_km, sum(moving_time_sec) AS total_time_sec
+            FROM activities WHERE type = 'Run' AND {activity_condition}
+            GROUP BY week_start
+        ),
+        split_rows AS (
+            SELECT a.week_start, s.pace_min_km, s.distance_km FROM splits s
+            JOIN activities a ON a.id = s.activity_id WHERE {split_condition}
+        ),
+        split_weeks AS (
+            SELECT week_start, count(*) AS split_count, sum(distance_km) AS split_km,
+                sum(CASE WHEN pace_min_km >= {Z2_MIN} AND pace_min_km <= {Z2_MAX} THEN distance_km ELSE 0 END) AS z2_km,
+                sum(CASE WHEN pace_min_km > {Z2_MIN} AND pace_min_km <= {Z2_MAX} THEN distance_km ELSE 0 END) AS z2_open_km,
+                {", ".join(_zone_load_columns())}
+            FROM split_rows GROUP BY week_start
+        )
+        SELECT week_start,
+            {", ".join(f"coalesce({column}, 0) AS {column}" for column in columns)},
+            coalesce({" + ".join(zone_loads)}, 0) AS training_load
+        FROM totals FULL OUTER JOIN split_weeks USING (week_start)
+        ORDER BY week_start
+    """
+    dtypes = {"week_start": DAY, **{column: FLOAT for column in columns}, "training_load": FLOAT}
+    return _frame(sql, activity_params + split_params, dtypes)
+
+def fetch_weekly_summary_totals(since=None, until=None):
+    return fetch_weekly_data(since, until)
+
+def fetch_daily_load(since=None, until=None):
+    # process_daily_training_load: a split takes the weight of the last zone
+    # that contains its pace, hence the zones in reverse order
+    weights = " ".join(
+        f"WHEN s.pace_min_km >= {z_min} AND s.pace_min_km <= {z_max} THEN {weight}"
+        for _, z_min, z_max, weight in reversed(ZONES)
+    )
+    condition, params = _in_range("a.local_date", since, until)
+    return _frame(
+        f"SELECT a.local_date AS date, sum(s.distance_km * CASE {weights} ELSE 0 END) AS training_load "
+        "FROM splits s JOIN activities a ON a.id = s.activity_id "
+        f"WHERE a.type = 'Run' AND {condition} GROUP BY a.local_date ORDER BY a.local_date",
+        params,
+        {"date": DAY, "training_load": FLOAT}
+    )
@@ -0,0 +1,249 @@
+from datetime import datetime, timezone
+from sqlalchemy import text
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy.orm import Session
+
+from database.config import Base, engine, get_db_info
+from database.aggregates import rebuild_aggregates_in
+
+from collector.raw_cache import load_raw_activity
+from processors.db_mappers.activities import map_local_buckets
+
+# create_all only adds missing tables, the migrations bring the indexes of
+# existing tables up to date. every migration is idempotent (IF NOT EXISTS)
+# and mirrored in the models' __table_args__ with the same names, so a fresh
+# database upgrades as a no-op
+
+def _hot_query_indexes(connection):
+    # fetch_weekly_data / fetch_individual_activity_data filter on type and
+    # only read these columns, so the index covers them
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_activities_type_start_date "
+        "ON activities (type, start_date, distance_km, moving_time_sec)"
+    )
+    # get_last_activity_timestamp orders by start_date without a type filter
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_activities_start_date ON activities (start_date)"
+    )
+    # split joins read pace and distance straight from the index
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_activity_splits_activity_pace_distance "
+        "ON activity_splits (activity_id, pace_min_km, distance_km)"
+    )
+
+def _unique_activity_seconds(connection):
+    # older syncs could store the same second twice, keep the first row
+    connection.exec_driver_sql(
+        "DELETE FROM activity_seconds WHERE id NOT IN ("
+        "SELECT MIN(id) FROM activity_seconds GROUP BY activity_id, second_index)"
+    )
+    connection.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_activity_seconds_activity_second "
+        "ON activity_seconds (activity_id, second_index)"
+    )
+
+def _unique_splits_and_laps(connection):
+    # rows stored twice by a retried sync, keep the first one. laps without
+    # index or type can't collide in the unique index and are left alone
+    connection.exec_driver_sql(
+        "DELETE FROM activity_splits WHERE id NOT IN ("
+        "SELECT MIN(id) FROM activity_splits GROUP BY activity_id, split_index)"
+    )
+    connection.exec_driver_sql(
+        "DELETE FROM activity_laps WHERE lap_index IS NOT NULL AND lap_type IS NOT NULL AND id NOT IN ("
+        "SELECT MIN(id) FROM activity_laps WHERE lap_index IS NOT NULL AND lap_type IS NOT NULL "
+        "GROUP BY activity_id, lap_index, lap_type)"
+    )
+    connection.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_activity_splits_activity_split "
+        "ON activity_splits (activity_id, split_index)"
+    )
+    connection.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_activity_laps_activity_lap "
+        "ON activity_laps (activity_id, lap_index, lap_type)"
+    )
+    
+    # the training load no longer drops identical splits of a week, which
+    # were real splits once the duplicates are gone
+    _backfill_aggregates(connection)
+
+def _table_columns(connection, table):
+    return {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table})")}
+
+def _backfill_aggregates(connection):
+    # weekly_summary / daily_load were created empty by create_all. the
+    # aggregates bucket on the local date columns, without them 0004 does it
+    if "week_start" not in _table_columns(connection, "activities"):
+        return
+    
+    session = Session(bind=connection)
+    try:
+        rebuild_aggregates_in(session)
+        session.flush()
+    finally:
+        session.close()
+
+def _add_column_if_missing(connection, table, column, column_type):
+    if column not in _table_columns(connection, table):
+        connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+def _local_date_buckets(connection):
+    _add_column_if_missing(connection, "activities", "local_date", "VARCHAR")
+    _add_column_if_missing(connection, "activities", "week_start", "VARCHAR")
+    
+    # start_date_local only exists in the raw response, activities that were
+    # never cached fall back to the utc start_date
+    rows = connection.exec_driver_sql(
+        "SELECT id, start_date FROM activities WHERE local_date IS NULL OR week_start IS NULL"
+    ).all()
+    updates = []
+    for activity_id, start_date in rows:
+        cached = load_raw_activity(activity_id)
+        detail = cached[0] if cached else {"start_date": str(start_date)}
+        local_date, week_start = map_local_buckets(detail)
+        updates.append({"id": activity_id, "local_date": local_date, "week_start": week_start})
+    
+    if updates:
+        connection.execute(
+            text("UPDATE activities SET local_date = :local_date, week_start = :week_start WHERE id = :id"),
+            updates
+        )
+    
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_activities_type_week_start "
+        "ON activities (type, week_start, distance_km, moving_time_sec)"
+    )
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_activities_local_date ON activities (local_date)"
+    )
+    # replaced by the week_start covering index above
+    connection.exec_driver_sql("DROP INDEX IF EXISTS ix_activities_type_start_date")
+    
+    # the aggregates move from utc to local buckets
+    _backfill_aggregates(connection)
+
+def _stream_resolution(connection):
+    # every stream stored so far is at full (1 s) resolution
+    _add_column_if_missing(connection, "activity_streams", "resolution_sec", "INTEGER")
+    connection.exec_driver_sql("UPDATE activity_streams SET resolution_sec = 1 WHERE resolution_sec IS NULL")
+
+# (version, description, upgrade function, query plan checks)
+# a check is (query, index the plan must use)
+MIGRATIONS = [
+    ("0001", "composite and covering indexes for the analysis queries", _hot_query_indexes, [
+        (
+            "SELECT * FROM activities ORDER BY start_date DESC LIMIT 1",
+            "ix_activities_start_date"
+        ),
+        (
+            "SELECT date(a.start_date), s.pace_min_km, s.distance_km FROM activity_splits s "
+            "JOIN activities a ON a.id = s.activity_id WHERE a.type = 'Run'",
+            "ix_activity_splits_activity_pace_distance"
+        ),
+    ]),
+    ("0002", "unique (activity_id, second_index) on activity_seconds", _unique_activity_seconds, [
+        (
+            "SELECT second_index, distance_total_m FROM activity_seconds "
+            "WHERE activity_id = 1 ORDER BY second_index",
+            "uq_activity_seconds_activity_second"
+        ),
+    ]),
+    ("0003", "backfill weekly_summary and daily_load", _backfill_aggregates, []),
+    ("0004", "local_date and week_start buckets on activities", _local_date_buckets, [
+        (
+            "SELECT week_start, sum(distance_km), sum(moving_time_sec) FROM activities "
+            "WHERE type = 'Run' GROUP BY week_start ORDER BY week_start",
+            "ix_activities_type_week_start"
+        ),
+        (
+            "SELECT distance_km, moving_time_sec FROM activities "
+            "WHERE type = 'Run' AND distance_km > 0 AND moving_time_sec > 0",
+            "ix_activities_type_week_start"
+        ),
+        (
+            "SELECT local_date FROM activities WHERE local_date = '2025-01-01'",
+            "ix_activities_local_date"
+        ),
+    ]),
+    ("0005", "unique split and lap keys for the upsert writer", _unique_splits_and_laps, [
+        (
+            "SELECT * FROM activity_splits WHERE activity_id = 1 AND split_index = 1",
+            "uq_activity_splits_activity_split"
+        ),
+        (
+            "SELECT * FROM activity_laps WHERE activity_id = 1 AND lap_index = 1 AND lap_type = 'WORKOUT'",
+            "uq_activity_laps_activity_lap"
+        ),
+    ]),
+    ("0006", "resolution_sec on activity_streams for the retention policy", _stream_resolution, []),
+]
+
+def _ensure_migrations_table(connection):
+    connection.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version VARCHAR PRIMARY KEY, description VARCHAR, applied_at DATETIME)"
+    )
+
+def applied_versions(connection):
+    _ensure_migrations_table(connection)
+    return {row[0] for row in connection.exec_driver_sql("SELECT version FROM schema_migrations")}
+
+def upgrade(verbose=True):
+    Base.metadata.create_all(engine)
+    
+    # each migration commits with its schema_migrations row, so an interrupted
+    # upgrade resumes from the first pending one
+    with engine.begin() as connection:
+        done = applied_versions(connection)
+    
+    applied = []
+    for version, description, upgrade_fn, _ in MIGRATIONS:
+        if version in done:
+            continue
+        
+        with engine.begin() as connection:
+            upgrade_fn(connection)
+            connection.execute(
+                text("INSERT INTO schema_migrations (version, description, applied_at) VALUES (:v, :d, :t)"),
+                {"v": version, "d": description, "t": datetime.now(timezone.utc)}
+            )
+        applied.append(version)
+        if verbose:
+            print(f"Applied migration {version}: {description}")
+    
+    if verbose and not applied:
+        print("Database schema is up to date")
+    return applied
+
+def explain_query_plan(connection, query):
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {query}").all()
+    return " | ".join(row[-1] for row in rows)
+
+def check_query_plans(verbose=True):
+    # asserts that every migration's hot queries really use its indexes
+    failures = []
+    with engine.connect() as connection:
+        for version, description, _, checks in MIGRATIONS:
+            for query, index_name in checks:
+                plan = explain_query_plan(connection, query)
+                ok = index_name in plan
+                if not ok:
+                    failures.append((version, index_name, plan))
+                if verbose:
+                    print(f"[{'OK' if ok else 'FAIL'}] {version} {index_name}: {plan}")
+    return failures
+
+def run_migrations(check=False):
+    print(get_db_info())
+    print("-" * 30)
+    upgrade()
+    
+    if check:
+        failures = check_query_plans()
+        if failures:
+            raise SystemExit(f"{len(failures)} query plan checks failed")
+        print("All query plan checks passed")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, LargeBinary, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 
 import sys
@@ -7,8 +7,15 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from database.config import Base
 
+# composite indexes are also created by database/migrations.py for existing
+# databases, keep the names in sync
 class Activity(Base):
     __tablename__ = "activities"
+    __table_args__ = (
+        Index("ix_activities_start_date", "start_date"),
+        Index("ix_activities_type_week_start", "type", "week_start", "distance_km", "moving_time_sec"),
+        Index("ix_activities_local_date", "local_date"),
+    )
     
     id = Column(Integer, primary_key=True)
     name = Column(String)
@@ -16,6 +23,9 @@ class Activity(Base):
     type = Column(String)
     sport_type = Column(String)
     start_date = Column(DateTime)
+    # athlete's local calendar buckets (YYYY-MM-DD), from start_date_local
+    local_date = Column(String)
+    week_start = Column(String)
     distance_km = Column(Float)
     moving_time_sec = Column(Float)
     pace_raw = Column(Float)
@@ -25,10 +35,15 @@ class Activity(Base):
     
     splits = relationship("ActivitySplit", back_populates="activity", cascade="all, delete-orphan")
     seconds = relationship("ActivitySecond", back_populates="activity", cascade="all, delete-orphan")
+    streams = relationship("ActivityStream", back_populates="activity", cascade="all, delete-orphan")
     laps = relationship("ActivityLap", back_populates="activity", cascade="all, delete-orphan")
     
 class ActivitySplit(Base):
     __tablename__ = "activity_splits"
+    __table_args__ = (
+        Index("ix_activity_splits_activity_pace_distance", "activity_id", "pace_min_km", "distance_km"),
+        Index("uq_activity_splits_activity_split", "activity_id", "split_index", unique=True),
+    )
     
     id = Column(Integer, primary_key=True)
     activity_id = Column(Integer, ForeignKey("activities.id"), index=True)
@@ -41,6 +56,9 @@ class ActivitySplit(Base):
     
 class ActivitySecond(Base):
     __tablename__ = "activity_seconds"
+    __table_args__ = (
+        Index("uq_activity_seconds_activity_second", "activity_id", "second_index", unique=True),
+    )
     
     id = Column(Integer, primary_key=True)
     activity_id = Column(Integer, ForeignKey("activities.id"), index=True)
@@ -54,8 +72,28 @@ class ActivitySecond(Base):
     
     activity = relationship("Activity", back_populates="seconds")
     
+# columnar alternative to activity_seconds: one compressed array per channel
+class ActivityStream(Base):
+    __tablename__ = "activity_streams"
+    __table_args__ = (UniqueConstraint("activity_id", "channel"),)
+    
+    id = Column(Integer, primary_key=True)
+    activity_id = Column(Integer, ForeignKey("activities.id"), index=True)
+    channel = Column(String)
+    dtype = Column(String)
+    scale = Column(Float)
+    encoding = Column(String)
+    length = Column(Integer)
+    resolution_sec = Column(Integer, default=1) # seconds per sample, > 1 once downsampled
+    data = Column(LargeBinary)
+    
+    activity = relationship("Activity", back_populates="streams")
+    
 class ActivityLap(Base):
     __tablename__ = "activity_laps"
+    __table_args__ = (
+        Index("uq_activity_laps_activity_lap", "activity_id", "lap_index", "lap_type", unique=True),
+    )
     
     id = Column(Integer, primary_key=True)
     activity_id = Column(Integer, ForeignKey("activities.id"), index=True)
@@ -75,4 +113,31 @@ class ActivityLap(Base):
     avg_grade_percent = Column(Float, nullable=True)
     vam = Column(Float, nullable=True)
     
-    activity = relationship("Activity", back_populates="laps")
\ No newline at end of file
+    activity = relationship("Activity", back_populates="laps")
+
+# materialized chart aggregates, refreshed per bucket by database/aggregates.py
+class WeeklySummary(Base):
+    __tablename__ = "weekly_summary"
+    
+    week_start = Column(String, primary_key=True) # monday, YYYY-MM-DD
+    activity_count = Column(Integer)
+    total_km = Column(Float)
+    total_time_sec = Column(Float)
+    
+    # split based, same zones as analysis/formatters.py
+    split_count = Column(Integer)
+    split_km = Column(Float)
+    z2_km = Column(Float)
+    z2_open_km = Column(Float) # pace strictly above Z2_MIN, used by the z2 percentage
+    z1_load = Column(Float)
+    z2_load = Column(Float)
+    z3_load = Column(Float)
+    z4_load = Column(Float)
+    z5_load = Column(Float)
+    training_load = Column(Float)
+    
+class DailyLoad(Base):
+    __tablename__ = "daily_load"
+    
+    date = Column(String, primary_key=True) # YYYY-MM-DD
+    training_load = Column(Float)
\ No newline at end of file
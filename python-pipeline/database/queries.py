@@ -1,96 +1,272 @@
-from sqlalchemy import func
+from sqlalchemy import func, select
 
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from database.config import SessionLocal
-from database.models import Activity, ActivitySplit
+from database.config import SessionLocal, ReadSessionLocal
+from database.models import Activity, ActivitySplit, ActivityLap, ActivitySecond, ActivityStream, WeeklySummary, DailyLoad
+from database.columnar import fetch_frame, FLOAT, DAY
 
-def fetch_individual_activity_data():
-    session = SessionLocal()
-    
+# the analysis fetchers return typed DataFrames (database/columnar.py),
+# the processors take them where they used to take lists of rows.
+# since / until (YYYY-MM-DD) are pushed into the WHERE clause, on the
+# week_start column for weekly data and on the day column for daily data
+def _in_range(query, column, since=None, until=None):
+    if since:
+        query = query.where(column >= since)
+    if until:
+        query = query.where(column <= until)
+    return query
+        
+def fetch_run_week_range(until=None):
+    # first and last week with runs, from the (type, week_start) index
+    query = select(func.min(Activity.week_start), func.max(Activity.week_start)).where(Activity.type == "Run")
+    session = ReadSessionLocal()
     try:
-        query = (
-            session.query(
-                Activity.distance_km,
-                Activity.moving_time_sec
-            )
-            .filter(Activity.type == "Run")
-            .filter(Activity.distance_km > 0)
-            .filter(Activity.moving_time_sec > 0)
-            .all()
-        )
-        return query
+        return session.execute(_in_range(query, Activity.week_start, until=until)).one()
     finally:
         session.close()
         
-def fetch_weekly_data():
-    session = SessionLocal()
-    
+def fetch_recent_run_weeks(count, until=None):
+    query = (
+        select(Activity.week_start)
+        .where(Activity.type == "Run")
+        .distinct()
+        .order_by(Activity.week_start.desc())
+        .limit(count)
+    )
+    session = ReadSessionLocal()
     try:
-        query = (
-            session.query(
-                func.date(Activity.start_date, "weekday 0", "-6 days").label("week_start"),
-                func.sum(Activity.distance_km).label("total_km"),
-                func.sum(Activity.moving_time_sec).label("total_time_sec")
-            )
-            .filter(Activity.type == "Run")
-            .group_by("week_start")
-            .order_by("week_start")
-            .all()
-        )
-        return query
+        return session.scalars(_in_range(query, Activity.week_start, until=until)).all()
     finally:
         session.close()
+        
+def fetch_load_week_range(until=None):
+    # first and last week with split loads, the weeks of the load charts
+    query = (
+        select(func.min(WeeklySummary.week_start), func.max(WeeklySummary.week_start))
+        .where(WeeklySummary.split_count > 0)
+    )
+    session = ReadSessionLocal()
+    try:
+        return session.execute(_in_range(query, WeeklySummary.week_start, until=until)).one()
+    finally:
+        session.close()
+        
+def fetch_recent_load_weeks(count, until=None):
+    query = (
+        select(WeeklySummary.week_start)
+        .where(WeeklySummary.training_load > 0)
+        .order_by(WeeklySummary.week_start.desc())
+        .limit(count)
+    )
+    session = ReadSessionLocal()
+    try:
+        return session.scalars(_in_range(query, WeeklySummary.week_start, until=until)).all()
+    finally:
+        session.close()
+        
+def fetch_individual_activity_data(since=None, until=None):
+    query = (
+        select(
+            Activity.distance_km,
+            Activity.moving_time_sec
+        )
+        .where(Activity.type == "Run")
+        .where(Activity.distance_km > 0)
+        .where(Activity.moving_time_sec > 0)
+    )
+    query = _in_range(query, Activity.week_start, since, until)
+    return fetch_frame(query, {"distance_km": FLOAT, "moving_time_sec": FLOAT})
+        
+def fetch_weekly_data(since=None, until=None):
+    query = (
+        select(
+            Activity.week_start,
+            func.sum(Activity.distance_km).label("total_km"),
+            func.sum(Activity.moving_time_sec).label("total_time_sec")
+        )
+        .where(Activity.type == "Run")
+        .group_by(Activity.week_start)
+        .order_by(Activity.week_start)
+    )
+    query = _in_range(query, Activity.week_start, since, until)
+    return fetch_frame(query, {"week_start": DAY, "total_km": FLOAT, "total_time_sec": FLOAT})
     
 def get_last_activity_timestamp():
     session = SessionLocal()
     try:
-        last_activity = session.query(Activity).order_by(Activity.start_date.desc()).first()
-        if last_activity:
-            return int(last_activity.start_date.timestamp())
+        # only the watermark column, the entity maps columns an older
+        # database may not have before its upgrade
+        last_start_date = session.scalars(select(Activity.start_date).order_by(Activity.start_date.desc()).limit(1)).first()
+        if last_start_date:
+            return int(last_start_date.timestamp())
         return None
     finally:
         session.close()
         
-def fetch_split_pace():
+def fetch_existing_activity_ids(activity_ids, chunk_size=500):
     session = SessionLocal()
+    ids = list(activity_ids)
+    existing = set()
     try:
-        return session.query(
-            ActivitySplit.pace_min_km,
-            ActivitySplit.distance_km
-        ).all()
+        # chunked IN queries keep big backfills under sqlite's variable limit
+        for i in range(0, len(ids), chunk_size):
+            chunk = ids[i:i + chunk_size]
+            rows = session.query(Activity.id).filter(Activity.id.in_(chunk)).all()
+            existing.update(row.id for row in rows)
+        return existing
     finally:
         session.close()
         
-def fetch_weekly_splits():
-    session = SessionLocal()
+def fetch_workout_type_counts():
+    session = ReadSessionLocal()
     try:
-        return (
-            session.query(
-                func.date(Activity.start_date, "weekday 0", "-6 days").label("week_start"),
-                ActivitySplit.pace_min_km,
-                ActivitySplit.distance_km
-            )
-            .join(Activity, Activity.id == ActivitySplit.activity_id)
+        rows = (
+            session.query(Activity.workout_type, func.count(Activity.id))
+            .filter(Activity.type == "Run")
+            .group_by(Activity.workout_type)
             .all()
         )
+        return dict(rows)
     finally:
         session.close()
         
-def fetch_daily_splits():
-    session = SessionLocal()
+def fetch_stream_workouts(workout_types, since=None, until=None):
+    # activities of the given workout types, oldest first, with the coarsest
+    # resolution of their columnar streams (None without columnar streams)
+    query = (
+        select(
+            Activity.id,
+            Activity.name,
+            Activity.workout_type,
+            Activity.local_date,
+            func.max(ActivityStream.resolution_sec).label("resolution_sec")
+        )
+        .outerjoin(ActivityStream, ActivityStream.activity_id == Activity.id)
+        .where(Activity.workout_type.in_(workout_types))
+        .group_by(Activity.id)
+        .order_by(Activity.start_date)
+    )
+    query = _in_range(query, Activity.local_date, since, until)
+    session = ReadSessionLocal()
     try:
-        return (
-            session.query(
-                func.date(Activity.start_date).label("date"),
-                ActivitySplit.pace_min_km,
-                ActivitySplit.distance_km
-            )
-            .join(Activity, Activity.id == ActivitySplit.activity_id)
-            .filter(Activity.type == "Run")
-            .all()
+        return session.execute(query).all()
+    finally:
+        session.close()
+        
+def _child_count(model):
+    return (
+        select(func.count())
+        .where(model.activity_id == Activity.id)
+        .correlate(Activity)
+        .scalar_subquery()
+    )
+        
+def iter_ingestion_status(chunk_size=500):
+    # one row per activity with its split, lap and stream sample counts. the
+    # counts are correlated subselects on the activity_id indexes, so the whole
+    # report is a single query, streamed in chunks of chunk_size rows
+    stream_length = (
+        select(ActivityStream.length)
+        .where(ActivityStream.activity_id == Activity.id)
+        .where(ActivityStream.channel == "time")
+        .correlate(Activity)
+        .scalar_subquery()
+    )
+    query = (
+        select(
+            Activity.id,
+            Activity.name,
+            Activity.workout_type,
+            Activity.start_date,
+            _child_count(ActivitySplit).label("splits"),
+            _child_count(ActivityLap).label("laps"),
+            # seconds rows, or the length of the columnar time channel
+            func.coalesce(func.nullif(_child_count(ActivitySecond), 0), stream_length, 0).label("samples")
         )
+        .order_by(Activity.start_date.desc())
+        .execution_options(yield_per=chunk_size)
+    )
+    session = ReadSessionLocal()
+    try:
+        yield from session.execute(query)
     finally:
-        session.close()
\ No newline at end of file
+        session.close()
+        
+def fetch_split_pace(since=None, until=None):
+    query = select(
+        ActivitySplit.pace_min_km,
+        ActivitySplit.distance_km
+    )
+    if since or until:
+        query = query.join(Activity, Activity.id == ActivitySplit.activity_id)
+        query = _in_range(query, Activity.week_start, since, until)
+    return fetch_frame(query, {"pace_min_km": FLOAT, "distance_km": FLOAT})
+        
+def fetch_weekly_splits(since=None, until=None):
+    query = (
+        select(
+            Activity.week_start,
+            ActivitySplit.pace_min_km,
+            ActivitySplit.distance_km
+        )
+        .join(Activity, Activity.id == ActivitySplit.activity_id)
+    )
+    query = _in_range(query, Activity.week_start, since, until)
+    return fetch_frame(query, {"week_start": DAY, "pace_min_km": FLOAT, "distance_km": FLOAT})
+        
+def fetch_daily_splits(since=None, until=None):
+    query = (
+        select(
+            Activity.local_date.label("date"),
+            ActivitySplit.pace_min_km,
+            ActivitySplit.distance_km
+        )
+        .join(Activity, Activity.id == ActivitySplit.activity_id)
+        .where(Activity.type == "Run")
+    )
+    query = _in_range(query, Activity.local_date, since, until)
+    return fetch_frame(query, {"date": DAY, "pace_min_km": FLOAT, "distance_km": FLOAT})
+        
+def fetch_weekly_summary(since=None, until=None):
+    columns = [
+        WeeklySummary.week_start,
+        WeeklySummary.activity_count,
+        WeeklySummary.total_km,
+        WeeklySummary.total_time_sec,
+        WeeklySummary.split_count,
+        WeeklySummary.split_km,
+        WeeklySummary.z2_km,
+        WeeklySummary.z2_open_km,
+        WeeklySummary.z1_load,
+        WeeklySummary.z2_load,
+        WeeklySummary.z3_load,
+        WeeklySummary.z4_load,
+        WeeklySummary.z5_load,
+        WeeklySummary.training_load
+    ]
+    dtypes = {column.key: FLOAT for column in columns}
+    dtypes["week_start"] = DAY
+    query = _in_range(select(*columns).order_by(WeeklySummary.week_start), WeeklySummary.week_start, since, until)
+    return fetch_frame(query, dtypes)
+        
+def fetch_weekly_summary_totals(since=None, until=None):
+    # same shape as fetch_weekly_data, read from the aggregates
+    query = (
+        select(
+            WeeklySummary.week_start,
+            WeeklySummary.total_km,
+            WeeklySummary.total_time_sec
+        )
+        .where(WeeklySummary.activity_count > 0)
+        .order_by(WeeklySummary.week_start)
+    )
+    query = _in_range(query, WeeklySummary.week_start, since, until)
+    return fetch_frame(query, {"week_start": DAY, "total_km": FLOAT, "total_time_sec": FLOAT})
+        
+def fetch_daily_load(since=None, until=None):
+    query = select(DailyLoad.date, DailyLoad.training_load).order_by(DailyLoad.date)
+    query = _in_range(query, DailyLoad.date, since, until)
+    return fetch_frame(query, {"date": DAY, "training_load": FLOAT})
\ No newline at end of file
@@ -5,6 +5,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from database.config import DATABASE_PATH, IS_TEST_MODE, engine
 from database.models import Base
+from database.migrations import upgrade
 
 def reset_database():
     print("-" * 40)
@@ -16,20 +17,26 @@ def reset_database():
             print("Stoping operation")
             return
         
-    if os.path.exists(DATABASE_PATH):
-        try:
-            os.remove(DATABASE_PATH)
-            print(f"File: {os.path.basename(DATABASE_PATH)} deleted")
-        except Exception as e:
-            print(f"Error to remove file: {e}")
-            return
+    # the WAL and shared memory files belong to the old database, pooled
+    # connections are closed first so nothing writes them back
+    engine.dispose()
     
-    else:
+    if not os.path.exists(DATABASE_PATH):
         print("The db file didn't exist")
+    
+    try:
+        for path in (DATABASE_PATH, f"{DATABASE_PATH}-wal", f"{DATABASE_PATH}-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+                print(f"File: {os.path.basename(path)} deleted")
+    except Exception as e:
+        print(f"Error to remove file: {e}")
+        return
         
     print("Recreating tables")
     try:
         Base.metadata.create_all(engine)
+        upgrade()
         print("Database reseted and ready to use")
     except Exception as e:
         print(f"Error to create tables: {e}")
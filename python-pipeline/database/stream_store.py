@@ -0,0 +1,202 @@
+import os
+import zlib
+import numpy as np
+
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database.config import engine
+from database.models import ActivitySecond, ActivityStream
+
+# "columnar" stores one compressed array per channel (activity_streams),
+# "seconds" keeps the old one row per second layout (activity_seconds)
+STREAM_STORAGE = os.getenv("STRAVA_STREAM_STORAGE", "columnar")
+
+# channel: (dtype, scale, delta)
+# scaled channels are stored as rounded integers, cumulative channels as deltas
+# so zlib sees long runs of repeated values
+CHANNELS = {
+    "time": ("int32", 1, True),
+    "distance": ("int32", 10, True),
+    "velocity_smooth": ("int16", 100, False),
+    "heartrate": ("uint8", 1, False),
+    "altitude": ("float32", 1, False),
+    # downsampled streams (processors/retention.py) keep the elevation range
+    # of every bucket instead of the altitude samples
+    "altitude_min": ("float32", 1, False),
+    "altitude_max": ("float32", 1, False),
+}
+
+# strava stream key -> activity_seconds column, used by the fallback reader
+SECONDS_COLUMNS = {
+    "time": ActivitySecond.second_index,
+    "distance": ActivitySecond.distance_total_m,
+    "velocity_smooth": ActivitySecond.speed_m_s,
+    "heartrate": ActivitySecond.heart_rate,
+    "altitude": ActivitySecond.elevation_m,
+}
+
+def ensure_stream_table():
+    ActivityStream.__table__.create(engine, checkfirst=True)
+
+def _ffill(values, missing):
+    index = np.where(missing, 0, np.arange(len(values)))
+    return np.nan_to_num(values[np.maximum.accumulate(index)])
+
+def encode_channel(values, dtype, scale=1, delta=False):
+    dtype = np.dtype(dtype)
+    values = np.asarray(values, dtype=np.float64) * scale
+    missing = np.isnan(values)
+    
+    if delta:
+        # a missing sample repeats the previous value (delta 0). the running
+        # values are rounded before the diff, rounding every delta instead
+        # would add up its error over the whole activity
+        values = _ffill(values, missing)
+        if np.issubdtype(dtype, np.integer):
+            values = np.round(values)
+        values = np.diff(values, prepend=0)
+    
+    # integer channels have no nan, their smallest value marks a missing
+    # sample (0 for the unsigned heart rate)
+    if np.issubdtype(dtype, np.integer):
+        info = np.iinfo(dtype)
+        values = np.clip(np.round(np.nan_to_num(values)), info.min + 1, info.max)
+        values[missing] = info.min
+    
+    encoding = "zlib+delta" if delta else "zlib"
+    return zlib.compress(values.astype(dtype).tobytes(), 6), encoding
+
+def decode_channel(data, dtype, scale=1, encoding="zlib"):
+    dtype = np.dtype(dtype)
+    raw = np.frombuffer(zlib.decompress(data), dtype=dtype)
+    
+    if np.issubdtype(dtype, np.integer):
+        missing = raw == np.iinfo(dtype).min
+        values = np.where(missing, 0, raw).astype(np.float64)
+    else:
+        missing = np.isnan(raw)
+        values = np.nan_to_num(raw.astype(np.float64))
+    
+    if encoding == "zlib+delta":
+        values = np.cumsum(values)
+    values = values / scale
+    
+    # integer channels without gaps (time, heart rate) keep an integer dtype
+    if dtype.kind in "iu" and scale == 1 and not missing.any():
+        return values.astype(np.int64)
+    
+    values[missing] = np.nan
+    return values
+
+def _channel_row(activity_id, channel, values, length, resolution_sec):
+    dtype, scale, delta = CHANNELS[channel]
+    data, encoding = encode_channel(values, dtype, scale, delta)
+    return {
+        "activity_id": activity_id,
+        "channel": channel,
+        "dtype": dtype,
+        "scale": scale,
+        "encoding": encoding,
+        "length": length,
+        "resolution_sec": resolution_sec,
+        "data": data,
+    }
+
+def map_streams_to_channel_rows(activity_id, streams, resolution_sec=1):
+    rows = []
+    length = len(streams["time"]["data"])
+    
+    for channel in CHANNELS:
+        values = streams.get(channel, {}).get("data")
+        if not values:
+            continue
+        
+        # short channels are padded so every array lines up with time
+        values = [np.nan if v is None else v for v in values[:length]]
+        values += [np.nan] * (length - len(values))
+        rows.append(_channel_row(activity_id, channel, values, length, resolution_sec))
+        
+    return rows
+
+def map_columns_to_channel_rows(activity_id, columns, resolution_sec=1):
+    # same rows from the numpy columns of map_streams_to_columns (keyed by the
+    # activity_seconds fields), a channel that was never recorded is all nan
+    rows = []
+    length = len(columns["second_index"])
+    
+    for channel, column in SECONDS_COLUMNS.items():
+        values = columns.get(column.key)
+        if values is None or np.isnan(values).all():
+            continue
+        rows.append(_channel_row(activity_id, channel, values, length, resolution_sec))
+    
+    return rows
+
+def _load_seconds_arrays(session, activity_id):
+    rows = (
+        session.query(*SECONDS_COLUMNS.values())
+        .filter(ActivitySecond.activity_id == activity_id)
+        .order_by(ActivitySecond.second_index)
+        .all()
+    )
+    if not rows:
+        return {}
+    
+    columns = np.array(rows, dtype=np.float64).T
+    arrays = dict(zip(SECONDS_COLUMNS.keys(), columns))
+    arrays["time"] = arrays["time"].astype(np.int64)
+    
+    # channels that were never recorded come back as all null
+    return {channel: values for channel, values in arrays.items() if not np.isnan(values).all()}
+
+def load_stream_arrays(session, activity_id):
+    # {channel: ndarray}, with the per second rows as fallback for activities
+    # that were not migrated yet
+    rows = session.query(ActivityStream).filter(ActivityStream.activity_id == activity_id).all()
+    if not rows:
+        return _load_seconds_arrays(session, activity_id)
+    
+    return {
+        row.channel: decode_channel(row.data, row.dtype, row.scale, row.encoding)
+        for row in rows
+    }
+
+def _bucket_mean(values, starts):
+    values = np.asarray(values, dtype=np.float64)
+    present = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(present, values, 0), starts)
+    counts = np.add.reduceat(present, starts)
+    return np.divide(sums, counts, out=np.full(len(starts), np.nan), where=counts > 0)
+
+def downsample_arrays(arrays, bucket_sec):
+    # one sample per bucket_sec window of the time channel: the last time and
+    # distance, the mean speed and heart rate, the elevation min and max.
+    # only 1 Hz streams, a downsampled one has no altitude samples left and
+    # its means would be averaged again with equal weights
+    if "altitude_min" in arrays or "altitude_max" in arrays:
+        raise ValueError("the streams are already downsampled")
+    
+    time = arrays["time"]
+    starts = np.flatnonzero(np.diff(time // bucket_sec, prepend=-1))
+    ends = np.append(starts[1:], len(time)) - 1
+    
+    downsampled = {"time": time[ends]}
+    if "distance" in arrays:
+        downsampled["distance"] = arrays["distance"][ends]
+    for channel in ("velocity_smooth", "heartrate"):
+        if channel in arrays:
+            downsampled[channel] = _bucket_mean(arrays[channel], starts)
+    if "altitude" in arrays:
+        altitude = np.asarray(arrays["altitude"], dtype=np.float64)
+        downsampled["altitude_min"] = np.fmin.reduceat(altitude, starts)
+        downsampled["altitude_max"] = np.fmax.reduceat(altitude, starts)
+    return downsampled
+
+def arrays_to_streams(arrays):
+    # back to the strava json shape, so the usual mappers and detectors run on it
+    return {
+        channel: {"data": [None if np.isnan(v) else v for v in values.tolist()]}
+        if values.dtype.kind == "f" else {"data": values.tolist()}
+        for channel, values in arrays.items()
+    }
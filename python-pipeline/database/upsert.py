@@ -0,0 +1,34 @@
+from sqlalchemy.dialects.sqlite import insert
+
+# conflict target of every table, the primary key or the unique index that
+# models.py / migrations.py define for it
+UPSERT_KEYS = {
+    "activities": ["id"],
+    "activity_splits": ["activity_id", "split_index"],
+    "activity_laps": ["activity_id", "lap_index", "lap_type"],
+    "activity_seconds": ["activity_id", "second_index"],
+    "activity_streams": ["activity_id", "channel"],
+}
+
+def upsert_rows(session, model, rows, update=False):
+    # INSERT ... ON CONFLICT as one executemany. rows already stored are kept
+    # (DO NOTHING) or overwritten with the new values (DO UPDATE), so writing
+    # the same rows twice never duplicates them. returns the rows written
+    if not rows:
+        return 0
+    
+    table = model.__table__
+    keys = UPSERT_KEYS[table.name]
+    statement = insert(table)
+    
+    if update:
+        columns = {
+            column.name: statement.excluded[column.name]
+            for column in table.columns
+            if column.name not in keys and not column.primary_key
+        }
+        statement = statement.on_conflict_do_update(index_elements=keys, set_=columns)
+    else:
+        statement = statement.on_conflict_do_nothing(index_elements=keys)
+    
+    return session.execute(statement, rows).rowcount
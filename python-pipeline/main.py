@@ -1,4 +1,5 @@
 import argparse
+from datetime import date, timedelta
 from analysis.charts import (
     plot_weekly_running_volume,
     plot_weekly_average_pace,
@@ -17,36 +18,145 @@ from analysis.processors import (
     process_pace_histogram_data,
     process_weekly_data,
     process_splits_pace_histogram,
-    process_z2_percentage,
-    process_z2_volume,
     process_z2_and_total_distances,
-    process_weekly_training_load,
     process_acwr,
-    process_daily_training_load,
-    process_monotony_strain
+    process_monotony_strain,
+    process_z2_percentage_summary,
+    process_z2_volume_summary,
+    process_training_load_summary,
+    process_daily_load_summary,
+    ACWR_CHRONIC_WINDOW
 )
 from analysis.formatters import (
-    Z2_MIN,
-    Z2_MAX,
     ZONES
 )
-from database.queries import (
-    fetch_individual_activity_data,
-    fetch_weekly_data,
-    fetch_split_pace,
-    fetch_weekly_splits,
-    fetch_daily_splits
-)
+import database.queries as sqlite_queries
+from database.aggregates import rebuild_aggregates
+from check_progress import check_ingestion_summary
+
+from processors.sync_new_activities import sync_new_activities, DEFAULT_FETCH_WORKERS
+from processors.reprocess_activities import reprocess_activities
+from processors.migrate_streams import migrate_streams
+from processors.export_parquet import export_parquet
+from processors.retention import apply_retention, RETENTION_FULL_DAYS, RETENTION_BUCKET_SEC
+from processors.redetect_laps import redetect_laps, DEFAULT_REDETECT_WORKERS, DEFAULT_REDETECT_BATCH_SIZE
+from processors.type_classifiers.util_type_classifiers import STREAM_WORKOUT_TYPES
+from database.migrations import run_migrations, upgrade
+from processors.db_writer import DEFAULT_BATCH_SIZE
+from processors.sync_planner import plan_sync, print_sync_plan
+    
+def handle_sync(args):
+    if args.plan:
+        print_sync_plan(plan_sync())
+        return
+    
+    sync_new_activities(workers=args.workers, batch_size=args.batch_size)
 
-from processors.sync_new_activities import sync_new_activities
+def handle_reprocess():
+    reprocess_activities()
+    
+def handle_migrate_streams(args):
+    migrate_streams(vacuum=args.vacuum)
+    
+def handle_retention(args):
+    apply_retention(keep_days=args.keep_days, bucket_sec=args.bucket, drop_with_laps=args.drop_with_laps, vacuum=not args.no_vacuum)
+    
+def handle_redetect(args):
+    redetect_laps(
+        workout_types=args.workout_type or STREAM_WORKOUT_TYPES,
+        since=args.since,
+        until=args.until,
+        dry_run=args.dry_run,
+        workers=args.workers,
+        batch_size=args.batch_size
+    )
+    
+def handle_export_parquet(args):
+    export_parquet(full=args.full)
+    
+def handle_migrate(args):
+    run_migrations(check=args.check)
+    
+def handle_status(args):
+    upgrade(verbose=False)
+    check_ingestion_summary(as_json=args.json)
+    
+def handle_rebuild_aggregates():
+    rebuild_aggregates()
+    
+# charts that keep the last --limit weeks, and the weeks they plot: weeks
+# with runs (activity totals) or weeks with split loads (weekly_summary)
+LIMIT_CHART_WEEKS = {
+    "distance": "runs",
+    "pace": "runs",
+    "pace_vs_dist": "runs",
+    "z2_weeks": "runs",
+    "acwr": "loads",
+}
+    
+def _monday(day):
+    return day - timedelta(days=day.weekday())
+    
+def plot_queries(backend):
+    if backend == "duckdb":
+        # optional, needs duckdb and the dataset written by export-parquet
+        import database.duckdb_queries as duckdb_queries
+        return duckdb_queries
+    return sqlite_queries
+    
+def _plotted_weeks(chart_type, queries):
+    # (week range, recent weeks) fetchers for the weeks the chart plots
+    if LIMIT_CHART_WEEKS.get(chart_type) == "loads":
+        return queries.fetch_load_week_range, queries.fetch_recent_load_weeks
+    return queries.fetch_run_week_range, queries.fetch_recent_run_weeks
     
-def handle_sync():
-    sync_new_activities()
+def resolve_plot_range(args, queries):
+    # turns --since / --until / --limit into the week_start bounds pushed into
+    # the queries. returns (start, warmup_start, until, until_day) as
+    # YYYY-MM-DD strings, a bound is None when it would not filter anything
+    until = _monday(args.until) if args.until else None
+    fetch_week_range, fetch_recent_weeks = _plotted_weeks(args.chart_type, queries)
+    min_week, max_week = fetch_week_range(until.isoformat() if until else None)
+    if not min_week:
+        return None, None, until and until.isoformat(), until and (until + timedelta(days=6)).isoformat()
+    
+    min_week = date.fromisoformat(min_week)
+    max_week = date.fromisoformat(max_week)
+    start = _monday(args.since) if args.since else min_week
+    
+    # the other charts never trimmed to --limit, they plot the whole range
+    limit = args.limit if args.chart_type in LIMIT_CHART_WEEKS else None
+    if limit:
+        if args.hide_zero:
+            # the limit counts the weeks hide_zero keeps
+            recent = fetch_recent_weeks(limit, until.isoformat() if until else None)
+            limit_start = date.fromisoformat(recent[-1]) if recent else max_week
+        else:
+            limit_start = max_week - timedelta(weeks=limit - 1)
+        start = max(start, limit_start)
+    
+    # acwr needs the chronic window before the first plotted week
+    warmup_start = start - timedelta(weeks=ACWR_CHRONIC_WINDOW - 1)
+    
+    def bound(day):
+        return day.isoformat() if day > min_week else None
+    
+    until_day = (until + timedelta(days=6)).isoformat() if until else None
+    return bound(start), bound(warmup_start), until and until.isoformat(), until_day
     
 def handle_plots(args):
+    # the charts read the aggregate tables and week columns the migrations
+    # add, an older database is brought up to date first
+    if args.backend != "duckdb":
+        upgrade(verbose=False)
+    
+    queries = plot_queries(args.backend)
+    start, warmup_start, until, until_day = resolve_plot_range(args, queries)
+    
+    # weekly and daily charts read the pre-aggregated tables (sqlite backend)
     if args.chart_type in ["distance", "pace", "pace_vs_dist"]:
-        raw_data = fetch_weekly_data()
-        df = process_weekly_data(raw_data, hide_zero=args.hide_zero, limit=args.limit)
+        raw_data = queries.fetch_weekly_summary_totals(start, until)
+        df = process_weekly_data(raw_data, hide_zero=args.hide_zero, limit=args.limit, start=start)
     
         if df.empty:
             print("None data was found with this filters")
@@ -60,45 +170,47 @@ def handle_plots(args):
             plot_weekly_pace_vs_distance(df)
             
     elif args.chart_type == "pace_histogram":
-        raw_pace_data = fetch_individual_activity_data()
+        raw_pace_data = queries.fetch_individual_activity_data(start, until)
         df_hist = process_pace_histogram_data(raw_pace_data)
         plot_pace_distance_histogram(df_hist)
         
     elif args.chart_type == "splits_pace_histogram":
-        raw_splits = fetch_split_pace()
+        raw_splits = queries.fetch_split_pace(start, until)
         df_hist = process_splits_pace_histogram(raw_splits)
         plot_splits_pace_histogram(df_hist)
     
     elif args.chart_type in ["z2_percentage", "z2_volume", "z2_weeks", "training_load", "acwr"]:
-        raw_weekly_splits = fetch_weekly_splits()
+        # acwr also reads the warm-up weeks of its rolling windows
+        since = warmup_start if args.chart_type == "acwr" else start
+        raw_summary = queries.fetch_weekly_summary(since, until)
         
         if args.chart_type == "z2_percentage":
-            df_z2 = process_z2_percentage(raw_weekly_splits, Z2_MIN, Z2_MAX)
+            df_z2 = process_z2_percentage_summary(raw_summary)
             plot_z2_percentage(df_z2)
             
         elif args.chart_type == "z2_volume":
-            df_z2 = process_z2_volume(raw_weekly_splits, Z2_MIN, Z2_MAX)
+            df_z2 = process_z2_volume_summary(raw_summary)
             plot_z2_volume(df_z2)
         
         elif args.chart_type == "z2_weeks":
-            raw_weekly_total = fetch_weekly_data()
-            df_weekly = process_weekly_data(raw_weekly_total)
-            df_z2 = process_z2_volume(raw_weekly_splits, Z2_MIN, Z2_MAX)
+            raw_weekly_total = queries.fetch_weekly_summary_totals(start, until)
+            df_weekly = process_weekly_data(raw_weekly_total, start=start)
+            df_z2 = process_z2_volume_summary(raw_summary)
             merged_df = process_z2_and_total_distances(df_weekly, df_z2, args.hide_zero, args.limit)
             plot_weekly_z2_stack(merged_df)
             
         elif args.chart_type == "training_load":
-            df_load = process_weekly_training_load(raw_weekly_splits, ZONES)
+            df_load = process_training_load_summary(raw_summary, ZONES)
             plot_weekly_training_load(df_load)
             
         elif args.chart_type == "acwr":
-            df_load = process_weekly_training_load(raw_weekly_splits, ZONES)
-            df_acwr = process_acwr(df_load, hide_zero=args.hide_zero, limit=args.limit)
+            df_load = process_training_load_summary(raw_summary, ZONES)
+            df_acwr = process_acwr(df_load, hide_zero=args.hide_zero, limit=args.limit, start=start, warmup_start=warmup_start)
             plot_acwr(df_acwr)
             
     elif args.chart_type in ["monotony", "strain"]:
-        raw_splits = fetch_daily_splits()
-        daily_load = process_daily_training_load(raw_splits, ZONES)
+        # whole weeks, monotony and strain are weekly figures
+        daily_load = process_daily_load_summary(queries.fetch_daily_load(start, until_day))
         df = process_monotony_strain(daily_load)
         
         if args.chart_type == "monotony":
@@ -113,7 +225,48 @@ def main():
     subparsers = parser.add_subparsers(dest="command", help="Command to be executed")
     
     # sync subcommand
-    subparsers.add_parser("sync", help="Search for new activities and splits in the STRAVA API")
+    sync_parser = subparsers.add_parser("sync", help="Search for new activities and splits in the STRAVA API")
+    sync_parser.add_argument("--workers", type=int, default=DEFAULT_FETCH_WORKERS, help="Parallel activity downloads")
+    sync_parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Activities per database commit")
+    sync_parser.add_argument("--plan", action="store_true", help="Only report how many activities and API calls the sync needs")
+    
+    # reprocess subcommand
+    subparsers.add_parser("reprocess", help="Rebuild activities, splits, laps and streams from the raw response cache")
+    
+    # migrate-streams subcommand
+    migrate_streams_parser = subparsers.add_parser("migrate-streams", help="Convert per second stream rows into compressed columnar streams")
+    migrate_streams_parser.add_argument("--vacuum", action="store_true", help="Run VACUUM afterwards to shrink the database file")
+    
+    # retention subcommand
+    retention_parser = subparsers.add_parser("retention", help="Downsample the streams of older activities and give the space back")
+    retention_parser.add_argument("--keep-days", type=int, default=RETENTION_FULL_DAYS, help="Keep full 1 Hz streams for the activities of the last N days")
+    retention_parser.add_argument("--bucket", type=int, choices=[5, 10], default=RETENTION_BUCKET_SEC, help="Seconds per sample of the downsampled streams")
+    retention_parser.add_argument("--drop-with-laps", action="store_true", help="Drop the old streams of activities whose laps are already stored")
+    retention_parser.add_argument("--no-vacuum", action="store_true", help="Skip the incremental vacuum")
+    
+    # redetect subcommand
+    redetect_parser = subparsers.add_parser("redetect", help="Run the lap detection and classification again on the stored streams of stream workouts")
+    redetect_parser.add_argument("--workout-type", action="append", choices=STREAM_WORKOUT_TYPES, help="Only this workout type (repeatable), all stream workouts by default")
+    redetect_parser.add_argument("--since", type=date.fromisoformat, default=None, help="First activity day (YYYY-MM-DD)")
+    redetect_parser.add_argument("--until", type=date.fromisoformat, default=None, help="Last activity day (YYYY-MM-DD)")
+    redetect_parser.add_argument("--dry-run", action="store_true", help="Only report the activities whose laps or fallback splits would change")
+    redetect_parser.add_argument("--workers", type=int, default=DEFAULT_REDETECT_WORKERS, help="Detection processes")
+    redetect_parser.add_argument("--batch-size", type=int, default=DEFAULT_REDETECT_BATCH_SIZE, help="Activities per database transaction")
+    
+    # export-parquet subcommand
+    export_parser = subparsers.add_parser("export-parquet", help="Append new activities, splits, laps and streams to the year partitioned parquet dataset")
+    export_parser.add_argument("--full", action="store_true", help="Rewrite the whole dataset instead of appending the new activities")
+    
+    # migrate subcommand
+    migrate_parser = subparsers.add_parser("migrate", help="Upgrade the database schema and indexes in place")
+    migrate_parser.add_argument("--check", action="store_true", help="Also verify with EXPLAIN QUERY PLAN that the hot queries use the indexes")
+    
+    # status subcommand
+    status_parser = subparsers.add_parser("status", help="Per activity split, lap and stream counts, flags stream workouts missing streams or laps")
+    status_parser.add_argument("--json", action="store_true", help="One json object per line (ndjson) for monitoring")
+    
+    # rebuild-aggregates subcommand
+    subparsers.add_parser("rebuild-aggregates", help="Recompute the weekly_summary and daily_load tables from the splits")
     
     # plot subcommand
     plot_parser = subparsers.add_parser("plot", help="Show graphic visualization")
@@ -138,11 +291,30 @@ def main():
     
     plot_parser.add_argument("--hide_zero", action="store_true", help="hide weeks without runs")
     plot_parser.add_argument("--limit", type=int, default=None, help="Weeks limit")
+    plot_parser.add_argument("--backend", choices=["sqlite", "duckdb"], default="sqlite", help="Query sqlite, or the parquet dataset through duckdb")
+    plot_parser.add_argument("--since", type=date.fromisoformat, default=None, help="First day (YYYY-MM-DD), from the start of its week")
+    plot_parser.add_argument("--until", type=date.fromisoformat, default=None, help="Last day (YYYY-MM-DD), the whole week containing it is included")
     
     args = parser.parse_args()
     
     if args.command == "sync":
-        handle_sync()
+        handle_sync(args)
+    elif args.command == "reprocess":
+        handle_reprocess()
+    elif args.command == "migrate-streams":
+        handle_migrate_streams(args)
+    elif args.command == "retention":
+        handle_retention(args)
+    elif args.command == "redetect":
+        handle_redetect(args)
+    elif args.command == "export-parquet":
+        handle_export_parquet(args)
+    elif args.command == "migrate":
+        handle_migrate(args)
+    elif args.command == "status":
+        handle_status(args)
+    elif args.command == "rebuild-aggregates":
+        handle_rebuild_aggregates()
     elif args.command == "plot":
         handle_plots(args)
     else:
@@ -0,0 +1,81 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database.models import ActivitySplit, ActivitySecond, ActivityLap, ActivityStream
+from database.stream_store import STREAM_STORAGE, map_columns_to_channel_rows
+
+from processors.db_mappers.activities import map_activity_to_row
+from processors.db_mappers.streams import map_streams_to_columns, map_streams_to_rows, map_streams_to_db_model
+from processors.db_mappers.splits import map_splits_to_rows
+from processors.db_mappers.laps import map_laps_to_rows
+
+from processors.data_mappers.laps_data_to_list import map_recorded_laps_to_list
+
+from processors.non_recorded_laps_detector.streams_processor import process_activity_streams_pd
+from processors.non_recorded_laps_detector.interval_detector import IntervalDetector
+from processors.non_recorded_laps_detector.hill_detector import HillDetector
+
+from processors.type_classifiers.util_type_classifiers import STREAM_WORKOUT_TYPES, WORKOUT_INTERVAL, WORKOUT_HILL_REPEATS
+
+# stream seconds go through the upsert executemany unless this is turned off,
+# then they are regular orm objects (seconds storage only)
+STREAM_BULK_INSERT = os.getenv("STRAVA_STREAM_BULK_INSERT", "1") != "0"
+
+# laps of a stream workout that the watch didn't record, found in the numpy
+# columns of map_streams_to_columns. shared with processors/redetect_laps.py
+def detect_laps(workout_type, stream_columns):
+    detector = None
+    if workout_type == WORKOUT_INTERVAL:
+        detector = IntervalDetector()
+    elif workout_type == WORKOUT_HILL_REPEATS:
+        detector = HillDetector()
+    
+    return detector.analyze(process_activity_streams_pd(stream_columns)) if detector else []
+
+# maps the raw strava json (detail + streams) to every db row derived from it,
+# shared by the online sync and the offline reprocess
+def build_activity_objects(full_data, streams=None, bulk_streams=STREAM_BULK_INSERT, stream_storage=STREAM_STORAGE):
+    activity_row = map_activity_to_row(full_data)
+    activity_id = activity_row["id"]
+    workout_type = activity_row["workout_type"]
+    related_objs = []
+    bulk_rows = [] # (model, row dicts) upserted with one executemany each
+    
+    splits_data = full_data.get("splits_metric", [])
+    
+    # need streams and laps
+    if workout_type in STREAM_WORKOUT_TYPES and streams:
+        # the json arrays become numpy columns once, the storage and the
+        # detectors both read them
+        stream_columns = map_streams_to_columns(streams)
+        
+        # save activity streams to db
+        if stream_storage == "columnar":
+            bulk_rows.append((ActivityStream, map_columns_to_channel_rows(activity_id, stream_columns)))
+        elif bulk_streams:
+            bulk_rows.append((ActivitySecond, map_streams_to_rows(activity_id, streams, stream_columns)))
+        else:
+            related_objs.extend(map_streams_to_db_model(activity_id, streams, stream_columns))
+        
+        # verify recorded laps
+        laps = map_recorded_laps_to_list(full_data)
+        if len(laps) <= 1: # garmin/strava doesn't recorded laps
+            source = "Automatic Laps Detection"
+            detected_laps = detect_laps(workout_type, stream_columns)
+            if detected_laps:
+                bulk_rows.append((ActivityLap, map_laps_to_rows(activity_id, detected_laps)))
+            else: # fallback for splits if watch didn't recorded and doesn't find laps
+                bulk_rows.append((ActivitySplit, map_splits_to_rows(activity_id, splits_data)))
+        
+        # garmin/strava recorded laps
+        else:
+            source = "Using Recorded Laps"
+            bulk_rows.append((ActivityLap, map_laps_to_rows(activity_id, laps, workout_type)))
+    
+    # strava splits
+    else:
+        source = "Using Splits"
+        bulk_rows.append((ActivitySplit, map_splits_to_rows(activity_id, splits_data)))
+    
+    return activity_row, related_objs, bulk_rows, source
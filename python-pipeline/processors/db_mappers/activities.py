@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import sys
 import os
@@ -7,29 +7,42 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from database.models import Activity
 from processors.type_classifiers.activity_type_classifier import classify_workout_type
     
-def map_activity_to_db_model(activity):
+def map_local_buckets(activity):
+    # strava sends the local wall clock time with a (fake) "Z" suffix
+    start_local = activity.get("start_date_local") or activity["start_date"]
+    local_date = datetime.fromisoformat(start_local.replace("Z", "")).date()
+    week_start = local_date - timedelta(days=local_date.weekday())
+    return local_date.isoformat(), week_start.isoformat()
+    
+def map_activity_to_row(activity):
     distance_km = activity["distance"] / 1000 if activity["distance"] else None
     moving_time_sec = activity["moving_time"]
     pace_sec_per_km = moving_time_sec / distance_km if distance_km else None
     
     workout_type = classify_workout_type(activity)
+    local_date, week_start = map_local_buckets(activity)
     
-    return Activity(
-        id = activity["id"],
-        name = activity["name"],
-        type = activity["type"],
-        sport_type = activity.get("sport_type"),
-        start_date = datetime.fromisoformat(
+    return {
+        "id": activity["id"],
+        "name": activity["name"],
+        "type": activity["type"],
+        "sport_type": activity.get("sport_type"),
+        "start_date": datetime.fromisoformat(
             activity["start_date"].replace("Z", "")
         ),
-        distance_km = distance_km,
-        moving_time_sec = moving_time_sec,
-        pace_raw = pace_sec_per_km,
-        elevation_gain = activity.get("total_elevation_gain"),
-        average_bpm = activity.get("average_heartrate"),
-        max_bpm = activity.get("max_heartrate"),
-        workout_type = workout_type,
-    )
+        "distance_km": distance_km,
+        "moving_time_sec": moving_time_sec,
+        "pace_raw": pace_sec_per_km,
+        "elevation_gain": activity.get("total_elevation_gain"),
+        "average_bpm": activity.get("average_heartrate"),
+        "max_bpm": activity.get("max_heartrate"),
+        "workout_type": workout_type,
+        "local_date": local_date,
+        "week_start": week_start,
+    }
+    
+def map_activity_to_db_model(activity):
+    return Activity(**map_activity_to_row(activity))
 
 
     
@@ -4,7 +4,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from database.models import ActivitySplit
 
-def map_splits_to_db_model(activity_id, splits):
+def map_splits_to_rows(activity_id, splits):
+    rows = []
     for s in splits:
         dist_raw = s.get("distance", 0)
         moving_time_sec = s.get("moving_time", 0)
@@ -15,11 +16,15 @@ def map_splits_to_db_model(activity_id, splits):
         else:
             pace_min_km = 0.0
             
-        yield ActivitySplit(
-            activity_id=activity_id,
-            split_index=s["split"],
-            distance_km=dist_km,
-            moving_time_sec=moving_time_sec,
-            pace_min_km=pace_min_km
-        )
-        
\ No newline at end of file
+        rows.append({
+            "activity_id": activity_id,
+            "split_index": s["split"],
+            "distance_km": dist_km,
+            "moving_time_sec": moving_time_sec,
+            "pace_min_km": pace_min_km
+        })
+    return rows
+        
+def map_splits_to_db_model(activity_id, splits):
+    for row in map_splits_to_rows(activity_id, splits):
+        yield ActivitySplit(**row)
@@ -1,40 +1,52 @@
+import numpy as np
+
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from database.models import ActivitySecond
 
-def map_streams_to_db_model(activity_id, streams):
-    time_stream = streams["time"]["data"]
-    distance_stream = streams["distance"]["data"]
-    speed_stream = streams.get("velocity_smooth", {}).get("data", [])
-    hr_stream = streams.get("heartrate", {}).get("data", [])
-    alt_stream = streams.get("altitude", {}).get("data", [])
+def _stream_column(streams, key, length):
+    # float column as long as the time stream, a None sample or the missing
+    # end of a short channel is nan
+    values = (streams.get(key, {}).get("data") or [])[:length]
+    column = np.full(length, np.nan)
+    column[:len(values)] = [np.nan if v is None else v for v in values]
+    return column
+    
+def map_streams_to_columns(streams):
+    # strava json arrays -> one numpy column per activity_seconds field. this is
+    # what the stream storage and the lap detection both read
+    time = np.asarray(streams["time"]["data"], dtype=np.int64)
+    length = len(time)
+    
+    distance = _stream_column(streams, "distance", length)
+    speed = _stream_column(streams, "velocity_smooth", length)
+    
+    return {
+        "second_index": time,
+        "distance_total_m": distance,
+        # the distance never goes back, negative deltas are 0
+        "distance_delta_m": np.clip(np.diff(distance, prepend=distance[:1]), 0, None),
+        "speed_m_s": speed,
+        "heart_rate": _stream_column(streams, "heartrate", length),
+        "elevation_m": _stream_column(streams, "altitude", length),
+        "pace_sec_km": np.divide(1000, speed, out=np.full(length, np.nan), where=speed > 0),
+    }
+
+def map_streams_to_rows(activity_id, streams, columns=None):
+    if columns is None:
+        columns = map_streams_to_columns(streams)
+    
+    names = list(columns)
+    values = [
+        columns[name].tolist() if columns[name].dtype.kind in "iu"
+        else [None if np.isnan(v) else v for v in columns[name].tolist()]
+        for name in names
+    ]
     
-    streams_list = []
-    prev_distance = None
+    # plain dicts, ready for a single executemany without orm bookkeeping
+    return [{"activity_id": activity_id, **dict(zip(names, sample))} for sample in zip(*values)]
     
-    for i in range(len(time_stream)):
-        total_distance = distance_stream[i]
-        
-        if prev_distance is None:
-            delta_distance = 0.0
-        else:
-            delta_distance = total_distance - prev_distance
-            
-        prev_distance = total_distance
-        
-        speed = speed_stream[i] if (speed_stream and i < len(speed_stream)) else None
-        
-        streams_list.append(ActivitySecond(
-            activity_id=activity_id,
-            second_index=time_stream[i],
-            distance_total_m=total_distance,
-            distance_delta_m=max(delta_distance, 0),
-            speed_m_s=speed,
-            heart_rate=hr_stream[i] if i < len(hr_stream) else None,
-            elevation_m=alt_stream[i] if i < len(alt_stream) else None,
-            pace_sec_km=(1000 / speed) if (speed and speed > 0) else None
-        ))
-        
-    return streams_list
\ No newline at end of file
+def map_streams_to_db_model(activity_id, streams, columns=None):
+    return [ActivitySecond(**row) for row in map_streams_to_rows(activity_id, streams, columns)]
@@ -0,0 +1,171 @@
+import os
+import queue
+import threading
+import time
+
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database.config import SessionLocal
+from database.models import Activity, ActivitySplit, ActivitySecond, ActivityLap, ActivityStream
+from database.migrations import upgrade
+from database.aggregates import activity_buckets, refresh_aggregates
+from database.upsert import upsert_rows
+
+DEFAULT_BATCH_SIZE = int(os.getenv("STRAVA_WRITE_BATCH_SIZE", "25"))
+DEFAULT_FLUSH_INTERVAL_SEC = float(os.getenv("STRAVA_WRITE_FLUSH_SEC", "5"))
+# how often a put() blocked on a full queue checks that the writer still runs
+QUEUE_POLL_SEC = 1.0
+
+_STOP = object()
+
+def delete_activity_rows(session, activity_id):
+    # bulk deletes, loading every child through the orm cascade is too slow
+    for model in (ActivitySecond, ActivityStream, ActivityLap, ActivitySplit):
+        session.query(model).filter(model.activity_id == activity_id).delete(synchronize_session=False)
+    session.query(Activity).filter(Activity.id == activity_id).delete(synchronize_session=False)
+
+class ActivityWriter:
+    # group commit stage: mapped activities are queued by the producers and
+    # committed every batch_size activities or every flush_interval_sec.
+    # each activity is written inside its own savepoint, so a failure only
+    # rolls back that activity and never leaves it half written
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, flush_interval_sec=DEFAULT_FLUSH_INTERVAL_SEC, on_error=None):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval_sec = flush_interval_sec
+        self.on_error = on_error
+        
+        self.saved_count = 0
+        self.skipped_count = 0
+        self.errors_count = 0
+        self.elapsed_sec = 0.0
+        
+        # buckets of replaced activities, their old dates may differ
+        self._stale_weeks = set()
+        self._stale_days = set()
+        
+        self._queue = queue.Queue(maxsize=self.batch_size * 4)
+        self._thread = threading.Thread(target=self._run, name="activity-writer", daemon=True)
+        # set when an error escapes the writer thread, raised to the producers
+        self._failure = None
+    
+    def start(self):
+        # older databases get the new tables, indexes and aggregates first
+        upgrade(verbose=False)
+        self._started_at = time.monotonic()
+        self._thread.start()
+    
+    def put(self, activity_row, related_objs, bulk_rows=None, replace=False):
+        self._enqueue((activity_row, related_objs, bulk_rows or [], replace))
+    
+    def close(self):
+        if self._thread.is_alive():
+            self._enqueue(_STOP)
+            self._thread.join()
+        self._raise_failure()
+    
+    def _raise_failure(self):
+        if self._failure is not None:
+            raise RuntimeError(f"The activity writer stopped: {self._failure}") from self._failure
+    
+    def _enqueue(self, item):
+        # a dead writer never empties the queue, so a full queue is polled
+        # instead of blocking the producer forever
+        while True:
+            self._raise_failure()
+            try:
+                self._queue.put(item, timeout=QUEUE_POLL_SEC)
+                return
+            except queue.Full:
+                pass
+    
+    def activities_per_sec(self):
+        return self.saved_count / self.elapsed_sec if self.elapsed_sec > 0 else 0.0
+    
+    def _report_error(self, activity_id, error):
+        self.errors_count += 1
+        if self.on_error:
+            self.on_error(activity_id, error)
+    
+    def _write(self, session, activity_row, related_objs, bulk_rows, replace):
+        activity_id = activity_row["id"]
+        savepoint = session.begin_nested()
+        try:
+            if replace:
+                stale_weeks, stale_days = activity_buckets(session, [activity_id])
+                self._stale_weeks |= stale_weeks
+                self._stale_days |= stale_days
+                delete_activity_rows(session, activity_id)
+            
+            # an activity that is already stored (re-synced window, retried
+            # batch) was written with all its rows, so it's a no-op
+            if not upsert_rows(session, Activity, [activity_row]):
+                savepoint.commit()
+                self.skipped_count += 1
+                return False
+            
+            session.add_all(related_objs)
+            session.flush()
+            for model, rows in bulk_rows:
+                # one executemany per table, no orm objects per sample
+                upsert_rows(session, model, rows)
+            savepoint.commit()
+            return True
+        except Exception as e:
+            savepoint.rollback()
+            self._report_error(activity_id, e)
+            return False
+    
+    def _commit(self, session, batch_ids):
+        try:
+            # the aggregates of the touched weeks and days commit together
+            # with the activities
+            weeks, days = activity_buckets(session, batch_ids)
+            refresh_aggregates(session, weeks | self._stale_weeks, days | self._stale_days)
+            session.commit()
+            self.saved_count += len(batch_ids)
+        except Exception as e:
+            session.rollback()
+            for activity_id in batch_ids:
+                self._report_error(activity_id, e)
+        self._stale_weeks.clear()
+        self._stale_days.clear()
+        session.expunge_all()
+    
+    def _run(self):
+        session = SessionLocal()
+        batch_ids = []
+        last_commit = time.monotonic()
+        
+        try:
+            while True:
+                timeout = max(last_commit + self.flush_interval_sec - time.monotonic(), 0.01)
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+                
+                if item is _STOP:
+                    break
+                
+                if item is not None:
+                    activity_row, related_objs, bulk_rows, replace = item
+                    if self._write(session, activity_row, related_objs, bulk_rows, replace):
+                        batch_ids.append(activity_row["id"])
+                
+                due = time.monotonic() - last_commit >= self.flush_interval_sec
+                if len(batch_ids) >= self.batch_size or (batch_ids and due):
+                    self._commit(session, batch_ids)
+                    batch_ids = []
+                    last_commit = time.monotonic()
+                elif due:
+                    last_commit = time.monotonic()
+            
+            if batch_ids:
+                self._commit(session, batch_ids)
+        except BaseException as e:
+            # the uncommitted batch is lost, the next put() or close() raises
+            self._failure = e
+        finally:
+            session.close()
+            self.elapsed_sec = time.monotonic() - self._started_at
@@ -0,0 +1,205 @@
+import json
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from sqlalchemy import select, Integer, Float, String, DateTime
+from tqdm import tqdm
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# pyarrow is only needed by this command
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+from database.config import ReadSessionLocal
+from database.migrations import upgrade
+from database.models import Activity, ActivitySplit, ActivityLap, ActivityStream
+from database.stream_store import CHANNELS, load_stream_arrays
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+PARQUET_DIR = os.getenv("STRAVA_PARQUET_DIR", os.path.join(current_dir, "..", "parquet"))
+MANIFEST_PATH = os.path.join(PARQUET_DIR, "_manifest.json")
+# a chunk is written here first and moved into the datasets once the
+# manifest lists it, the readers never see a half written chunk
+STAGING_DIR = os.path.join(PARQUET_DIR, "_staging")
+EXPORT_CHUNK_SIZE = int(os.getenv("STRAVA_EXPORT_CHUNK_SIZE", "500"))
+
+# dataset directory -> model. every dataset is hive partitioned by year=YYYY
+# of the activity's local date, the streams dataset has one row per sample
+EXPORT_TABLES = {
+    "activities": Activity,
+    "splits": ActivitySplit,
+    "laps": ActivityLap,
+}
+STREAMS_DATASET = "streams"
+
+def _arrow_type(column):
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(column.type, String):
+        return pa.string()
+    raise TypeError(f"no parquet type for the column {column.name}")
+
+def _table_schema(model):
+    return pa.schema(
+        [(column.name, _arrow_type(column)) for column in model.__table__.columns]
+        + [("year", pa.int32())]
+    )
+
+def _streams_schema():
+    return pa.schema(
+        [("activity_id", pa.int64()), ("resolution_sec", pa.int64())]
+        + [(channel, pa.int64() if channel == "time" else pa.float64()) for channel in CHANNELS]
+        + [("year", pa.int32())]
+    )
+
+def load_manifest():
+    if not os.path.exists(MANIFEST_PATH):
+        return {"activity_ids": []}
+    with open(MANIFEST_PATH) as f:
+        return json.load(f)
+
+def _save_manifest(activity_ids, pending_part=None):
+    os.makedirs(PARQUET_DIR, exist_ok=True)
+    manifest = {
+        "activity_ids": sorted(activity_ids),
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    if pending_part:
+        # staged chunk whose activities are already listed, see _publish_part
+        manifest["pending_part"] = pending_part
+    fd, tmp_path = tempfile.mkstemp(dir=PARQUET_DIR, prefix=".tmp.")
+    with os.fdopen(fd, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def _write_dataset(name, table, part_name, root_dir=PARQUET_DIR):
+    # a new file per chunk and year, earlier exports are never rewritten
+    if table.num_rows:
+        pq.write_to_dataset(
+            table,
+            root_path=os.path.join(root_dir, name),
+            partition_cols=["year"],
+            basename_template=f"{part_name}-{{i}}.parquet"
+        )
+
+def _stream_columns(session, activity_ids, years):
+    columns = {name: [] for name in _streams_schema().names}
+    for activity_id in activity_ids:
+        arrays = load_stream_arrays(session, activity_id)
+        if "time" not in arrays:
+            continue
+        
+        length = len(arrays["time"])
+        # seconds rows have no resolution, they are always 1 Hz
+        resolution = session.execute(
+            select(ActivityStream.resolution_sec)
+            .where(ActivityStream.activity_id == activity_id)
+            .limit(1)
+        ).scalar() or 1
+        
+        columns["activity_id"].extend([activity_id] * length)
+        columns["resolution_sec"].extend([resolution] * length)
+        columns["year"].extend([years[activity_id]] * length)
+        for channel in CHANNELS:
+            values = arrays.get(channel)
+            columns[channel].extend(values.tolist() if values is not None else [None] * length)
+    
+    # nan samples become parquet nulls
+    return pa.table({name: pa.array(values, from_pandas=True) for name, values in columns.items()}, schema=_streams_schema())
+
+def _publish_part(part_name):
+    # moves the staged files of a chunk into the datasets. a file that was
+    # already moved is no longer staged, so a resumed publish only moves the
+    # rest and no chunk ends up in the dataset twice
+    part_dir = os.path.join(STAGING_DIR, part_name)
+    for dirpath, _, filenames in os.walk(part_dir):
+        target_dir = os.path.join(PARQUET_DIR, os.path.relpath(dirpath, part_dir))
+        for filename in filenames:
+            os.makedirs(target_dir, exist_ok=True)
+            os.replace(os.path.join(dirpath, filename), os.path.join(target_dir, filename))
+    shutil.rmtree(part_dir, ignore_errors=True)
+
+def _recover_interrupted_export(manifest):
+    # a chunk listed in the manifest is published, anything else that is
+    # still staged was never listed and is exported again
+    exported = set(manifest["activity_ids"])
+    if manifest.get("pending_part"):
+        _publish_part(manifest["pending_part"])
+        _save_manifest(exported)
+    shutil.rmtree(STAGING_DIR, ignore_errors=True)
+    return exported
+
+def export_chunk(session, activity_ids, part_name, root_dir=PARQUET_DIR):
+    activity_rows = session.execute(
+        select(Activity.__table__).where(Activity.id.in_(activity_ids))
+    ).mappings().all()
+    years = {row["id"]: int((row["local_date"] or str(row["start_date"]))[:4]) for row in activity_rows}
+    
+    for name, model in EXPORT_TABLES.items():
+        if model is Activity:
+            rows = [dict(row, year=years[row["id"]]) for row in activity_rows]
+        else:
+            rows = [
+                dict(row, year=years[row["activity_id"]])
+                for row in session.execute(
+                    select(model.__table__).where(model.activity_id.in_(activity_ids))
+                ).mappings().all()
+            ]
+        _write_dataset(name, pa.Table.from_pylist(rows, schema=_table_schema(model)), part_name, root_dir)
+    
+    _write_dataset(STREAMS_DATASET, _stream_columns(session, sorted(years), years), part_name, root_dir)
+    return list(years)
+
+def export_parquet(full=False, chunk_size=EXPORT_CHUNK_SIZE):
+    if pa is None:
+        raise RuntimeError("pyarrow is required to export the parquet dataset")
+    
+    # the dataset schema follows the current models
+    upgrade(verbose=False)
+    
+    if full:
+        # rewrites everything, e.g. after a reprocess changed stored rows
+        for name in [*EXPORT_TABLES, STREAMS_DATASET]:
+            shutil.rmtree(os.path.join(PARQUET_DIR, name), ignore_errors=True)
+        if os.path.exists(MANIFEST_PATH):
+            os.remove(MANIFEST_PATH)
+        shutil.rmtree(STAGING_DIR, ignore_errors=True)
+    
+    exported = _recover_interrupted_export(load_manifest())
+    # the part names of a resumed run must not overwrite the first run's files
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    
+    session = ReadSessionLocal()
+    try:
+        # only activities that are not in the dataset yet are appended
+        all_ids = session.scalars(select(Activity.id).order_by(Activity.start_date)).all()
+        new_ids = [activity_id for activity_id in all_ids if activity_id not in exported]
+        
+        pbar = tqdm(total=len(new_ids), desc="Exporting to parquet", unit="atv", colour="cyan")
+        for i in range(0, len(new_ids), chunk_size):
+            chunk = new_ids[i:i + chunk_size]
+            part_name = f"part-{run_id}-{i // chunk_size:05d}"
+            exported.update(export_chunk(session, chunk, part_name, os.path.join(STAGING_DIR, part_name)))
+            
+            # the manifest follows every chunk, an interrupted export resumes.
+            # the chunk is listed before it is published, and published again
+            # on resume if the move was cut short
+            _save_manifest(exported, pending_part=part_name)
+            _publish_part(part_name)
+            _save_manifest(exported)
+            pbar.update(len(chunk))
+        pbar.close()
+    finally:
+        session.close()
+    
+    print(f"{len(new_ids)} activities exported, {len(exported)} in the dataset ({PARQUET_DIR})")
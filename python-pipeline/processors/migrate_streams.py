@@ -0,0 +1,89 @@
+from tqdm import tqdm
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database.config import SessionLocal, engine, DATABASE_PATH
+from database.models import ActivitySecond, ActivityStream
+from database.upsert import upsert_rows
+from database.stream_store import ensure_stream_table, map_streams_to_channel_rows, arrays_to_streams, load_stream_arrays
+
+from processors.db_writer import DEFAULT_BATCH_SIZE
+
+def checkpoint_wal(cursor):
+    # in WAL mode the committed pages stay in the -wal file until a
+    # checkpoint copies them into the database, TRUNCATE also empties it
+    cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+
+def db_size_mb():
+    connection = engine.raw_connection()
+    try:
+        checkpoint_wal(connection.cursor())
+    finally:
+        connection.close()
+    
+    # the wal is only left when a reader kept the checkpoint from finishing
+    paths = [DATABASE_PATH, f"{DATABASE_PATH}-wal"]
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path)) / (1024 * 1024)
+
+def vacuum_database():
+    # VACUUM can't run inside a transaction, so it goes through the raw
+    # connection (autocommit, see database/config.py)
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        checkpoint_wal(cursor)
+        cursor.execute("VACUUM")
+        # the rebuilt pages are written to the wal, the file only shrinks
+        # once they are checkpointed
+        checkpoint_wal(cursor)
+    finally:
+        connection.close()
+
+# converts activity_seconds rows into compressed per channel arrays
+def migrate_streams(batch_size=DEFAULT_BATCH_SIZE, vacuum=False):
+    ensure_stream_table()
+    size_before = db_size_mb()
+    
+    session = SessionLocal()
+    migrated_count = 0
+    errors_count = 0
+    
+    try:
+        activity_ids = [row[0] for row in session.query(ActivitySecond.activity_id).distinct().all()]
+        pbar = tqdm(activity_ids, desc="Migrating streams", unit="atv", colour="cyan")
+        
+        for i, activity_id in enumerate(pbar, start=1):
+            savepoint = session.begin_nested()
+            try:
+                # still reads activity_seconds, the channel rows don't exist yet
+                streams = arrays_to_streams(load_stream_arrays(session, activity_id))
+                rows = map_streams_to_channel_rows(activity_id, streams)
+                
+                # channels left by an interrupted run are overwritten
+                upsert_rows(session, ActivityStream, rows, update=True)
+                session.query(ActivitySecond).filter(ActivitySecond.activity_id == activity_id).delete(synchronize_session=False)
+                savepoint.commit()
+                migrated_count += 1
+            except Exception as e:
+                savepoint.rollback()
+                errors_count += 1
+                pbar.write(f"Error migrating the activity: {activity_id}: {e}")
+            
+            if i % batch_size == 0:
+                session.commit()
+        
+        session.commit()
+        pbar.close()
+    finally:
+        session.close()
+    
+    if vacuum:
+        print("Running VACUUM...")
+        vacuum_database()
+    
+    print(f"{migrated_count} activities migrated, {errors_count} errors")
+    print(f"Database size: {size_before:.1f} MB -> {db_size_mb():.1f} MB")
+    if not vacuum:
+        print("Run with --vacuum to give the freed pages back to the filesystem")
@@ -1,42 +1,57 @@
+import numpy as np
 from abc import ABC, abstractmethod
 
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from processors.non_recorded_laps_detector.segment_stats import SegmentStats
+
+def find_blocks(mask, max_gap):
+    # runs of effort samples, a break of up to max_gap samples joins two runs
+    # into one block and the break at the end of a block is not part of it.
+    # returns the start and end (exclusive) index of every block
+    edges = np.diff(np.asarray(mask, dtype=np.int8), prepend=0, append=0)
+    run_starts = np.flatnonzero(edges == 1)
+    run_ends = np.flatnonzero(edges == -1)
+    if not len(run_starts):
+        return run_starts, run_ends
+    
+    new_block = run_starts[1:] - run_ends[:-1] > max_gap
+    starts = np.concatenate((run_starts[:1], run_starts[1:][new_block]))
+    ends = np.concatenate((run_ends[:-1][new_block], run_ends[-1:]))
+    return starts, ends
+
 class BaseDetector(ABC):
     def __init__(self, min_speed_moving=0.3, cooldown_speed_threshold=2.2):
         self.min_speed_moving = min_speed_moving
         self.cooldown_speed_threshold = cooldown_speed_threshold
         
+    # (start, end) index pairs of the effort blocks, end exclusive
     @abstractmethod
-    def _detect_blocks(self, processed_dict):
+    def _detect_blocks(self, frame):
         pass
     
+    # summary dict of the effort block [start, end)
     @abstractmethod
-    def _summarize_effort(self, block, label):
+    def _summarize_effort(self, stats, start, end, label):
         pass
     
-    def _summarize_common(self, data_dict_or_list, type_label):
-        if isinstance(data_dict_or_list, list):
-            data_dict = {t: d for t, d in data_dict_or_list}
-        else:
-            data_dict = data_dict_or_list
-            
-        times = sorted(data_dict.keys())
-        if not times:
+    def _summarize_common(self, stats, start, end, type_label):
+        # stats is the SegmentStats of the activity, [start, end) the lap samples
+        if start >= end:
             return {}
         
-        start_time = times[0]
-        end_time = times[-1]
-        start_data = data_dict[start_time]
-        end_data = data_dict[end_time]
+        start_time = int(stats.time[start])
+        end_time = int(stats.time[end - 1])
         
-        distance = end_data["distance_total_m"] - start_data["distance_total_m"]
-        moving_seconds = [t for t, d in data_dict.items() if d.get("speed_m_s", 0) > self.min_speed_moving]
-        moving_duration = len(moving_seconds)
+        distance = stats.distance(start, end)
+        moving_duration = stats.moving_seconds(start, end)
         
         avg_speed = distance / moving_duration if moving_duration > 0 else 0
         pace_seconds = 1000 / avg_speed if avg_speed > 0.3 else 0
         
-        hr_values = [d.get("heart_rate", 0) for d in data_dict.values() if d.get("heart_rate")]
-        avg_hr = sum(hr_values) / len(hr_values) if hr_values else 0
+        avg_hr = stats.avg_hr(start, end)
         
         return {
             "type": type_label,
@@ -44,7 +59,7 @@ class BaseDetector(ABC):
             "start_sec": start_time,
             "end_sec": end_time,
             "total_duration_sec": int(end_time - start_time),
-            "moving_duration_sec": int(moving_duration),
+            "moving_duration_sec": moving_duration,
             "distance_m": round(distance, 1),
             "avg_pace": pace_seconds,
             "avg_hr": round(avg_hr, 1),
@@ -54,100 +69,64 @@ class BaseDetector(ABC):
         }
         
     # used to divide warmup and cooldown in 1km blocks
-    def _split_into_km(self, data_dict, label_prefix):
-        times = sorted(data_dict.keys())
-        if not times: return []
-        
+    def _split_into_km(self, stats, start, end, label_prefix):
         splits = []
-        current_split_data = {}
-        start_distance_offset = data_dict[times[0]]["distance_total_m"]
-        split_count = 1
-        
-        for t in times:
-            current_split_data[t] = data_dict[t]
-            relative_distance = data_dict[t]["distance_total_m"] - start_distance_offset
-            
-            if relative_distance >= 1000:
-                summary = self._summarize_common(current_split_data, label_prefix)
-                summary["lap_index"] = split_count
-                splits.append(summary)
-                current_split_data = {}
-                start_distance_offset = data_dict[t]["distance_total_m"]
-                split_count += 1
-            
-        if current_split_data:
-            summary = self._summarize_common(current_split_data, label_prefix)
+        for split_count, (split_start, split_end) in enumerate(stats.km_splits(start, end), start=1):
+            summary = self._summarize_common(stats, split_start, split_end, label_prefix)
             summary["lap_index"] = split_count
             splits.append(summary)
                         
         return splits
     
-    def analyze(self, processed_dict):
+    def analyze(self, frame):
+        # every lap below is an index range of the frame, one sample per second
+        stats = SegmentStats(frame, self.min_speed_moving)
+        
         # detection
-        effort_blocks = self._detect_blocks(processed_dict)
+        effort_blocks = self._detect_blocks(frame)
         
         if not effort_blocks:
-            return self._split_into_km(processed_dict, "ACTIVITY")
+            return self._split_into_km(stats, 0, len(frame), "ACTIVITY")
         
         full_laps = []
-        times = sorted(processed_dict.keys())
         
         # WARMUP
-        warmup_end_time = effort_blocks[0][0][0]
-        if warmup_end_time > times[0]:
-            warmup_data = {t: processed_dict[t] for t in times if t < warmup_end_time}
-            full_laps.extend(self._split_into_km(warmup_data, "WARMUP"))
+        warmup_end = effort_blocks[0][0]
+        if warmup_end > 0:
+            full_laps.extend(self._split_into_km(stats, 0, warmup_end, "WARMUP"))
             
         # SPLITS and RESTS
         rest_durations = []
         rest_distances = []
-        for i, current_block in enumerate(effort_blocks):
-            summary = self._summarize_effort(current_block, "WORKOUT")
+        for i, (block_start, block_end) in enumerate(effort_blocks):
+            summary = self._summarize_effort(stats, block_start, block_end, "WORKOUT")
             summary["lap_index"] = i + 1
             full_laps.append(summary)
             
-            # rest between laps
+            # rest between laps, up to and with the first second of the next one
             if i < len(effort_blocks) - 1:
-                rest_start = current_block[-1][0] + 1
-                rest_end = effort_blocks[i+1][0][0]
-                rest_data = {t: processed_dict[t] for t in times if rest_start <= t <= rest_end}
-                if rest_data:
-                    lap = self._summarize_common(rest_data, "REST")
-                    lap["lap_index"] = i + 1
-                    full_laps.append(lap)
-                    rest_durations.append(rest_end - rest_start)
-                    rest_distances.append(lap["distance_m"])
+                next_start = effort_blocks[i+1][0]
+                lap = self._summarize_common(stats, block_end, next_start + 1, "REST")
+                lap["lap_index"] = i + 1
+                full_laps.append(lap)
+                rest_durations.append(int(stats.time[next_start] - stats.time[block_end - 1]) - 1)
+                rest_distances.append(lap["distance_m"])
                     
         avg_rest_time = sum(rest_durations) / len(rest_durations) if rest_durations else 60
         avg_rest_dist = sum(rest_distances) / len(rest_distances) if rest_distances else 0
         
-        last_end = effort_blocks[-1][-1][0]
-        cooldown_start = self._find_cooldown_start(processed_dict, last_end, times[-1], avg_rest_time, avg_rest_dist)
+        last_end = effort_blocks[-1][1] - 1
+        cooldown_start = stats.first_cooldown_index(last_end, avg_rest_time, avg_rest_dist, self.cooldown_speed_threshold)
         
         # add last rest
         if cooldown_start > last_end + 1:
-            rest_final = {t: processed_dict[t] for t in times if last_end < t < cooldown_start}
-            lap = self._summarize_common(rest_final, "REST")
+            lap = self._summarize_common(stats, last_end + 1, cooldown_start, "REST")
             lap["lap_index"] = len(effort_blocks)
             full_laps.append(lap)
         
         # COOLDOWN
-        if cooldown_start < times[-1]:
-            cooldown_data = {t: processed_dict[t] for t in times if t >= cooldown_start}
-            full_laps.extend(self._split_into_km(cooldown_data, "COOLDOWN"))
+        if cooldown_start < len(frame) - 1:
+            full_laps.extend(self._split_into_km(stats, cooldown_start, len(frame), "COOLDOWN"))
 
         return full_laps
-    
-    def _find_cooldown_start(self, processed_dict, last_end, activity_end, avg_rest_time, avg_rest_dist):
-        start_dist = processed_dict[last_end]["distance_total_m"]
-        cooldown_time = last_end + 1
-        for t in range(last_end + 1, activity_end + 1):
-            if t not in processed_dict: continue
-            data = processed_dict[t]
-            rest_duration = t - last_end
-            rest_dist = data["distance_total_m"] - start_dist
-            
-            if (avg_rest_dist > 0 and rest_dist > (avg_rest_dist * 1.1)) or (rest_duration > avg_rest_time and data.get("speed_m_s", 0) >= self.cooldown_speed_threshold):
-                break
-            cooldown_time = t + 1
-        return cooldown_time
\ No newline at end of file
+    
\ No newline at end of file
@@ -1,8 +1,10 @@
+import numpy as np
+
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from processors.non_recorded_laps_detector.base_detector import BaseDetector
+from processors.non_recorded_laps_detector.base_detector import BaseDetector, find_blocks
 
 class HillDetector(BaseDetector):
     def __init__(self, min_elevation_gain=5.0, min_grade=2.0, min_warmup_dist_m=1000, **kwargs):
@@ -11,64 +13,26 @@ class HillDetector(BaseDetector):
         self.min_grade = min_grade
         self.min_warmup_dist_m = min_warmup_dist_m
         
-    def _detect_blocks(self, processed_dict):
-        times = sorted(processed_dict.keys())
-        blocks = []
-        current_block = []
-        
-        gap_counter = 0
-        max_gap = 5
-        
-        for t in times:
-            data = processed_dict[t]
-            grade = data.get("grade_percent", 0)
-            vertical_speed = data.get("vertical_speed_m_s", 0)
-            
-            is_uphill = grade > 1.0 or vertical_speed > 0.05
-            
-            if is_uphill:
-                current_block.append((t, data))
-                gap_counter = 0
-            else:
-                if current_block and gap_counter < max_gap:
-                    current_block.append((t, data))
-                    gap_counter += 1
-                elif current_block:
-                    if gap_counter >= len(current_block):
-                        real_block = []
-                    else:
-                        real_block = current_block[:-gap_counter] if gap_counter > 0 else current_block
-                    
-                    if real_block and self._is_valid_hill(real_block):
-                        blocks.append(real_block)
-                    
-                    current_block = []
-                    gap_counter = 0
-                    
-        if current_block:
-            real_block = current_block[:-gap_counter] if gap_counter > 0 else current_block
-            if self._is_valid_hill(real_block):
-                blocks.append(real_block)
-        
-        # filter warmup distance
-        return [b for b in blocks if b[0][1]["distance_total_m"] >= self.min_warmup_dist_m]
-    
-    def _is_valid_hill(self, block):
-        if not block:
-            return False
-        
-        elevation_gain = block[-1][1]["elevation_m"] - block[0][1]["elevation_m"]
-        
-        distance = block[-1][1]["distance_total_m"] - block[0][1]["distance_total_m"]
-        
-        avg_grade = (elevation_gain / distance * 100) if distance > 0 else 0
-        
-        return elevation_gain >= self.min_elevation_gain and avg_grade >= self.min_grade
+    def _detect_blocks(self, frame):
+        uphill = (frame.grade_percent > 1.0) | (frame.vertical_speed_m_s > 0.05)
+        starts, ends = find_blocks(uphill, max_gap=5)
+        
+        elevation_gain = frame.elevation_m[ends - 1] - frame.elevation_m[starts]
+        distance = frame.distance_total_m[ends - 1] - frame.distance_total_m[starts]
+        avg_grade = np.divide(elevation_gain, distance, out=np.zeros(len(starts)), where=distance > 0) * 100
+        
+        valid = (
+            (elevation_gain >= self.min_elevation_gain) &
+            (avg_grade >= self.min_grade) &
+            # filter warmup distance
+            (frame.distance_total_m[starts] >= self.min_warmup_dist_m)
+        )
+        return list(zip(starts[valid].tolist(), ends[valid].tolist()))
     
-    def _summarize_effort(self, block, label):
-        summary = self._summarize_common(block, label)
+    def _summarize_effort(self, stats, start, end, label):
+        summary = self._summarize_common(stats, start, end, label)
         
-        elev_gain = block[-1][1]["elevation_m"] - block[0][1]["elevation_m"]
+        elev_gain = stats.elevation_gain(start, end)
         distance = summary["distance_m"]
         moving_sec = summary["moving_duration_sec"]
         
@@ -0,0 +1,89 @@
+import numpy as np
+
+def _prefix_sum(values):
+    # prefix[i] is the sum of values[:i], so values[start:end] sums to
+    # prefix[end] - prefix[start]
+    return np.concatenate(([0], np.cumsum(values)))
+
+class SegmentStats:
+    # built once per activity from a StreamFrame, every lap summary then reads
+    # a [start, end) index range in O(1) instead of scanning its samples
+    def __init__(self, frame, min_speed_moving):
+        self.time = frame.time
+        self.distance_m = frame.distance_total_m
+        self.elevation_m = frame.elevation_m
+        self.speed_m_s = frame.speed_m_s
+        
+        has_hr = (frame.heart_rate != 0) & ~np.isnan(frame.heart_rate)
+        self.moving_sum = _prefix_sum(frame.speed_m_s > min_speed_moving)
+        self.hr_sum = _prefix_sum(np.where(has_hr, frame.heart_rate, 0.0))
+        self.hr_count = _prefix_sum(has_hr)
+    
+    def __len__(self):
+        return len(self.time)
+    
+    def moving_seconds(self, start, end):
+        return int(self.moving_sum[end] - self.moving_sum[start])
+    
+    def distance(self, start, end):
+        return float(self.distance_m[end - 1] - self.distance_m[start])
+    
+    def elevation_gain(self, start, end):
+        return float(self.elevation_m[end - 1] - self.elevation_m[start])
+    
+    def avg_hr(self, start, end):
+        count = int(self.hr_count[end] - self.hr_count[start])
+        return float(self.hr_sum[end] - self.hr_sum[start]) / count if count else 0
+    
+    def km_splits(self, start, end):
+        # [start, end) cut every time the distance from the split start reaches
+        # 1000 m, the sample that reaches it closes the split. returns the
+        # (start, end) pairs, the last one is whatever distance is left
+        if start >= end:
+            return []
+        
+        offset = self.distance_m[start]
+        if np.isnan(offset):
+            # no distance yet at the start (leading gap), nothing to cut on
+            return [(start, end)]
+        
+        # the running max is sorted, its first sample over a threshold is the
+        # first distance sample over it
+        reached = np.maximum.accumulate(self.distance_m[start:end])
+        splits = []
+        split_start = 0
+        
+        while split_start < len(reached):
+            # searchsorted finds the threshold, the steps around it keep the
+            # exact "distance - offset >= 1000" test of the per second loop
+            i = max(int(np.searchsorted(reached, offset + 1000)), split_start)
+            while i > split_start and reached[i - 1] - offset >= 1000:
+                i -= 1
+            while i < len(reached) and reached[i] - offset < 1000:
+                i += 1
+            
+            if i == len(reached):
+                break
+            splits.append((start + split_start, start + i + 1))
+            offset = self.distance_m[start + i]
+            split_start = i + 1
+        
+        if split_start < len(reached):
+            splits.append((start + split_start, end))
+        return splits
+    
+    def first_cooldown_index(self, last_end, avg_rest_time, avg_rest_dist, speed_threshold):
+        # index of the first sample after the last effort (index last_end)
+        # that runs further than an average rest, or faster than the threshold
+        # once an average rest is over. the cooldown starts there
+        time = self.time[last_end + 1:]
+        rest_dist = self.distance_m[last_end + 1:] - self.distance_m[last_end]
+        rest_duration = time - self.time[last_end]
+        
+        ends_rest = (rest_duration > avg_rest_time) & (self.speed_m_s[last_end + 1:] >= speed_threshold)
+        if avg_rest_dist > 0:
+            ends_rest |= rest_dist > (avg_rest_dist * 1.1)
+        
+        if not ends_rest.any():
+            return len(self)
+        return last_end + 1 + int(np.argmax(ends_rest))
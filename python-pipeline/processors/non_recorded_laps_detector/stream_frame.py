@@ -0,0 +1,78 @@
+import numpy as np
+from typing import Dict
+
+# processed per second channels the detectors read
+STREAM_FRAME_COLUMNS = (
+    "time",
+    "distance_total_m",
+    "speed_m_s",
+    "heart_rate",
+    "elevation_m",
+    "grade_percent",
+    "vertical_speed_m_s",
+)
+
+class StreamFrame:
+    # one contiguous numpy array per channel, same length and ordered by time.
+    # slicing returns views on the same arrays, so blocks, rests and km splits
+    # never copy samples or build per second dicts
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        missing = [name for name in STREAM_FRAME_COLUMNS if name not in columns]
+        if missing:
+            raise ValueError(f"StreamFrame is missing the columns: {missing}")
+        
+        self.columns = {name: np.ascontiguousarray(columns[name]) for name in STREAM_FRAME_COLUMNS}
+        lengths = {len(values) for values in self.columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"StreamFrame columns have different lengths: {sorted(lengths)}")
+    
+    @classmethod
+    def empty(cls):
+        return cls({name: np.empty(0, dtype=np.int64 if name == "time" else float) for name in STREAM_FRAME_COLUMNS})
+    
+    @property
+    def time(self):
+        return self.columns["time"]
+    
+    @property
+    def distance_total_m(self):
+        return self.columns["distance_total_m"]
+    
+    @property
+    def speed_m_s(self):
+        return self.columns["speed_m_s"]
+    
+    @property
+    def heart_rate(self):
+        return self.columns["heart_rate"]
+    
+    @property
+    def elevation_m(self):
+        return self.columns["elevation_m"]
+    
+    @property
+    def grade_percent(self):
+        return self.columns["grade_percent"]
+    
+    @property
+    def vertical_speed_m_s(self):
+        return self.columns["vertical_speed_m_s"]
+    
+    def __len__(self):
+        return len(self.columns["time"])
+    
+    def __getitem__(self, index):
+        # positional slices only, frame[i:j] is a frame of views
+        if not isinstance(index, slice):
+            raise TypeError("StreamFrame can only be sliced, e.g. frame[start:end]")
+        return StreamFrame({name: values[index] for name, values in self.columns.items()})
+    
+    def between(self, start_sec=None, end_sec=None):
+        # samples with start_sec <= time <= end_sec, found by binary search
+        start = 0 if start_sec is None else int(np.searchsorted(self.time, start_sec, side="left"))
+        end = len(self) if end_sec is None else int(np.searchsorted(self.time, end_sec, side="right"))
+        return self[start:max(start, end)]
+    
+    def index_of(self, time_sec):
+        # position of the first sample at or after time_sec
+        return int(np.searchsorted(self.time, time_sec, side="left"))
@@ -1,21 +1,24 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, List
+from typing import Dict
 
-def process_activity_streams_pd(seconds: List[object]) -> Dict[int, dict]:
-    if not seconds:
-        return {}
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from processors.non_recorded_laps_detector.stream_frame import StreamFrame, STREAM_FRAME_COLUMNS
+
+def process_activity_streams_pd(columns: Dict[str, np.ndarray]) -> StreamFrame:
+    if not len(columns["second_index"]):
+        return StreamFrame.empty()
     
-    # create DataFrame from objects
-    df = pd.DataFrame([s.__dict__ for s in seconds])
-    df = df.drop(columns=["_sa_instance_state"], errors="ignore")
+    # numpy columns of map_streams_to_columns, no per second rows
+    df = pd.DataFrame(columns)
     
     df = df.set_index("second_index")
     full_range = range(df.index.min(), df.index.max() + 1)
     df = df.reindex(full_range)
     
-    df = df.apply(pd.to_numeric, errors="coerce")
-    
     # interpolation
     df["distance_total_m"] = df["distance_total_m"].interpolate(method="linear", limit=20)
     df["elevation_m"] = df["elevation_m"].interpolate(method="linear", limit=10)
@@ -51,4 +54,6 @@ def process_activity_streams_pd(seconds: List[object]) -> Dict[int, dict]:
     
     df[["elevation_m", "heart_rate", "vertical_speed_m_s"]] = df[["elevation_m", "heart_rate", "vertical_speed_m_s"]].fillna(0)
     
-    return df.to_dict(orient="index")
\ No newline at end of file
+    # one array per channel instead of a dict per second
+    df["time"] = df.index
+    return StreamFrame({name: df[name].to_numpy(dtype=np.int64 if name == "time" else float) for name in STREAM_FRAME_COLUMNS})
@@ -0,0 +1,249 @@
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import func
+from tqdm import tqdm
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database.config import SessionLocal
+from database.models import ActivityLap, ActivitySplit
+from database.migrations import upgrade
+from database.aggregates import activity_buckets, refresh_aggregates
+from database.upsert import upsert_rows
+from database.queries import fetch_stream_workouts
+from database.stream_store import load_stream_arrays, arrays_to_streams
+
+from collector.raw_cache import load_raw_activity
+
+from processors.build_activity import detect_laps
+from processors.db_mappers.streams import map_streams_to_columns
+from processors.db_mappers.laps import map_laps_to_rows
+from processors.db_mappers.splits import map_splits_to_rows
+from processors.data_mappers.laps_data_to_list import map_recorded_laps_to_list
+from processors.type_classifiers.util_type_classifiers import STREAM_WORKOUT_TYPES
+
+DEFAULT_REDETECT_WORKERS = int(os.getenv("STRAVA_REDETECT_WORKERS", str(os.cpu_count() or 1)))
+DEFAULT_REDETECT_BATCH_SIZE = int(os.getenv("STRAVA_REDETECT_BATCH_SIZE", "100"))
+
+# lap type only the detectors write, the km laps of a session without efforts
+DETECTED_ONLY_LAP_TYPES = {"ACTIVITY"}
+
+def redetect_activity(activity_id, workout_type, recorded_laps, splits_data, arrays, streams):
+    # runs in the process pool, only lists and numpy arrays go in and
+    # (lap rows, split rows) come out, the same rows build_activity_objects
+    # writes for a stream workout
+    if len(recorded_laps) > 1:
+        # the watch laps are kept, only their labels are classified again
+        return map_laps_to_rows(activity_id, recorded_laps, workout_type), []
+    
+    if streams is None:
+        streams = arrays_to_streams(arrays)
+    laps = detect_laps(workout_type, map_streams_to_columns(streams))
+    if laps:
+        return map_laps_to_rows(activity_id, laps), []
+    # nothing found, the strava splits are the fallback as in a sync
+    return [], map_splits_to_rows(activity_id, splits_data)
+
+def _are_watch_laps(laps):
+    # laps is [(lap_index, lap_type)] of the stored rows. watch laps are only
+    # stored when there are several, numbered once by strava. the detectors
+    # number every segment from 1 (warmup km, efforts, rests, cooldown km),
+    # so their indexes repeat, or they are all km laps of the whole activity
+    indexes = [lap_index for lap_index, _ in laps]
+    return (
+        len(laps) > 1
+        and len(set(indexes)) == len(indexes)
+        and not any(lap_type in DETECTED_ONLY_LAP_TYPES for _, lap_type in laps)
+    )
+
+def _stored_watch_laps(session, activity_id):
+    laps = session.query(ActivityLap.lap_index, ActivityLap.lap_type).filter(ActivityLap.activity_id == activity_id).all()
+    return _are_watch_laps(laps)
+
+def _stored_splits_data(session, activity_id):
+    # the splits_metric entries behind the stored split rows, so a fallback
+    # without the raw detail writes the same splits again
+    rows = (
+        session.query(ActivitySplit.split_index, ActivitySplit.distance_km, ActivitySplit.moving_time_sec)
+        .filter(ActivitySplit.activity_id == activity_id)
+        .order_by(ActivitySplit.split_index)
+        .all()
+    )
+    return [{"split": split_index, "distance": distance_km * 1000, "moving_time": moving_time_sec} for split_index, distance_km, moving_time_sec in rows]
+
+def _load_job(session, activity, detail):
+    # (recorded laps, splits, stored arrays, raw streams), None without 1 Hz streams.
+    # activities synced before the raw cache have no detail, the stored rows
+    # stand in for it (their watch laps were left out by _iter_detected)
+    if detail is None:
+        recorded_laps = []
+        splits_data = _stored_splits_data(session, activity.id)
+    else:
+        recorded_laps = map_recorded_laps_to_list(detail)
+        splits_data = detail.get("splits_metric", [])
+        if len(recorded_laps) > 1:
+            return recorded_laps, splits_data, None, None
+    
+    # downsampled streams (retention) are not what the laps were detected on
+    if (activity.resolution_sec or 1) == 1:
+        arrays = load_stream_arrays(session, activity.id)
+        if "time" in arrays:
+            return recorded_laps, splits_data, arrays, None
+    
+    # dropped or downsampled, the raw cache may still have the 1 Hz streams
+    cached = load_raw_activity(activity.id)
+    if cached and cached[1]:
+        return recorded_laps, splits_data, None, cached[1]
+    return None
+
+def _iter_detected(executor, session, activities, max_in_flight, on_skip):
+    # streams are read here, detection runs ahead in the pool and the results
+    # come back in the same order as the activities
+    pending = deque()
+    for activity in activities:
+        cached = load_raw_activity(activity.id, with_streams=False)
+        detail = cached[0] if cached else None
+        # without the raw detail the watch laps can't be classified again,
+        # they are kept as stored
+        if detail is None and _stored_watch_laps(session, activity.id):
+            on_skip(activity, "watch_laps")
+            continue
+        
+        job = _load_job(session, activity, detail)
+        if job is None:
+            on_skip(activity, "no_streams")
+            continue
+        
+        pending.append((activity, executor.submit(redetect_activity, activity.id, activity.workout_type, *job)))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft()
+    
+    while pending:
+        yield pending.popleft()
+
+def _stored_rows(session, activity_ids):
+    # {activity_id: (lap types, split count)}
+    stored = {activity_id: ([], 0) for activity_id in activity_ids}
+    lap_rows = (
+        session.query(ActivityLap.activity_id, ActivityLap.lap_type)
+        .filter(ActivityLap.activity_id.in_(activity_ids))
+        .order_by(ActivityLap.activity_id, ActivityLap.id)
+        .all()
+    )
+    for activity_id, lap_type in lap_rows:
+        stored[activity_id][0].append(lap_type)
+
+    split_counts = (
+        session.query(ActivitySplit.activity_id, func.count(ActivitySplit.id))
+        .filter(ActivitySplit.activity_id.in_(activity_ids))
+        .group_by(ActivitySplit.activity_id)
+        .all()
+    )
+    for activity_id, count in split_counts:
+        stored[activity_id] = (stored[activity_id][0], count)
+    return stored
+
+def _describe_rows(lap_types, split_count):
+    if lap_types:
+        return ", ".join(f"{label} {count}" for label, count in Counter(lap_types).items())
+    return f"no laps, {split_count} splits" if split_count else "no laps"
+
+def _replace_rows(session, rows_by_activity):
+    # one transaction per batch: the old laps and splits go, the new ones and
+    # the aggregates of the touched weeks and days (built on the splits) come
+    activity_ids = list(rows_by_activity)
+    for model in (ActivityLap, ActivitySplit):
+        session.query(model).filter(model.activity_id.in_(activity_ids)).delete(synchronize_session=False)
+    
+    upsert_rows(session, ActivityLap, [row for lap_rows, _ in rows_by_activity.values() for row in lap_rows])
+    upsert_rows(session, ActivitySplit, [row for _, split_rows in rows_by_activity.values() for row in split_rows])
+    
+    weeks, days = activity_buckets(session, activity_ids)
+    refresh_aggregates(session, weeks, days)
+    session.commit()
+
+def redetect_laps(workout_types=STREAM_WORKOUT_TYPES, since=None, until=None, dry_run=False, workers=DEFAULT_REDETECT_WORKERS, batch_size=DEFAULT_REDETECT_BATCH_SIZE):
+    upgrade(verbose=False)
+    activities = fetch_stream_workouts(workout_types, since, until)
+    
+    workers = max(1, workers)
+    batch_size = max(1, batch_size)
+    
+    changed_count = 0
+    unchanged_count = 0
+    splits_count = 0
+    skipped = Counter()
+    replaced_count = 0
+    errors_count = 0
+    
+    def on_skip(activity, reason):
+        skipped[reason] += 1
+        pbar.update(1)
+    
+    def flush(batch):
+        nonlocal changed_count, unchanged_count, replaced_count, errors_count
+        stored = _stored_rows(session, [activity.id for activity, _ in batch])
+        for activity, (lap_rows, split_rows) in batch:
+            old = stored[activity.id]
+            new = ([row["lap_type"] for row in lap_rows], len(split_rows))
+            if old == new:
+                unchanged_count += 1
+                continue
+            
+            changed_count += 1
+            if dry_run:
+                pbar.write(f"{activity.id} {activity.local_date} {(activity.name or '')[:30]}: {_describe_rows(*old)} -> {_describe_rows(*new)}")
+        
+        if dry_run:
+            return
+        
+        try:
+            _replace_rows(session, {activity.id: rows for activity, rows in batch})
+            replaced_count += len(batch)
+        except Exception as e:
+            session.rollback()
+            errors_count += len(batch)
+            pbar.write(f"Error replacing the laps of {len(batch)} activities: {e}")
+    
+    session = SessionLocal()
+    executor = ProcessPoolExecutor(max_workers=workers)
+    pbar = tqdm(total=len(activities), desc="Re-detecting laps", unit="atv", colour="cyan")
+    try:
+        batch = []
+        for activity, future in _iter_detected(executor, session, activities, workers * 4, on_skip):
+            pbar.update(1)
+            try:
+                lap_rows, split_rows = future.result()
+            except Exception as e:
+                errors_count += 1
+                pbar.write(f"Error in the activity: {activity.id}: {e}")
+                continue
+            
+            # nothing found with the current thresholds, back to the splits
+            if not lap_rows:
+                splits_count += 1
+            
+            batch.append((activity, (lap_rows, split_rows)))
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        
+        if batch:
+            flush(batch)
+    finally:
+        executor.shutdown(wait=True)
+        session.close()
+    
+    pbar.colour = "green"
+    pbar.set_description("Re-detection completed")
+    pbar.refresh()
+    pbar.close()
+    
+    print(f"{changed_count} activities with different laps, {unchanged_count} unchanged, {splits_count} without detected laps (splits), {errors_count} errors")
+    print(f"Skipped: {skipped['no_streams']} without 1 Hz streams, {skipped['watch_laps']} with watch laps and no raw detail to classify them again (kept)")
+    if dry_run:
+        print("Dry run, no laps were written")
+    else:
+        print(f"Laps replaced for {replaced_count} activities")
@@ -0,0 +1,50 @@
+from tqdm import tqdm
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from collector.raw_cache import iter_cached_activity_ids, load_raw_activity
+
+from processors.build_activity import build_activity_objects
+from processors.db_writer import ActivityWriter, DEFAULT_BATCH_SIZE
+
+# rebuilds activities, splits, laps and seconds from the raw cache, no api calls
+def reprocess_activities(batch_size=DEFAULT_BATCH_SIZE):
+    errors_count = 0
+    
+    pbar = tqdm(list(iter_cached_activity_ids()), desc="Reprocessing", unit="atv", colour="cyan")
+    
+    writer = ActivityWriter(
+        batch_size=batch_size,
+        on_error=lambda activity_id, e: pbar.write(f"Error saving the activity: {activity_id}: {e}")
+    )
+    writer.start()
+    
+    try:
+        for activity_id in pbar:
+            try:
+                cached = load_raw_activity(activity_id)
+                if cached is None:
+                    continue
+            
+                full_data, streams = cached
+                activity_row, related_objs, bulk_rows, source = build_activity_objects(full_data, streams)
+                pbar.set_postfix(saved = writer.saved_count, errors = errors_count + writer.errors_count, status = source)
+            
+                # old rows are replaced in the same savepoint as the new ones
+                writer.put(activity_row, related_objs, bulk_rows, replace=True)
+        
+            except Exception as e:
+                errors_count += 1
+                pbar.write(f"Error in the activity: {activity_id}: {e}")
+    finally:
+        # also on an interrupt: the queued activities are committed
+        writer.close()
+    
+    pbar.colour = "green"
+    pbar.set_description("Reprocess completed")
+    pbar.refresh()
+    pbar.close()
+    
+    print(f"{writer.saved_count} activities were reprocessed, {errors_count + writer.errors_count} errors")
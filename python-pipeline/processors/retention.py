@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta, timezone
+from tqdm import tqdm
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database.config import SessionLocal, engine
+from database.models import Activity, ActivitySecond, ActivityStream, ActivityLap
+from database.migrations import upgrade
+from database.upsert import upsert_rows
+from database.stream_store import map_streams_to_channel_rows, arrays_to_streams, load_stream_arrays, downsample_arrays
+
+from processors.db_writer import DEFAULT_BATCH_SIZE
+from processors.migrate_streams import db_size_mb
+
+# full 1 Hz streams are kept for the most recent activities only, the lap
+# detection reads them once at ingest and the charts never do
+RETENTION_FULL_DAYS = int(os.getenv("STRAVA_RETENTION_FULL_DAYS", "90"))
+RETENTION_BUCKET_SEC = int(os.getenv("STRAVA_RETENTION_BUCKET_SEC", "10"))
+VACUUM_STEP_PAGES = int(os.getenv("STRAVA_VACUUM_STEP_PAGES", "1024"))
+
+def _old_stream_activity_ids(session, cutoff):
+    # activities before the cutoff with seconds rows or 1 Hz columnar streams.
+    # streams that were already downsampled are left as they are, their bucket
+    # means can't be averaged again without the samples behind each one
+    seconds = (
+        session.query(ActivitySecond.activity_id)
+        .join(Activity, Activity.id == ActivitySecond.activity_id)
+        .filter(Activity.start_date < cutoff)
+        .distinct()
+    )
+    streams = (
+        session.query(ActivityStream.activity_id)
+        .join(Activity, Activity.id == ActivityStream.activity_id)
+        .filter(Activity.start_date < cutoff)
+        .filter(ActivityStream.resolution_sec == 1)
+        .distinct()
+    )
+    return sorted({row[0] for row in seconds.union(streams).all()})
+
+def _activity_ids_with_laps(session, activity_ids):
+    rows = session.query(ActivityLap.activity_id).filter(ActivityLap.activity_id.in_(activity_ids)).distinct().all()
+    return {row[0] for row in rows}
+
+def _delete_streams(session, activity_id):
+    for model in (ActivitySecond, ActivityStream):
+        session.query(model).filter(model.activity_id == activity_id).delete(synchronize_session=False)
+
+def downsample_activity_streams(session, activity_id, bucket_sec):
+    arrays = load_stream_arrays(session, activity_id)
+    if not arrays or "time" not in arrays:
+        return False
+    
+    # seconds rows end up as columnar streams too, the elevation range has
+    # no activity_seconds column
+    rows = map_streams_to_channel_rows(activity_id, arrays_to_streams(downsample_arrays(arrays, bucket_sec)), bucket_sec)
+    _delete_streams(session, activity_id)
+    upsert_rows(session, ActivityStream, rows)
+    return True
+
+def incremental_vacuum(step_pages=VACUUM_STEP_PAGES):
+    # gives the free pages back in steps of step_pages, each step is its own
+    # short transaction (autocommit raw connection, see database/config.py),
+    # so a running sync or plot only waits for one step.
+    # returns the bytes reclaimed
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        page_size = cursor.execute("PRAGMA page_size").fetchone()[0]
+        free_pages = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+        
+        if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # the mode can only change with a full VACUUM, once per database
+            print("Converting the database to incremental auto_vacuum (full VACUUM, runs once)...")
+            cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            cursor.execute("VACUUM")
+        else:
+            remaining = free_pages
+            while remaining > 0:
+                cursor.execute(f"PRAGMA incremental_vacuum({step_pages})").fetchall()
+                left = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+                if left >= remaining:
+                    break
+                remaining = left
+        
+        reclaimed = free_pages - cursor.execute("PRAGMA freelist_count").fetchone()[0]
+        # in WAL mode the file only shrinks once the wal is checkpointed
+        cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        cursor.close()
+        return reclaimed * page_size
+    finally:
+        connection.close()
+
+def apply_retention(keep_days=RETENTION_FULL_DAYS, bucket_sec=RETENTION_BUCKET_SEC, drop_with_laps=False, vacuum=True, batch_size=DEFAULT_BATCH_SIZE):
+    upgrade(verbose=False)
+    size_before = db_size_mb()
+    # start_date is stored as naive utc
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=keep_days)
+    
+    session = SessionLocal()
+    downsampled_count = 0
+    dropped_count = 0
+    errors_count = 0
+    
+    try:
+        activity_ids = _old_stream_activity_ids(session, cutoff)
+        # their laps are already stored, the streams are no longer needed
+        drop_ids = _activity_ids_with_laps(session, activity_ids) if drop_with_laps else set()
+        
+        pbar = tqdm(activity_ids, desc="Applying retention", unit="atv", colour="cyan")
+        for i, activity_id in enumerate(pbar, start=1):
+            savepoint = session.begin_nested()
+            try:
+                if activity_id in drop_ids:
+                    _delete_streams(session, activity_id)
+                    dropped_count += 1
+                elif downsample_activity_streams(session, activity_id, bucket_sec):
+                    downsampled_count += 1
+                savepoint.commit()
+            except Exception as e:
+                savepoint.rollback()
+                errors_count += 1
+                pbar.write(f"Error applying retention to the activity: {activity_id}: {e}")
+            
+            if i % batch_size == 0:
+                session.commit()
+        
+        session.commit()
+        pbar.close()
+    finally:
+        session.close()
+    
+    print(f"{downsampled_count} activities downsampled to {bucket_sec}s, {dropped_count} streams dropped, {errors_count} errors (full resolution kept since {cutoff:%Y-%m-%d})")
+    
+    if vacuum:
+        reclaimed_bytes = incremental_vacuum()
+        print(f"Vacuum reclaimed {reclaimed_bytes / (1024 * 1024):.1f} MB of free pages")
+    
+    size_after = db_size_mb()
+    print(f"Database size: {size_before:.1f} MB -> {size_after:.1f} MB ({size_before - size_after:.1f} MB reclaimed)")
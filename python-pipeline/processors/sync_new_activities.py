@@ -1,134 +1,128 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
 from tqdm import tqdm
-import time
 import colorama
 
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from database.config import SessionLocal
-from database.queries import get_last_activity_timestamp
-from database.models import Activity
+from database.migrations import upgrade
+from database.queries import get_last_activity_timestamp, fetch_existing_activity_ids
 
-from collector.activities import get_all_activities
+from collector.activities import iter_activity_pages
 from collector.activities import get_activity_by_id
 from collector.streams import fetch_activity_streams
+from collector.rate_limit import governor
+from collector.raw_cache import save_raw_activity, load_raw_activity
 
-from processors.db_mappers.activities import map_activity_to_db_model
-from processors.db_mappers.streams import map_streams_to_db_model
-from processors.db_mappers.splits import map_splits_to_db_model
-from processors.db_mappers.laps import map_laps_to_db_model
+from processors.build_activity import build_activity_objects
+from processors.db_writer import ActivityWriter, DEFAULT_BATCH_SIZE
 
-from processors.data_mappers.laps_data_to_list import map_recorded_laps_to_list
+from processors.type_classifiers.activity_type_classifier import classify_workout_type
+from processors.type_classifiers.util_type_classifiers import STREAM_WORKOUT_TYPES
 
-from processors.non_recorded_laps_detector.streams_processor import process_activity_streams_pd
-from processors.non_recorded_laps_detector.interval_detector import IntervalDetector
-from processors.non_recorded_laps_detector.hill_detector import HillDetector
+colorama.init(autoreset=True)
 
-from processors.type_classifiers.util_type_classifiers import STREAM_WORKOUT_TYPES, WORKOUT_INTERVAL, WORKOUT_HILL_REPEATS
+DEFAULT_FETCH_WORKERS = int(os.getenv("STRAVA_SYNC_WORKERS", "4"))
 
-colorama.init(autoreset=True)
+def needs_streams(full_data):
+    return classify_workout_type(full_data) in STREAM_WORKOUT_TYPES
 
-def sync_new_activities():
-    session = SessionLocal()
-    last_ts = get_last_activity_timestamp()
-    summary_activities = get_all_activities(after=last_ts)
+def fetch_activity_payload(activity_id):
+    # raw responses already on disk (e.g. after a db reset) cost no requests
+    cached = load_raw_activity(activity_id)
+    if cached and (cached[1] is not None or not needs_streams(cached[0])):
+        return cached[0], cached[1], 0
+    
+    full_data = get_activity_by_id(activity_id)
+    api_calls = 1
+    
+    streams = None
+    if needs_streams(full_data):
+        streams = fetch_activity_streams(activity_id)
+        api_calls += 1
+    
+    save_raw_activity(activity_id, full_data, streams)
+    return full_data, streams, api_calls
+
+def wait_for_payload(future, pbar):
+    # keep the rate limit status fresh while the governor holds the workers
+    while not wait([future], timeout=1).done:
+        pbar.set_postfix_str(f"quota: {governor.describe()}")
+    return future.result()
+
+def filter_new_runs(summaries):
+    runs = [s for s in summaries if s.get("type") == "Run"]
+    existing_ids = fetch_existing_activity_ids(s["id"] for s in runs)
+    return [s for s in runs if s["id"] not in existing_ids]
+        
+def iter_new_runs(after):
+    # summaries arrive page by page, so downloads start with the first page,
+    # and each page is checked against the db with a single query
+    for page in iter_activity_pages(after=after):
+        yield from filter_new_runs(page)
+
+def iter_fetched(executor, summaries, max_in_flight):
+    # downloads run ahead in the pool, results come back in the same order
+    # as the summaries
+    pending = deque()
+    for summary in summaries:
+        pending.append((summary, executor.submit(fetch_activity_payload, summary["id"])))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft()
     
-    runs_to_process = [s for s in summary_activities if s.get("type") == "Run"]
+    while pending:
+        yield pending.popleft()
+
+def sync_new_activities(workers=DEFAULT_FETCH_WORKERS, batch_size=DEFAULT_BATCH_SIZE):
+    # older databases get the new columns before the first query reads them
+    upgrade(verbose=False)
+    last_ts = get_last_activity_timestamp()
     
-    base_sleep = 1 if len(runs_to_process) < 45 else 10
+    workers = max(1, workers)
     
-    saved_count = 0
     errors_count = 0
     api_calls = 1
     
-    pbar = tqdm(runs_to_process, desc="Starting synchronization", unit="atv", colour="cyan")
+    executor = ThreadPoolExecutor(max_workers=workers)
+    fetched = iter_fetched(executor, iter_new_runs(last_ts), max_in_flight=workers * 2)
     
-    for summary in pbar:
-        pbar.set_description(f"Processing: {summary.get("name")[:20]}")
-        pbar.set_postfix(api_reqs = api_calls, saved = saved_count, errors = errors_count)
-        
-        exists = (
-            session.query(Activity)
-            .filter_by(id=summary["id"])
-            .first()
-        )
-        if exists:
-            continue
+    pbar = tqdm(fetched, desc="Starting synchronization", unit="atv", colour="cyan")
+    
+    # fetching and detection run ahead, the writer commits in batches
+    writer = ActivityWriter(
+        batch_size=batch_size,
+        on_error=lambda activity_id, e: pbar.write(f"Error saving the activity: {activity_id}: {e}")
+    )
+    writer.start()
+    
+    try:
+        for summary, future in pbar:
+            pbar.set_description(f"Processing: {summary.get("name")[:20]}")
+            pbar.set_postfix(api_reqs = api_calls, saved = writer.saved_count, errors = errors_count + writer.errors_count, quota = governor.describe())
         
-        try:
-            full_data = get_activity_by_id(summary["id"])
-            api_calls += 1
+            try:
+                full_data, streams, fetch_calls = wait_for_payload(future, pbar)
+                api_calls += fetch_calls
             
-            activity_obj = map_activity_to_db_model(full_data)
-            session.add(activity_obj)
-            session.flush()
+                activity_row, related_objs, bulk_rows, source = build_activity_objects(full_data, streams)
+                pbar.set_postfix(api_reqs = api_calls, status = source)
             
-            # need to download streams and laps
-            if activity_obj.workout_type in STREAM_WORKOUT_TYPES:
-                pbar.set_postfix(api_reqs = api_calls, status = "Downloading Streams")
-                streams = fetch_activity_streams(activity_obj.id)
-                api_calls += 1
-                
-                # save activity streams to db
-                streams_objs = map_streams_to_db_model(activity_obj.id, streams)
-                session.add_all(streams_objs)
-                
-                # verify recorded laps
-                laps = map_recorded_laps_to_list(full_data)
-                if len(laps) <= 1: # garmin/strava doesn't recorded laps
-                    pbar.set_postfix(api_reqs=api_calls, status="Automatic Laps Detection")
-                    processed_streams_dict = process_activity_streams_pd(streams_objs)
-                    
-                    detector = None
-                    if activity_obj.workout_type == WORKOUT_INTERVAL:
-                        detector = IntervalDetector()
-                    elif activity_obj.workout_type == WORKOUT_HILL_REPEATS:
-                        detector = HillDetector()
-                        
-                    if detector:
-                        detected_laps = detector.analyze(processed_streams_dict)
-                        if detected_laps:
-                            lap_objs = map_laps_to_db_model(activity_obj.id, detected_laps)
-                            session.add_all(lap_objs)
-                        else: # fallback for splits if watch didn't recorded and doesn't find laps
-                            splits_data = full_data.get("splits_metric", [])
-                            splits_objs = map_splits_to_db_model(activity_obj.id, splits_data)
-                            session.add_all(splits_objs)
-                
-                # garmin/strava recorded laps
-                else:
-                    pbar.set_postfix(api_reqs=api_calls, status="Using Recorded Laps")
-                    laps_objs = map_laps_to_db_model(activity_obj.id, laps, activity_obj.workout_type)
-                    session.add_all(laps_objs)
-                   
-            # download strava splits 
-            else:
-                pbar.set_postfix(api_reqs = api_calls, status = "Downloading Splits")
-                splits_data = full_data.get("splits_metric", [])
-                splits_obj = map_splits_to_db_model(activity_obj.id, splits_data)
-                session.add_all(splits_obj)
-            
-            session.commit()
-            saved_count += 1
-            time.sleep(base_sleep)
+                writer.put(activity_row, related_objs, bulk_rows)
         
-        except Exception as e:
-            if "429" in str(e):
-                pbar.write("API request limit reached, waiting for 15 min")
-                time.sleep(60 * 15)
-                continue
-            
-            errors_count += 1
-            pbar.write(f"Error in the activity: {summary["id"]}: {e}")
-            session.rollback()
-            time.sleep(2)
+            except Exception as e:
+                errors_count += 1
+                pbar.write(f"Error in the activity: {summary["id"]}: {e}")
+    finally:
+        # also when the pages or a download fail: pending downloads are dropped, the queued activities are committed
+        executor.shutdown(wait=True, cancel_futures=True)
+        writer.close()
         
     pbar.colour = "green"
     pbar.set_description("Sync completed")
     pbar.refresh()
     pbar.close()
     
-    session.close()
-    print(f"{saved_count} new activities were saved, {errors_count} errors")
+    print(f"{writer.saved_count} new activities were saved, {writer.skipped_count} already stored, {errors_count + writer.errors_count} errors ({writer.activities_per_sec():.1f} activities/s written)")
                 
\ No newline at end of file
@@ -0,0 +1,68 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database.migrations import upgrade
+from database.queries import get_last_activity_timestamp, fetch_workout_type_counts
+
+from collector.activities import iter_activity_pages
+from collector.raw_cache import load_raw_activity
+
+from processors.sync_new_activities import filter_new_runs, needs_streams
+from processors.type_classifiers.util_type_classifiers import STREAM_WORKOUT_TYPES
+
+def stream_workout_ratio():
+    # summaries carry no description, so the share of stream workouts is
+    # estimated from the runs already stored
+    counts = fetch_workout_type_counts()
+    total = sum(counts.values())
+    if not total:
+        return 0.0
+    return sum(counts.get(t, 0) for t in STREAM_WORKOUT_TYPES) / total
+
+def plan_sync(after=None):
+    upgrade(verbose=False)
+    if after is None:
+        after = get_last_activity_timestamp()
+    
+    pages = 0
+    summaries = 0
+    new_runs = []
+    for page in iter_activity_pages(after=after):
+        pages += 1
+        summaries += len(page)
+        new_runs.extend(filter_new_runs(page))
+    
+    cached = 0
+    cached_streams = 0
+    for summary in new_runs:
+        raw = load_raw_activity(summary["id"])
+        if raw and (raw[1] is not None or not needs_streams(raw[0])):
+            cached += 1
+            cached_streams += raw[1] is not None
+    
+    to_download = len(new_runs) - cached
+    ratio = stream_workout_ratio()
+    estimated_streams = round(to_download * ratio)
+    
+    return {
+        "after": after,
+        "list_pages": pages,
+        "summaries": summaries,
+        "new_runs": len(new_runs),
+        "cached": cached,
+        "to_download": to_download,
+        "stream_ratio": ratio,
+        "need_streams": cached_streams + estimated_streams,
+        "detail_calls": to_download,
+        "stream_calls": estimated_streams,
+        "api_calls": pages + to_download + estimated_streams,
+    }
+
+def print_sync_plan(plan):
+    print("-" * 40)
+    print(f"Activities listed: {plan['summaries']} ({plan['list_pages']} pages)")
+    print(f"New runs: {plan['new_runs']} ({plan['cached']} already in the raw cache)")
+    print(f"Need streams: ~{plan['need_streams']} ({plan['stream_ratio']:.0%} of stored runs are stream workouts)")
+    print(f"API calls: ~{plan['api_calls']} ({plan['list_pages']} list + {plan['detail_calls']} detail + ~{plan['stream_calls']} streams)")
+    print("-" * 40)
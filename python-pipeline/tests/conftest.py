@@ -0,0 +1,13 @@
+import tempfile
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# database/config.py, collector/raw_cache.py and processors/export_parquet.py
+# read these on import, the tests never touch strava.db, the raw cache or
+# the real parquet dataset
+TEST_DATA_DIR = tempfile.mkdtemp(prefix="strava_pytest.")
+os.environ["STRAVA_DATABASE_PATH"] = os.path.join(TEST_DATA_DIR, "strava.db")
+os.environ["STRAVA_PARQUET_DIR"] = os.path.join(TEST_DATA_DIR, "parquet")
+os.environ["STRAVA_RAW_CACHE_DIR"] = os.path.join(TEST_DATA_DIR, "raw_cache")
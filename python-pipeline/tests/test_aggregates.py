@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+
+from database.config import SessionLocal
+from database.migrations import upgrade
+from database.models import Activity, ActivitySplit, WeeklySummary, DailyLoad
+from database.aggregates import activity_buckets, refresh_aggregates, rebuild_aggregates_in
+
+FIRST_ID = 990001
+FIRST_START_DATE = datetime(2023, 9, 4, 7)
+
+def aggregate_rows(session, weeks, days):
+    return (
+        sorted(tuple(row) for row in session.query(*WeeklySummary.__table__.columns).filter(WeeklySummary.week_start.in_(weeks)).all()),
+        sorted(tuple(row) for row in session.query(*DailyLoad.__table__.columns).filter(DailyLoad.date.in_(days)).all()),
+    )
+
+def test_one_refresh_of_many_buckets_matches_a_rebuild():
+    upgrade(verbose=False)
+    session = SessionLocal()
+    try:
+        # three weeks, some days with two runs and splits in every zone
+        activity_ids = []
+        for i in range(12):
+            activity_id = FIRST_ID + i
+            start_date = FIRST_START_DATE + timedelta(days=i * 2 - i % 3)
+            session.add(Activity(
+                id=activity_id, name=str(activity_id), type="Run", start_date=start_date,
+                distance_km=5.0 + i, moving_time_sec=1800 + i * 60, local_date=start_date.date().isoformat(),
+                week_start=(start_date.date() - timedelta(days=start_date.weekday())).isoformat()
+            ))
+            for split_index, pace in enumerate([3.8, 4.5, 5.2, 6.0, 7.5][i % 5:], start=1):
+                session.add(ActivitySplit(
+                    activity_id=activity_id, split_index=split_index,
+                    distance_km=1.0, moving_time_sec=round(pace * 60), pace_min_km=pace
+                ))
+            activity_ids.append(activity_id)
+        session.flush()
+        
+        weeks, days = activity_buckets(session, activity_ids)
+        assert len(weeks) > 1 and len(days) > 1
+        refresh_aggregates(session, weeks, days)
+        refreshed = aggregate_rows(session, weeks, days)
+        
+        rebuild_aggregates_in(session)
+        assert aggregate_rows(session, weeks, days) == refreshed
+        assert len(refreshed[0]) == len(weeks)
+    finally:
+        session.rollback()
+        session.close()
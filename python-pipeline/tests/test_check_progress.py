@@ -0,0 +1,30 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from check_progress import ingestion_flags, check_ingestion_summary
+
+def status_row(workout_type, splits, laps, samples):
+    return SimpleNamespace(workout_type=workout_type, splits=splits, laps=laps, samples=samples)
+
+@pytest.mark.parametrize("row, flags", [
+    (status_row("interval", 10, 7, 3600), []),
+    # streams but no efforts found, the sync kept the splits
+    (status_row("interval", 10, 0, 3600), ["split_fallback"]),
+    (status_row("interval", 10, 0, 0), ["missing_streams", "missing_laps"]),
+    (status_row("interval", 0, 0, 3600), ["missing_laps"]),
+    # the retention dropped the streams after the laps were detected
+    (status_row("hill_repeats", 0, 5, 0), []),
+    (status_row(None, 10, 0, 0), []),
+])
+def test_ingestion_flags(row, flags):
+    assert ingestion_flags(row) == flags
+
+def test_the_summary_counts_split_fallbacks_apart(capsys):
+    check_ingestion_summary(as_json=True)
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    activities, summary = lines[:-1], lines[-1]
+    
+    for flag in ("missing_streams", "missing_laps", "split_fallback"):
+        assert summary[flag] == sum(flag in activity["flags"] for activity in activities)
@@ -0,0 +1,49 @@
+import subprocess
+import sys
+import os
+
+PIPELINE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def run_pipeline(code, database_path, **env):
+    # a fresh interpreter, database/config.py reads the path on import
+    env = {**os.environ, "STRAVA_DATABASE_PATH": str(database_path), **env}
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=PIPELINE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+
+def test_read_queries_work_before_the_database_exists(tmp_path):
+    database_path = tmp_path / "fresh.db"
+    result = run_pipeline(
+        "from database.queries import fetch_run_week_range, fetch_individual_activity_data\n"
+        "print(tuple(fetch_run_week_range()))\n"
+        "print(len(fetch_individual_activity_data()))\n",
+        database_path,
+    )
+    
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ["(None,", "None)", "0"]
+    assert database_path.exists()
+
+def test_reset_removes_the_wal_and_shm_files(tmp_path):
+    database_path = tmp_path / "reset.db"
+    for suffix in ("", "-wal", "-shm"):
+        (tmp_path / f"reset.db{suffix}").write_bytes(b"stale")
+    
+    result = run_pipeline(
+        "from database.reset_db import reset_database\n"
+        "reset_database()\n"
+        "from database.migrations import check_query_plans\n"
+        "assert check_query_plans(verbose=False) == []\n",
+        database_path,
+        STRAVA_TEST_MODE="1",
+    )
+    
+    assert result.returncode == 0, result.stderr
+    assert "reset.db-wal deleted" in result.stdout
+    assert "reset.db-shm deleted" in result.stdout
+    assert "Database reseted and ready to use" in result.stdout
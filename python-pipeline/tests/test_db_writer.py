@@ -0,0 +1,71 @@
+import threading
+from datetime import datetime
+
+import pytest
+
+from database.config import SessionLocal
+from database.models import Activity
+from processors.db_writer import ActivityWriter
+
+WRITTEN_ID = 980001
+
+def activity_row(activity_id):
+    return {
+        "id": activity_id, "name": str(activity_id), "type": "Run",
+        "start_date": datetime(2024, 7, 2, 7), "local_date": "2024-07-02", "week_start": "2024-07-01",
+    }
+
+def failing_write(*args):
+    raise OSError("disk I/O error")
+
+def run_with_timeout(target, timeout=30):
+    # the producer must get the error, not block on the full queue forever
+    errors = []
+    def run():
+        try:
+            target()
+        except Exception as e:
+            errors.append(e)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "the producer is still blocked"
+    return errors
+
+def test_writer_saves_and_commits_on_close():
+    writer = ActivityWriter(batch_size=2)
+    writer.start()
+    writer.put(activity_row(WRITTEN_ID), [])
+    writer.close()
+    
+    assert writer.saved_count == 1
+    session = SessionLocal()
+    try:
+        assert session.get(Activity, WRITTEN_ID) is not None
+    finally:
+        session.close()
+
+def test_put_raises_once_the_writer_thread_died():
+    writer = ActivityWriter(batch_size=1)
+    # an error that escapes _run, e.g. from the on_error callback
+    writer._write = failing_write
+    writer.start()
+    
+    def produce():
+        # more activities than the queue holds (batch_size * 4)
+        for i in range(20):
+            writer.put(activity_row(WRITTEN_ID + 1 + i), [])
+    
+    errors = run_with_timeout(produce)
+    assert len(errors) == 1
+    assert isinstance(errors[0], RuntimeError)
+    assert isinstance(errors[0].__cause__, OSError)
+
+def test_close_raises_the_writer_failure():
+    writer = ActivityWriter(batch_size=1)
+    writer._write = failing_write
+    writer.start()
+    writer.put(activity_row(WRITTEN_ID + 100), [])
+    
+    with pytest.raises(RuntimeError, match="disk I/O error"):
+        writer.close()
@@ -0,0 +1,90 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pyarrow.parquet as pq
+import pytest
+
+from database.config import SessionLocal
+from database.migrations import upgrade
+from database.models import Activity, ActivitySplit
+
+import processors.export_parquet as export
+
+ACTIVITY_IDS = [930001, 930002, 930003, 930004, 930005]
+
+@pytest.fixture(autouse=True)
+def activities():
+    upgrade(verbose=False)
+    session = SessionLocal()
+    try:
+        for i, activity_id in enumerate(ACTIVITY_IDS):
+            start_date = datetime(2024 + i % 2, 3, 1 + i)
+            session.merge(Activity(
+                id=activity_id, name=str(activity_id), type="Run", start_date=start_date,
+                local_date=start_date.date().isoformat(),
+                week_start=(start_date.date() - timedelta(days=start_date.weekday())).isoformat()
+            ))
+            session.merge(ActivitySplit(
+                id=activity_id, activity_id=activity_id, split_index=1,
+                distance_km=1.0, moving_time_sec=330, pace_min_km=5.5
+            ))
+        session.commit()
+    finally:
+        session.close()
+    
+    export.export_parquet(full=True)
+
+def exported_counts(dataset, column):
+    table = pq.read_table(f"{export.PARQUET_DIR}/{dataset}")
+    return Counter(value for value in table.column(column).to_pylist() if value in ACTIVITY_IDS)
+
+def assert_exported_once():
+    for dataset, column in (("activities", "id"), ("splits", "activity_id")):
+        assert exported_counts(dataset, column) == {activity_id: 1 for activity_id in ACTIVITY_IDS}, dataset
+    assert set(ACTIVITY_IDS) <= set(export.load_manifest()["activity_ids"])
+    assert "pending_part" not in export.load_manifest()
+
+def test_full_export_writes_every_activity_once():
+    assert_exported_once()
+    
+    # nothing new, nothing appended
+    export.export_parquet()
+    assert_exported_once()
+
+def test_resume_after_a_chunk_failed_mid_write(monkeypatch):
+    export_chunk = export.export_chunk
+    calls = []
+    
+    def failing_export_chunk(session, activity_ids, part_name, root_dir):
+        # the second chunk dies after writing part of its files
+        calls.append(part_name)
+        if len(calls) == 2:
+            export._write_dataset("activities", pq.read_table(f"{export.PARQUET_DIR}/activities").slice(0, 1), part_name, root_dir)
+            raise RuntimeError("interrupted")
+        return export_chunk(session, activity_ids, part_name, root_dir)
+    
+    monkeypatch.setattr(export, "export_chunk", failing_export_chunk)
+    with pytest.raises(RuntimeError):
+        export.export_parquet(full=True, chunk_size=2)
+    monkeypatch.undo()
+    
+    export.export_parquet(chunk_size=2)
+    assert_exported_once()
+
+def test_resume_after_the_publish_was_cut_short(monkeypatch):
+    publish_part = export._publish_part
+    
+    def failing_publish(part_name):
+        # the chunk is in the manifest, but its files are still staged
+        raise RuntimeError("interrupted")
+    
+    monkeypatch.setattr(export, "_publish_part", failing_publish)
+    with pytest.raises(RuntimeError):
+        export.export_parquet(full=True, chunk_size=2)
+    
+    manifest = export.load_manifest()
+    assert manifest["pending_part"]
+    monkeypatch.setattr(export, "_publish_part", publish_part)
+    
+    export.export_parquet(chunk_size=2)
+    assert_exported_once()
@@ -0,0 +1,50 @@
+import gzip
+import json
+import os
+
+import pytest
+
+from processors.db_mappers.streams import map_streams_to_columns
+from processors.non_recorded_laps_detector.streams_processor import process_activity_streams_pd
+from processors.non_recorded_laps_detector.interval_detector import IntervalDetector
+from processors.non_recorded_laps_detector.hill_detector import HillDetector
+
+# synthetic interval, hill and noisy sessions (gaps, missing hr / altitude,
+# short channels) with the blocks and laps the per second dict detectors
+# found before the numpy port. blocks are [first, last] stream times
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "lap_detector_cases.json.gz")
+
+DETECTORS = {
+    "interval": IntervalDetector,
+    "hill": HillDetector,
+}
+
+with gzip.open(FIXTURE_PATH, "rt") as f:
+    CASES = json.load(f)
+
+def _as_json(laps):
+    # nan compares unequal to itself, the json text doesn't
+    return json.dumps(laps, sort_keys=True)
+
+@pytest.fixture(scope="module")
+def frames():
+    return {case["seed"]: process_activity_streams_pd(map_streams_to_columns(case["streams"])) for case in CASES}
+
+@pytest.mark.parametrize("case", CASES, ids=lambda case: f"seed{case['seed']}")
+@pytest.mark.parametrize("detector", DETECTORS)
+def test_blocks_match_the_recorded_outputs(frames, case, detector):
+    frame = frames[case["seed"]]
+    blocks = DETECTORS[detector]()._detect_blocks(frame)
+    
+    assert [[int(frame.time[start]), int(frame.time[end - 1])] for start, end in blocks] == case["blocks"][detector]
+
+@pytest.mark.parametrize("case", CASES, ids=lambda case: f"seed{case['seed']}")
+@pytest.mark.parametrize("detector", DETECTORS)
+def test_laps_match_the_recorded_outputs(frames, case, detector):
+    laps = DETECTORS[detector]().analyze(frames[case["seed"]])
+    
+    assert _as_json(laps) == _as_json(case["laps"][detector])
+
+def test_fixture_covers_both_detectors():
+    assert sum(len(case["blocks"]["interval"]) for case in CASES) >= 10
+    assert sum(len(case["blocks"]["hill"]) for case in CASES) >= 10
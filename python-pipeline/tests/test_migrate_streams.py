@@ -0,0 +1,48 @@
+import os
+from datetime import datetime
+
+from database.config import SessionLocal, DATABASE_PATH
+from database.migrations import upgrade
+from database.models import Activity, ActivitySecond
+from database.upsert import upsert_rows
+
+from processors.migrate_streams import migrate_streams, db_size_mb
+
+SECONDS_ID = 970001
+SAMPLES = 30000
+
+def file_size_mb(path):
+    return os.path.getsize(path) / (1024 * 1024) if os.path.exists(path) else 0.0
+
+def test_migrate_streams_reports_the_size_after_the_checkpoint(capsys):
+    upgrade(verbose=False)
+    session = SessionLocal()
+    try:
+        session.merge(Activity(
+            id=SECONDS_ID, name=str(SECONDS_ID), type="Run", start_date=datetime(2024, 6, 4, 7),
+            local_date="2024-06-04", week_start="2024-06-03"
+        ))
+        session.flush()
+        upsert_rows(session, ActivitySecond, [
+            {
+                "activity_id": SECONDS_ID, "second_index": second, "distance_total_m": second * 3.0,
+                "distance_delta_m": 3.0, "speed_m_s": 3.0, "pace_sec_km": 333.3,
+                "elevation_m": 100.0 + second % 7, "heart_rate": 150,
+            }
+            for second in range(SAMPLES)
+        ])
+        session.commit()
+    finally:
+        session.close()
+    
+    size_before = db_size_mb()
+    # the checkpoint moved the commit out of the wal, the file holds it all
+    assert file_size_mb(f"{DATABASE_PATH}-wal") == 0
+    assert size_before == file_size_mb(DATABASE_PATH)
+    
+    migrate_streams(vacuum=True)
+    size_after = db_size_mb()
+    
+    assert size_after < size_before
+    assert size_after == file_size_mb(DATABASE_PATH)
+    assert f"Database size: {size_before:.1f} MB -> {size_after:.1f} MB" in capsys.readouterr().out
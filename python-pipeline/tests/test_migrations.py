@@ -0,0 +1,28 @@
+import pytest
+
+from database.config import engine
+from database.migrations import MIGRATIONS, upgrade, applied_versions, explain_query_plan, check_query_plans
+
+PLAN_CHECKS = [
+    pytest.param(query, index_name, id=f"{version}-{index_name}")
+    for version, _, _, checks in MIGRATIONS
+    for query, index_name in checks
+]
+
+@pytest.fixture(scope="module", autouse=True)
+def migrated_database():
+    upgrade(verbose=False)
+
+def test_every_migration_is_applied_once():
+    with engine.begin() as connection:
+        assert applied_versions(connection) == {version for version, *_ in MIGRATIONS}
+    assert upgrade(verbose=False) == []
+
+@pytest.mark.parametrize("query, index_name", PLAN_CHECKS)
+def test_hot_query_uses_its_index(query, index_name):
+    with engine.connect() as connection:
+        plan = explain_query_plan(connection, query)
+    assert index_name in plan, plan
+
+def test_check_query_plans_reports_no_failures():
+    assert check_query_plans(verbose=False) == []
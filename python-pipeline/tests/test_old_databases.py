@@ -0,0 +1,101 @@
+import sqlite3
+import sys
+
+import pytest
+
+from test_config import run_pipeline
+
+# the sync modules use the python 3.12 f-string syntax
+requires_py312 = pytest.mark.skipif(sys.version_info < (3, 12), reason="the sync modules need python 3.12")
+
+# the schema before the migrations (database/migrations.py), as the first
+# strava.db files were created
+BASELINE_SCHEMA = """
+CREATE TABLE activities (
+    id INTEGER NOT NULL, name VARCHAR, workout_type VARCHAR, type VARCHAR, sport_type VARCHAR,
+    start_date DATETIME, distance_km FLOAT, moving_time_sec FLOAT, pace_raw FLOAT,
+    elevation_gain FLOAT, average_bpm FLOAT, max_bpm FLOAT, PRIMARY KEY (id)
+);
+CREATE INDEX ix_activities_workout_type ON activities (workout_type);
+CREATE TABLE activity_laps (
+    id INTEGER NOT NULL, activity_id INTEGER, lap_index INTEGER, lap_type VARCHAR,
+    start_sec INTEGER, end_sec INTEGER, total_duration_sec INTEGER, moving_duration_sec INTEGER,
+    distance_m FLOAT, avg_pace_sec_km FLOAT, avg_hr FLOAT, elev_gain_m FLOAT,
+    avg_grade_percent FLOAT, vam FLOAT,
+    PRIMARY KEY (id), FOREIGN KEY(activity_id) REFERENCES activities (id)
+);
+CREATE TABLE activity_seconds (
+    id INTEGER NOT NULL, activity_id INTEGER, second_index INTEGER, distance_total_m FLOAT,
+    distance_delta_m FLOAT, speed_m_s FLOAT, pace_sec_km FLOAT, elevation_m FLOAT, heart_rate INTEGER,
+    PRIMARY KEY (id), FOREIGN KEY(activity_id) REFERENCES activities (id)
+);
+CREATE TABLE activity_splits (
+    id INTEGER NOT NULL, activity_id INTEGER, split_index INTEGER, distance_km FLOAT,
+    moving_time_sec INTEGER, pace_min_km FLOAT,
+    PRIMARY KEY (id), FOREIGN KEY(activity_id) REFERENCES activities (id)
+);
+INSERT INTO activities (id, name, workout_type, type, start_date, distance_km, moving_time_sec)
+VALUES (950001, 'Easy', 'EASY', 'Run', '2024-05-14 06:30:00.000000', 10.0, 3300.0);
+INSERT INTO activity_splits (activity_id, split_index, distance_km, moving_time_sec, pace_min_km)
+VALUES (950001, 1, 1.0, 330, 5.5);
+"""
+
+# 2024-05-14 06:30 utc
+LAST_START_TS = 1715668200
+
+def baseline_database(tmp_path):
+    database_path = tmp_path / "baseline.db"
+    connection = sqlite3.connect(database_path)
+    connection.executescript(BASELINE_SCHEMA)
+    connection.close()
+    return database_path
+
+def activity_columns(database_path):
+    connection = sqlite3.connect(database_path)
+    try:
+        return {row[1] for row in connection.execute("PRAGMA table_info(activities)")}
+    finally:
+        connection.close()
+
+@requires_py312
+def test_sync_upgrades_a_baseline_database(tmp_path):
+    database_path = baseline_database(tmp_path)
+    # no new activities, the sync only reads the watermark and starts the writer
+    result = run_pipeline(
+        "import processors.sync_new_activities as sync\n"
+        "sync.iter_activity_pages = lambda after: iter([])\n"
+        "sync.sync_new_activities(workers=1)\n",
+        database_path,
+    )
+    
+    assert result.returncode == 0, result.stderr
+    assert "0 new activities were saved" in result.stdout
+    assert {"local_date", "week_start"} <= activity_columns(database_path)
+
+@requires_py312
+def test_sync_plan_upgrades_a_baseline_database(tmp_path):
+    database_path = baseline_database(tmp_path)
+    result = run_pipeline(
+        "import processors.sync_planner as planner\n"
+        "pages = []\n"
+        "planner.iter_activity_pages = lambda after: pages.append(after) or iter([[{'id': 950002, 'type': 'Run'}]])\n"
+        "plan = planner.plan_sync()\n"
+        "print(pages[0], plan['new_runs'], plan['to_download'])\n",
+        database_path,
+    )
+    
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == [str(LAST_START_TS), "1", "1"]
+
+def test_export_upgrades_a_baseline_database(tmp_path):
+    database_path = baseline_database(tmp_path)
+    result = run_pipeline(
+        "from processors.export_parquet import export_parquet\n"
+        "export_parquet()\n",
+        database_path,
+        STRAVA_PARQUET_DIR=str(tmp_path / "parquet"),
+    )
+    
+    assert result.returncode == 0, result.stderr
+    assert "1 activities exported" in result.stdout
+    assert (tmp_path / "parquet" / "activities" / "year=2024").is_dir()
@@ -0,0 +1,86 @@
+import argparse
+import sys
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from database.config import SessionLocal
+from database.migrations import upgrade
+from database.models import Activity, ActivitySplit
+from database.aggregates import rebuild_aggregates_in
+from database.queries import fetch_weekly_splits, fetch_weekly_summary
+
+from analysis.formatters import ZONES
+from analysis.processors import process_weekly_training_load, process_training_load_summary, process_acwr
+
+# main.py imports the sync modules, which use the python 3.12 f-string syntax
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 12), reason="main.py needs python 3.12")
+
+# (monday, split paces) of the most recent weeks in the test database. the
+# last week has runs but no splits (laps only) and the one before it only
+# splits outside every zone, so the run weeks and the load weeks end apart
+WEEKS = [
+    (date(2030, 1, 7), [6.0, 5.2]),
+    (date(2030, 1, 21), [4.5]),
+    (date(2030, 1, 28), [25.0]),
+    (date(2030, 2, 4), None),
+]
+
+@pytest.fixture(scope="module")
+def recent_weeks():
+    upgrade(verbose=False)
+    session = SessionLocal()
+    try:
+        for i, (week_start, paces) in enumerate(WEEKS):
+            activity_id = 960001 + i
+            start_date = datetime.combine(week_start + timedelta(days=2), datetime.min.time())
+            session.merge(Activity(
+                id=activity_id, name=str(activity_id), type="Run", start_date=start_date,
+                distance_km=5.0, moving_time_sec=1800, local_date=start_date.date().isoformat(),
+                week_start=week_start.isoformat()
+            ))
+            for split_index, pace in enumerate(paces or [], start=1):
+                session.merge(ActivitySplit(
+                    id=activity_id * 10 + split_index, activity_id=activity_id, split_index=split_index,
+                    distance_km=1.0, moving_time_sec=round(pace * 60), pace_min_km=pace
+                ))
+        session.flush()
+        # other tests store splits without refreshing the aggregates
+        rebuild_aggregates_in(session)
+        session.commit()
+    finally:
+        session.close()
+
+def plot_args(chart_type, limit, hide_zero):
+    return argparse.Namespace(chart_type=chart_type, limit=limit, hide_zero=hide_zero, since=None, until=None)
+
+@pytest.mark.parametrize("hide_zero", [False, True])
+@pytest.mark.parametrize("limit", [1, 2, 3, 5, 8, 1000])
+def test_acwr_limit_keeps_the_baseline_weeks(recent_weeks, limit, hide_zero):
+    import database.queries as queries
+    from main import resolve_plot_range
+    
+    # the baseline fetched every split and trimmed after processing
+    baseline = process_acwr(process_weekly_training_load(fetch_weekly_splits(), ZONES), hide_zero=hide_zero, limit=limit)
+    
+    start, warmup_start, until, _ = resolve_plot_range(plot_args("acwr", limit, hide_zero), queries)
+    df_load = process_training_load_summary(fetch_weekly_summary(warmup_start, until), ZONES)
+    df_acwr = process_acwr(df_load, hide_zero=hide_zero, limit=limit, start=start, warmup_start=warmup_start)
+    
+    assert len(df_acwr) == len(baseline)
+    assert df_acwr["week_start"].tolist() == baseline["week_start"].tolist()
+    assert df_acwr["acwr"].tolist() == pytest.approx(baseline["acwr"].tolist(), nan_ok=True)
+
+@pytest.mark.parametrize("hide_zero", [False, True])
+@pytest.mark.parametrize("limit", [None, 2, 5])
+def test_training_load_plots_every_week(recent_weeks, limit, hide_zero):
+    import database.queries as queries
+    from main import resolve_plot_range
+    
+    baseline = process_weekly_training_load(fetch_weekly_splits(), ZONES)
+    
+    start, _, until, _ = resolve_plot_range(plot_args("training_load", limit, hide_zero), queries)
+    df_load = process_training_load_summary(fetch_weekly_summary(start, until), ZONES)
+    
+    assert len(df_load) == len(baseline)
+    assert df_load["week_start"].tolist() == baseline["week_start"].tolist()
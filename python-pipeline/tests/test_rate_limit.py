@@ -0,0 +1,312 @@
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from collector import transport
+from collector.rate_limit import (
+    RateLimitGovernor,
+    SHORT_WINDOW_SEC,
+    DAILY_WINDOW_SEC,
+    parse_limit_header,
+)
+
+# a monday, 10:00:00 UTC, at the start of a short window
+START = 1_736_762_400
+
+class FakeClock:
+    def __init__(self, now=START):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+    
+    def advance(self, seconds):
+        self.now += seconds
+
+class FakeResponse:
+    def __init__(self, status_code=200, short=(0, 100), daily=(0, 1000), read=None):
+        self.status_code = status_code
+        self.headers = {
+            "X-RateLimit-Limit": f"{short[1]},{daily[1]}",
+            "X-RateLimit-Usage": f"{short[0]},{daily[0]}",
+        }
+        if read:
+            read_short, read_daily = read
+            self.headers["X-ReadRateLimit-Limit"] = f"{read_short[1]},{read_daily[1]}"
+            self.headers["X-ReadRateLimit-Usage"] = f"{read_short[0]},{read_daily[0]}"
+
+def make_governor(**kwargs):
+    clock = FakeClock()
+    return RateLimitGovernor(clock=clock, **kwargs), clock
+
+def acquire_in_thread(governor):
+    acquired = threading.Event()
+    thread = threading.Thread(target=lambda: (governor.acquire(), acquired.set()), daemon=True)
+    thread.start()
+    return thread, acquired
+
+def notify(governor):
+    # what a release does, without touching the usage
+    with governor._cond:
+        governor._cond.notify_all()
+
+def test_parse_limit_header():
+    assert parse_limit_header("100,1000") == (100, 1000)
+    assert parse_limit_header(" 7 , 42") == (7, 42)
+    assert parse_limit_header(None) is None
+    assert parse_limit_header("100") is None
+    assert parse_limit_header("a,b") is None
+
+def test_headers_set_limits_and_usage():
+    governor, _ = make_governor()
+    governor.acquire()
+    governor.release(FakeResponse(short=(10, 200), daily=(50, 2000)))
+    
+    assert (governor.short_limit, governor.daily_limit) == (200, 2000)
+    assert (governor.short_usage, governor.daily_usage) == (10, 50)
+    assert governor.in_flight == 0
+
+def test_tightest_of_overall_and_read_limits_wins():
+    governor, _ = make_governor()
+    governor.acquire()
+    governor.release(FakeResponse(short=(10, 200), daily=(50, 2000), read=((90, 100), (50, 1000))))
+    
+    assert (governor.short_limit, governor.daily_limit) == (100, 1000)
+    assert governor.short_usage == 90
+
+def test_out_of_order_responses_keep_the_highest_usage():
+    governor, _ = make_governor()
+    governor.acquire()
+    governor.release(FakeResponse(short=(20, 100), daily=(20, 1000)))
+    governor.acquire()
+    governor.release(FakeResponse(short=(15, 100), daily=(15, 1000)))
+    
+    assert (governor.short_usage, governor.daily_usage) == (20, 20)
+
+def test_responses_without_headers_count_one_request():
+    governor, _ = make_governor()
+    governor.acquire()
+    governor.release()
+    governor.acquire()
+    
+    response = FakeResponse()
+    response.headers = {}
+    governor.release(response)
+    
+    assert (governor.short_usage, governor.daily_usage) == (2, 2)
+
+def test_acquire_blocks_without_budget_until_the_window_resets():
+    governor, clock = make_governor(reserve=2)
+    governor.acquire()
+    governor.release(FakeResponse(short=(98, 100), daily=(98, 1000)))
+    
+    thread, acquired = acquire_in_thread(governor)
+    assert not acquired.wait(0.3)
+    assert governor.waiting_until == START + SHORT_WINDOW_SEC
+    
+    # the new short window starts empty, a release wakes the waiter up
+    clock.advance(SHORT_WINDOW_SEC)
+    notify(governor)
+    
+    assert acquired.wait(2)
+    thread.join(2)
+    assert governor.short_usage == 0
+    assert governor.daily_usage == 98
+    assert governor.waiting_until is None
+
+def test_daily_limit_waits_for_the_next_day():
+    governor, clock = make_governor(reserve=2)
+    governor.acquire()
+    governor.release(FakeResponse(short=(0, 100), daily=(998, 1000)))
+    
+    thread, acquired = acquire_in_thread(governor)
+    assert not acquired.wait(0.3)
+    assert governor.waiting_until == (START // DAILY_WINDOW_SEC + 1) * DAILY_WINDOW_SEC
+    
+    # a new short window is not enough, the daily usage is still over
+    clock.advance(SHORT_WINDOW_SEC)
+    notify(governor)
+    assert not acquired.wait(0.3)
+    
+    clock.now = governor.waiting_until
+    notify(governor)
+    assert acquired.wait(2)
+    thread.join(2)
+    assert governor.daily_usage == 0
+
+def test_a_single_probe_goes_out_before_the_usage_is_known():
+    governor, _ = make_governor()
+    governor.acquire()
+    
+    thread, acquired = acquire_in_thread(governor)
+    assert not acquired.wait(0.3)
+    
+    governor.release(FakeResponse(short=(1, 100), daily=(1, 1000)))
+    assert acquired.wait(2)
+    thread.join(2)
+    assert governor.in_flight == 1
+
+def test_call_retries_a_429_after_the_window_resets():
+    governor, clock = make_governor()
+    responses = [
+        FakeResponse(429, short=(100, 100), daily=(100, 1000)),
+        FakeResponse(200, short=(1, 100), daily=(101, 1000)),
+    ]
+    
+    def request():
+        response = responses.pop(0)
+        if response.status_code == 429:
+            # the retry waits for the next window, let it come
+            threading.Timer(0.2, lambda: (clock.advance(SHORT_WINDOW_SEC), notify(governor))).start()
+        return response
+    
+    response = governor.call(request)
+    assert response.status_code == 200
+    assert responses == []
+    assert governor.short_usage == 1
+    assert governor.daily_usage == 101
+
+def test_a_429_marks_the_short_window_as_used_up():
+    governor, _ = make_governor()
+    governor.acquire()
+    # no usage headers, strava still says no
+    response = FakeResponse(429)
+    response.headers = {}
+    governor.release(response)
+    
+    assert governor.short_usage == governor.short_limit
+
+def test_call_gives_up_after_three_429_retries():
+    # every clock read is a new short window, so the retries never block
+    clock = FakeClock()
+    
+    def ticking_clock():
+        clock.advance(SHORT_WINDOW_SEC)
+        return clock.now
+    
+    governor = RateLimitGovernor(clock=ticking_clock)
+    calls = []
+    
+    def request():
+        calls.append(clock.now)
+        return FakeResponse(429, short=(100, 100), daily=(len(calls), 1000))
+    
+    response = governor.call(request)
+    assert response.status_code == 429
+    assert len(calls) == 1 + 3
+    assert governor.in_flight == 0
+
+def test_call_releases_when_the_request_raises():
+    governor, _ = make_governor()
+    
+    def request():
+        raise ConnectionError("down")
+    
+    with pytest.raises(ConnectionError):
+        governor.call(request)
+    assert governor.in_flight == 0
+    assert governor.short_usage == 1
+
+class ScriptedStravaHandler(BaseHTTPRequestHandler):
+    # answers with the next (status, short usage, daily usage) of the script,
+    # with the rate limit headers strava sends
+    protocol_version = "HTTP/1.1"
+    script = []
+    served = []
+    
+    def log_message(self, *args):
+        pass
+    
+    def do_GET(self):
+        status, short_usage, daily_usage = self.script.pop(0)
+        self.served.append((self.path, self.headers.get("Authorization"), status))
+        
+        raw = json.dumps({"id": 1} if status == 200 else {"message": "error"}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        if short_usage is not None:
+            self.send_header("X-RateLimit-Limit", "100,1000")
+            self.send_header("X-RateLimit-Usage", f"{short_usage},{daily_usage}")
+        if status == 429:
+            self.send_header("Retry-After", str(SHORT_WINDOW_SEC))
+        self.end_headers()
+        self.wfile.write(raw)
+
+@pytest.fixture
+def strava_server(monkeypatch):
+    ScriptedStravaHandler.script = []
+    ScriptedStravaHandler.served = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ScriptedStravaHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    
+    governor, clock = make_governor()
+    monkeypatch.setattr(transport, "BASE_URL", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(transport, "get_headers", lambda: {"Authorization": "Bearer test"})
+    monkeypatch.setattr(transport, "governor", governor)
+    # a new pool, the real session adapter and retries
+    monkeypatch.setattr(transport, "session", transport.build_session())
+    
+    yield governor, clock
+    server.shutdown()
+    server.server_close()
+
+def reset_window_once_waiting(governor, clock):
+    # plays the clock once the governor waits for the next short window
+    waited = []
+    
+    def run():
+        deadline = time.monotonic() + 10
+        while governor.waiting_until is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        waited.append(governor.waiting_until)
+        clock.now = governor.waiting_until or clock.now
+        notify(governor)
+    
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, waited
+
+def test_get_json_reads_the_rate_limit_headers_of_a_real_response(strava_server):
+    governor, _ = strava_server
+    ScriptedStravaHandler.script = [(200, 30, 300)]
+    
+    assert transport.get_json("/activities/1") == {"id": 1}
+    assert ScriptedStravaHandler.served == [("/activities/1", "Bearer test", 200)]
+    assert (governor.short_usage, governor.daily_usage) == (30, 300)
+    assert (governor.short_limit, governor.daily_limit) == (100, 1000)
+    assert governor.in_flight == 0
+
+def test_a_real_429_waits_for_the_governor_not_the_transport(strava_server):
+    governor, clock = strava_server
+    # a transient error retried by the session, then strava's 429 (with its
+    # Retry-After) and the answer once the next short window starts
+    ScriptedStravaHandler.script = [(503, None, None), (429, 100, 150), (200, 1, 151)]
+    thread, waited = reset_window_once_waiting(governor, clock)
+    
+    assert transport.get_json("/activities/1/streams") == {"id": 1}
+    thread.join(2)
+    
+    assert [status for _, _, status in ScriptedStravaHandler.served] == [503, 429, 200]
+    assert waited == [START + SHORT_WINDOW_SEC]
+    assert (governor.short_usage, governor.daily_usage) == (1, 151)
+    assert governor.in_flight == 0
+
+def test_the_last_429_reaches_the_caller(strava_server):
+    governor, clock = strava_server
+    ScriptedStravaHandler.script = [(429, 100, 100 + i) for i in range(1 + governor.max_429_retries)]
+    
+    def ticking_clock():
+        # every read is a new short window, the retries never block
+        clock.advance(SHORT_WINDOW_SEC)
+        return clock.now
+    governor.clock = ticking_clock
+    
+    with pytest.raises(transport.requests.HTTPError) as error:
+        transport.get_json("/activities/1")
+    assert error.value.response.status_code == 429
+    assert len(ScriptedStravaHandler.served) == 1 + governor.max_429_retries
+    assert ScriptedStravaHandler.script == []
@@ -0,0 +1,215 @@
+import gzip
+import json
+import os
+
+import pytest
+
+from database.config import SessionLocal
+from database.migrations import upgrade
+from database.models import Activity, ActivityLap, ActivitySplit, ActivityStream, WeeklySummary, DailyLoad
+from database.aggregates import activity_buckets, refresh_aggregates, rebuild_aggregates_in
+from database.upsert import upsert_rows
+
+from collector.raw_cache import save_raw_activity
+
+from processors.build_activity import build_activity_objects
+from processors.db_mappers.laps import map_laps_to_rows
+from processors.db_mappers.splits import map_splits_to_rows
+from processors.redetect_laps import redetect_laps, _are_watch_laps
+
+WATCH_LAPS_ID = 940001
+SPLITS_TO_LAPS_ID = 940002
+CHANGED_LAPS_ID = 940003
+# synced before the raw cache existed
+UNCACHED_WATCH_LAPS_ID = 940004
+UNCACHED_SPLITS_TO_LAPS_ID = 940005
+UNCACHED_CHANGED_LAPS_ID = 940006
+UNCACHED_NO_STREAMS_ID = 940007
+ACTIVITY_IDS = [
+    WATCH_LAPS_ID, SPLITS_TO_LAPS_ID, CHANGED_LAPS_ID,
+    UNCACHED_WATCH_LAPS_ID, UNCACHED_SPLITS_TO_LAPS_ID, UNCACHED_CHANGED_LAPS_ID, UNCACHED_NO_STREAMS_ID,
+]
+
+LAP_CASES_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "lap_detector_cases.json.gz")
+
+def make_streams(segments):
+    # segments of (seconds, speed m/s)
+    speeds = [speed for seconds, speed in segments for _ in range(seconds)]
+    distance = []
+    total = 0.0
+    for speed in speeds:
+        total += speed
+        distance.append(round(total, 1))
+    return {
+        "time": {"data": list(range(len(speeds)))},
+        "distance": {"data": distance},
+        "velocity_smooth": {"data": speeds},
+        "heartrate": {"data": [150] * len(speeds)},
+        "altitude": {"data": [100.0] * len(speeds)},
+    }
+
+INTERVAL_STREAMS = make_streams([(600, 2.6)] + [(180, 4.6), (90, 1.8)] * 6 + [(600, 2.6)])
+EASY_STREAMS = make_streams([(2400, 2.7)])
+
+def make_detail(activity_id, watch_laps=0):
+    laps = [
+        {
+            "name": f"Lap {k + 1}", "lap_index": k + 1, "average_speed": 4.6 if k % 2 else 2.6,
+            "distance": 800.0, "moving_time": 180, "elapsed_time": 180, "total_elevation_gain": 0,
+            "average_heartrate": 150, "start_index": k * 180, "end_index": (k + 1) * 180,
+        }
+        for k in range(watch_laps)
+    ]
+    return {
+        "id": activity_id, "name": f"Run {activity_id}", "type": "Run", "sport_type": "Run",
+        "description": "6x800 tiros", "start_date": "2024-05-14T09:00:00Z", "start_date_local": "2024-05-14T06:00:00Z",
+        "distance": 12000.0, "moving_time": 3600, "laps": laps,
+        "splits_metric": [{"split": k + 1, "distance": 1000.0, "moving_time": 300 + k} for k in range(12)],
+    }
+
+def store(session, detail, streams, cached=True):
+    # the rows a sync writes, and the raw responses it caches
+    activity_row, _, bulk_rows, _ = build_activity_objects(detail, streams)
+    upsert_rows(session, Activity, [activity_row])
+    for model, rows in bulk_rows:
+        upsert_rows(session, model, rows)
+    if cached:
+        save_raw_activity(detail["id"], detail, streams)
+
+def replace_rows(session, activity_id, lap_rows, split_rows):
+    # what older thresholds may have stored instead
+    for model in (ActivityLap, ActivitySplit):
+        session.query(model).filter(model.activity_id == activity_id).delete(synchronize_session=False)
+    upsert_rows(session, ActivityLap, lap_rows)
+    upsert_rows(session, ActivitySplit, split_rows)
+
+def stored_rows(session, activity_id):
+    laps = session.query(ActivityLap.lap_type).filter(ActivityLap.activity_id == activity_id).order_by(ActivityLap.id).all()
+    split_count = session.query(ActivitySplit).filter(ActivitySplit.activity_id == activity_id).count()
+    return [lap_type for lap_type, in laps], split_count
+
+def aggregate_rows(session, weeks, days):
+    # only the buckets of these activities, other tests share the database
+    return (
+        sorted(tuple(row) for row in session.query(*WeeklySummary.__table__.columns).filter(WeeklySummary.week_start.in_(weeks)).all()),
+        sorted(tuple(row) for row in session.query(*DailyLoad.__table__.columns).filter(DailyLoad.date.in_(days)).all()),
+    )
+
+def store_splits_fallback(session, activity_id, cached=True):
+    # the detectors used to find nothing here, the sync fell back to splits
+    detail = make_detail(activity_id)
+    store(session, detail, INTERVAL_STREAMS, cached)
+    replace_rows(session, activity_id, [], map_splits_to_rows(activity_id, detail["splits_metric"]))
+
+def store_old_thresholds(session, activity_id, cached=True):
+    # laps of older thresholds, a steady run that once showed efforts
+    store(session, make_detail(activity_id), EASY_STREAMS, cached)
+    _, _, bulk_rows, _ = build_activity_objects(make_detail(activity_id), INTERVAL_STREAMS)
+    replace_rows(session, activity_id, dict(bulk_rows)[ActivityLap], [])
+
+def current_lap_types(activity_id, streams):
+    _, _, bulk_rows, _ = build_activity_objects(make_detail(activity_id), streams)
+    return [row["lap_type"] for row in dict(bulk_rows)[ActivityLap]]
+
+@pytest.fixture(scope="module")
+def redetected():
+    upgrade(verbose=False)
+    session = SessionLocal()
+    try:
+        # watch laps, re-classified only
+        store(session, make_detail(WATCH_LAPS_ID, watch_laps=6), INTERVAL_STREAMS)
+        store_splits_fallback(session, SPLITS_TO_LAPS_ID)
+        store_old_thresholds(session, CHANGED_LAPS_ID)
+        
+        # without the raw detail: the watch laps must survive, the detector
+        # rows are detected again from the stored streams
+        store(session, make_detail(UNCACHED_WATCH_LAPS_ID, watch_laps=6), INTERVAL_STREAMS, cached=False)
+        store_splits_fallback(session, UNCACHED_SPLITS_TO_LAPS_ID, cached=False)
+        store_old_thresholds(session, UNCACHED_CHANGED_LAPS_ID, cached=False)
+        store_old_thresholds(session, UNCACHED_NO_STREAMS_ID, cached=False)
+        session.query(ActivityStream).filter(ActivityStream.activity_id == UNCACHED_NO_STREAMS_ID).delete()
+        
+        weeks, days = activity_buckets(session, ACTIVITY_IDS)
+        refresh_aggregates(session, weeks, days)
+        session.commit()
+        
+        before = {activity_id: stored_rows(session, activity_id) for activity_id in ACTIVITY_IDS}
+    finally:
+        session.close()
+    
+    redetect_laps(workers=1, batch_size=2)
+    return before
+
+def test_watch_laps_are_kept(redetected):
+    session = SessionLocal()
+    try:
+        lap_types, split_count = stored_rows(session, WATCH_LAPS_ID)
+        assert (lap_types, split_count) == redetected[WATCH_LAPS_ID]
+        assert len(lap_types) == 6
+    finally:
+        session.close()
+
+def test_watch_laps_without_the_raw_detail_are_kept(redetected):
+    session = SessionLocal()
+    try:
+        assert stored_rows(session, UNCACHED_WATCH_LAPS_ID) == redetected[UNCACHED_WATCH_LAPS_ID]
+    finally:
+        session.close()
+
+def test_activities_without_streams_are_skipped(redetected):
+    session = SessionLocal()
+    try:
+        assert stored_rows(session, UNCACHED_NO_STREAMS_ID) == redetected[UNCACHED_NO_STREAMS_ID]
+    finally:
+        session.close()
+
+@pytest.mark.parametrize("activity_id", [SPLITS_TO_LAPS_ID, UNCACHED_SPLITS_TO_LAPS_ID])
+def test_detected_laps_replace_the_fallback_splits(redetected, activity_id):
+    session = SessionLocal()
+    try:
+        lap_types, split_count = stored_rows(session, activity_id)
+        assert lap_types == current_lap_types(activity_id, INTERVAL_STREAMS)
+        assert lap_types.count("WORKOUT") == 6
+        assert split_count == 0
+    finally:
+        session.close()
+
+@pytest.mark.parametrize("activity_id", [CHANGED_LAPS_ID, UNCACHED_CHANGED_LAPS_ID])
+def test_laps_follow_the_current_thresholds(redetected, activity_id):
+    expected = current_lap_types(activity_id, EASY_STREAMS)
+    
+    session = SessionLocal()
+    try:
+        assert stored_rows(session, activity_id) == (expected, 0)
+        assert "WORKOUT" not in expected
+    finally:
+        session.close()
+
+def lap_signature(lap_rows):
+    return [(row["lap_index"], row["lap_type"]) for row in lap_rows]
+
+def test_detected_laps_never_look_like_watch_laps():
+    with gzip.open(LAP_CASES_PATH, "rt") as f:
+        cases = json.load(f)
+    for case in cases:
+        for laps in case["laps"].values():
+            assert not _are_watch_laps(lap_signature(map_laps_to_rows(0, laps)))
+    
+    for streams in (INTERVAL_STREAMS, EASY_STREAMS):
+        _, _, bulk_rows, _ = build_activity_objects(make_detail(0), streams)
+        assert not _are_watch_laps(lap_signature(dict(bulk_rows)[ActivityLap]))
+    
+    _, _, bulk_rows, _ = build_activity_objects(make_detail(0, watch_laps=6), INTERVAL_STREAMS)
+    assert _are_watch_laps(lap_signature(dict(bulk_rows)[ActivityLap]))
+
+def test_aggregates_are_refreshed(redetected):
+    session = SessionLocal()
+    try:
+        weeks, days = activity_buckets(session, ACTIVITY_IDS)
+        refreshed = aggregate_rows(session, weeks, days)
+        rebuild_aggregates_in(session)
+        assert aggregate_rows(session, weeks, days) == refreshed
+        assert refreshed[0]
+        session.rollback()
+    finally:
+        session.close()
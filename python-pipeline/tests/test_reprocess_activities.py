@@ -0,0 +1,39 @@
+import pytest
+
+import processors.reprocess_activities as reprocess
+from database.config import SessionLocal
+from database.models import Activity
+from collector.raw_cache import save_raw_activity
+
+FIRST_ID = 920001
+
+def make_detail(activity_id):
+    return {
+        "id": activity_id, "name": f"Run {activity_id}", "type": "Run", "sport_type": "Run",
+        "description": "easy", "start_date": "2024-06-04T09:00:00Z", "start_date_local": "2024-06-04T06:00:00Z",
+        "distance": 5000.0, "moving_time": 1650,
+        "splits_metric": [{"split": k + 1, "distance": 1000.0, "moving_time": 330} for k in range(5)],
+    }
+
+def test_an_interrupted_reprocess_commits_the_queued_activities(monkeypatch):
+    activity_ids = [FIRST_ID, FIRST_ID + 1, FIRST_ID + 2]
+    for activity_id in activity_ids:
+        save_raw_activity(activity_id, make_detail(activity_id))
+    monkeypatch.setattr(reprocess, "iter_cached_activity_ids", lambda: iter(activity_ids))
+    
+    build_activity_objects = reprocess.build_activity_objects
+    def build_until_interrupted(full_data, streams):
+        if full_data["id"] == activity_ids[-1]:
+            raise KeyboardInterrupt
+        return build_activity_objects(full_data, streams)
+    monkeypatch.setattr(reprocess, "build_activity_objects", build_until_interrupted)
+    
+    # the batch is larger than the activities, only close() commits them
+    with pytest.raises(KeyboardInterrupt):
+        reprocess.reprocess_activities(batch_size=100)
+    
+    session = SessionLocal()
+    try:
+        assert [session.get(Activity, activity_id) is not None for activity_id in activity_ids] == [True, True, False]
+    finally:
+        session.close()
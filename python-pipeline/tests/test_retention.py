@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from database.config import SessionLocal
+from database.migrations import upgrade
+from database.models import Activity, ActivityStream
+from database.upsert import upsert_rows
+from database.stream_store import map_streams_to_channel_rows, arrays_to_streams, downsample_arrays, load_stream_arrays
+
+from processors.retention import apply_retention
+
+OLD_1HZ_ID = 910001
+OLD_DOWNSAMPLED_ID = 910002
+RECENT_1HZ_ID = 910003
+
+def one_hz_arrays(seconds=120):
+    time = np.arange(seconds)
+    return {
+        "time": time,
+        "distance": time * 3.0,
+        "velocity_smooth": np.full(seconds, 3.0),
+        "heartrate": np.full(seconds, 150.0),
+        "altitude": 100 + (time % 13).astype(float),
+    }
+
+def add_activity(session, activity_id, start_date, arrays, resolution_sec):
+    session.add(Activity(id=activity_id, name=str(activity_id), type="Run", start_date=start_date))
+    session.flush()
+    upsert_rows(session, ActivityStream, map_streams_to_channel_rows(activity_id, arrays_to_streams(arrays), resolution_sec))
+
+def stored_streams(session, activity_id):
+    rows = session.query(ActivityStream).filter(ActivityStream.activity_id == activity_id).all()
+    return {row.channel: (row.resolution_sec, row.data) for row in rows}
+
+def test_retention_downsamples_old_1hz_streams_only():
+    upgrade(verbose=False)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    
+    session = SessionLocal()
+    try:
+        add_activity(session, OLD_1HZ_ID, now - timedelta(days=200), one_hz_arrays(), 1)
+        add_activity(session, OLD_DOWNSAMPLED_ID, now - timedelta(days=200), downsample_arrays(one_hz_arrays(), 5), 5)
+        add_activity(session, RECENT_1HZ_ID, now - timedelta(days=3), one_hz_arrays(), 1)
+        session.commit()
+        
+        downsampled_before = stored_streams(session, OLD_DOWNSAMPLED_ID)
+        recent_before = stored_streams(session, RECENT_1HZ_ID)
+    finally:
+        session.close()
+    
+    apply_retention(keep_days=90, bucket_sec=10, vacuum=False)
+    
+    session = SessionLocal()
+    try:
+        old = stored_streams(session, OLD_1HZ_ID)
+        assert {resolution for resolution, _ in old.values()} == {10}
+        assert "altitude" not in old
+        
+        arrays = load_stream_arrays(session, OLD_1HZ_ID)
+        expected = downsample_arrays(one_hz_arrays(), 10)
+        assert len(arrays["time"]) == 12
+        for channel, values in expected.items():
+            assert np.allclose(arrays[channel], values), channel
+        
+        # already downsampled streams keep their buckets and elevation range
+        assert stored_streams(session, OLD_DOWNSAMPLED_ID) == downsampled_before
+        assert stored_streams(session, RECENT_1HZ_ID) == recent_before
+    finally:
+        session.close()
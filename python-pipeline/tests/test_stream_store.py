@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from database.stream_store import CHANNELS, encode_channel, decode_channel, downsample_arrays
+
+def round_trip(channel, values):
+    dtype, scale, delta = CHANNELS[channel]
+    data, encoding = encode_channel(values, dtype, scale, delta)
+    return decode_channel(data, dtype, scale, encoding)
+
+def test_delta_distance_does_not_drift_on_long_series():
+    # ~14 h at 1 Hz with steps that never land on the 0.1 m grid
+    rng = np.random.default_rng(7)
+    distance = np.cumsum(rng.uniform(2.0, 4.0, 50_000) + 0.0437)
+    
+    decoded = round_trip("distance", distance)
+    # every sample stays within half a storage unit of the original
+    assert np.abs(decoded - distance).max() <= 0.05 + 1e-9
+    assert decoded[-1] == np.round(distance[-1] * 10) / 10
+
+def test_delta_distance_keeps_the_gaps():
+    distance = np.cumsum(np.full(1_000, 2.55))
+    distance[100:150] = np.nan
+    distance[0] = np.nan
+    
+    decoded = round_trip("distance", distance)
+    assert np.isnan(decoded[100:150]).all()
+    assert np.isnan(decoded[0])
+    present = ~np.isnan(distance)
+    assert np.abs(decoded[present] - distance[present]).max() <= 0.05 + 1e-9
+
+def test_time_round_trips_exactly():
+    time = np.concatenate((np.arange(0, 3_000), np.arange(3_100, 7_000, 2)))
+    
+    decoded = round_trip("time", time)
+    assert decoded.dtype == np.int64
+    assert np.array_equal(decoded, time)
+
+def test_downsample_buckets():
+    time = np.arange(25)
+    arrays = {
+        "time": time,
+        "distance": time * 3.0,
+        "velocity_smooth": np.where(time % 2 == 0, 2.0, 4.0),
+        "heartrate": np.full(25, np.nan),
+        "altitude": (time % 7).astype(float),
+    }
+    
+    downsampled = downsample_arrays(arrays, 10)
+    assert downsampled["time"].tolist() == [9, 19, 24]
+    assert downsampled["distance"].tolist() == [27.0, 57.0, 72.0]
+    assert downsampled["velocity_smooth"].tolist() == [3.0, 3.0, 2.8]
+    assert np.isnan(downsampled["heartrate"]).all()
+    assert downsampled["altitude_min"].tolist() == [0.0, 0.0, 0.0]
+    assert downsampled["altitude_max"].tolist() == [6.0, 6.0, 6.0]
+
+def test_downsampled_streams_are_not_downsampled_again():
+    downsampled = downsample_arrays({"time": np.arange(20), "altitude": np.arange(20.0)}, 5)
+    with pytest.raises(ValueError):
+        downsample_arrays(downsampled, 10)
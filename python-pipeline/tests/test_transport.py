@@ -0,0 +1,31 @@
+from collector import transport
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+    
+    def raise_for_status(self):
+        pass
+    
+    def json(self):
+        return {"ok": True}
+
+def test_headers_are_built_after_the_governor_acquires(monkeypatch):
+    events = []
+    
+    def get_headers():
+        events.append("headers")
+        return {"Authorization": "Bearer x"}
+    
+    def get(url, **kwargs):
+        events.append("get")
+        assert kwargs["headers"] == {"Authorization": "Bearer x"}
+        return FakeResponse()
+    
+    monkeypatch.setattr(transport, "get_headers", get_headers)
+    monkeypatch.setattr(transport.session, "get", get)
+    monkeypatch.setattr(transport.governor, "acquire", lambda: events.append("acquire"))
+    monkeypatch.setattr(transport.governor, "release", lambda response=None: events.append("release"))
+    
+    assert transport.get_json("/athlete/activities") == {"ok": True}
+    assert events == ["acquire", "headers", "get", "release"]